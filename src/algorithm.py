@@ -110,6 +110,7 @@ logger.info("Load libs")
 from configparser import ConfigParser
 
 from libs.pomoLib import app
+from libs.pomoLib import workerPool
 
 
 
@@ -132,8 +133,16 @@ if __name__ == "__main__":
     config.read("src/config/config.ini")
     #config.read("config/config.ini")
     #Create instance of PomoAI and do the initalisation
+    # Pool of worker processes if samples shall be evaluated in parallel
+    pool = workerPool.SamplePool.fromConfig(config, version)
+    
     logger.debug("Create a instance of PomoAI application")
-    PomoAI = app.PomoAI(config,version)
+    if pool:
+        # Models are loaded by the workers. Main process only loads them if 
+        # needed for single img regions.
+        PomoAI = app.PomoAI(config, version, loadModels = False)
+    else:
+        PomoAI = app.PomoAI(config,version)
     
     flagMsgOut = True
     
@@ -148,42 +157,47 @@ if __name__ == "__main__":
     """
     logger.info("Starting Mainloop")
 
-    # Check for new samples to evaluate
-    sampleInfo = PomoAI.checkForNewSample()
+    # Keep running and wait for new samples instead of exiting if no sample
+    # is left
+    daemon = config.getboolean("MAIN", "Daemon", fallback=False)
+    sleepingTime = config.getfloat("MAIN", "SleepingTime", fallback=1)
 
-    while sampleInfo:
-        start = time.time()
-        
-        # create new sample instance
-        PomoAI.createNewSampleEvaluator(sampleInfo)
-        # set flag for msg output to True (Waiting for new sample)
-        flagMsgOut = True
-    
-        active = False
-        for sample in PomoAI.lstOpenSamples:
-            while sample.active:
-                active = True
-                imgRegion = sample.nextImageRegion()
-                if imgRegion:
-                    sample.analyzeRegion(imgRegion)
-                    PomoAI.saveSamplePickle(sample)
-                else:
-                    if sample.endOfSample:
-                        sample.sampleEnd()
-                        PomoAI.addToEvalList(sample)
-                        
-                        PomoAI.lstOpenSamples.remove(sample)
-                    else:
-                        logger.info(f"Sample {sample.nameSample} set to inactive")
-                        logger.info("Waiting for new sample or new img region")
-                        sample.active = False
+    while True:
+        if pool:
+            # Evaluate samples in parallel worker processes
+            pool.drain(PomoAI)
             
-        end = time.time()
-        print("Processing time: ", end - start)
-
+        # Check for new samples to evaluate
         sampleInfo = PomoAI.checkForNewSample()
     
-
-
+        # Samples reactivated by new img regions or resumed after an 
+        # interruption are active without a new sample
+        while sampleInfo or any(sample.active for sample in PomoAI.lstOpenSamples):
+            start = time.time()
             
-
+            # create new sample instance
+            if sampleInfo:
+                PomoAI.createNewSampleEvaluator(sampleInfo)
+            # set flag for msg output to True (Waiting for new sample)
+            flagMsgOut = True
+        
+            for sample in list(PomoAI.lstOpenSamples):
+                PomoAI.runSample(sample)
+                
+            end = time.time()
+            print("Processing time: ", end - start)
+    
+            sampleInfo = PomoAI.checkForNewSample()
+            
+        if not daemon:
+            break
+        
+        if flagMsgOut:
+            logger.info("Waiting for new sample or new img region")
+            flagMsgOut = False
+            
+        # Sleep until the input folder changes (or the sleeping time expired)
+        PomoAI.waitForChanges(sleepingTime)
+        
+    if pool:
+        pool.close()
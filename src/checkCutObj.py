@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:12:37 2026
+
+Parity check and benchmark of PomoSegmentation.cutObj against the previous
+implementation (per object float64 image, bitwise_and/cvtColor and a scan
+of all cut objects for double masks). Synthetic dense img regions with many
+detections (and double masked objects) are cut by both and the objects are
+compared field by field. Fails (exit code 1) if any object differs.
+
+Usage (from the root of the repository):
+
+    python src/checkCutObj.py [--objects N] [--regions N]
+"""
+
+import argparse
+import sys
+import time
+from configparser import ConfigParser
+
+import numpy as np
+import cv2
+
+from libs.pomoLib.datatypes import dcPomoObject, dcSpecies, dcTreshold
+from libs.pomoLib.segmentation import segmenter
+from libs.pomoLib import maskCodec
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def cutObjReference(classNames, synthImage, r, drawDust = False):
+    """
+    Previous implementation of PomoSegmentation.cutObj
+    """
+    localMasks = r['local_masks']
+    masks = [[localMasks[mask], r['rois'][mask],
+              classNames[r['class_ids'][mask]], r['scores'][mask]]
+             for mask in range(len(r['class_ids'])) if
+             ((classNames[r['class_ids'][mask]] == 'pollen') or
+              (classNames[r['class_ids'][mask]] == 'sporen') or
+              (classNames[r['class_ids'][mask]] == 'fragment')or
+              (classNames[r['class_ids'][mask]] == 'particle' if
+               drawDust else None)) and
+             localMasks[mask] is not None]
+    if not masks:
+        return None
+
+    cutObjs = []
+    for index, mask in enumerate(masks):
+        x0 = mask[1][1]
+        x1 = mask[1][3]
+        y0 = mask[1][0]
+        y1 = mask[1][2]
+
+        if x1 - x0 > 350:
+            diff = round(((x1-x0) - 350) / 2)
+            x0 = x0 + diff
+            x1 = x0 + 350
+
+        if y1 - y0 > 350:
+            diff = round(((y1-y0) - 350) / 2)
+            y0 = y0 + diff
+            y1 = y0 + 350
+
+        polle = mask[0][y0 - mask[1][0]:y1 - mask[1][0],
+                        x0 - mask[1][1]:x1 - mask[1][1]]
+        polle = polle.astype('uint8')
+
+        imgTemp = synthImage[y0:y1,x0:x1]
+        polleTemp = cv2.bitwise_and(imgTemp,imgTemp,mask=polle)
+        polleTemp = cv2.cvtColor(polleTemp,cv2.COLOR_RGB2GRAY)
+
+        l_img = np.zeros((350,350))
+        x_offset= int((350 - polleTemp.shape[1])/2)
+        y_offset= int((350 - polleTemp.shape[0])/2)
+        l_img[y_offset:y_offset+polleTemp.shape[0],
+              x_offset:x_offset+polleTemp.shape[1],] = polleTemp
+
+        obj = dcPomoObject(xPos = x0, yPos = y0, width = x1 - x0,
+                           height = y1 - y0,
+                           imgObj = l_img.astype(dtype="uint8"),
+                           segMask = maskCodec.encodeRle(polle),
+                           segClass = mask[2], segScore = mask[3])
+        if mask[2] == 'fragment':
+            obj.specFolder = "Fragment"
+            obj.clfSpecies = dcSpecies("Fragment", "Fragment", "Fragment","",
+                                       dcTreshold(1,0,0))
+            obj.clfScore = 1.00
+
+        doublePos = [elem for elem in cutObjs if (
+                     elem.xPos == obj.xPos and elem.yPos == obj.yPos and
+                     elem.width == obj.width and elem.height == obj.height)]
+        if doublePos:
+            doublePos = doublePos[0]
+            if not doublePos.segScore > obj.segScore:
+                cutObjs[cutObjs.index(doublePos)] = obj
+            continue
+        cutObjs.append(obj)
+    return cutObjs
+
+
+def createRegion(numClasses, numObjs, seed, maxSize = 420):
+    """
+    Returns a synthetic img region (960 x 1280) and a result with numObjs
+    detections of all classes (boxes up to maxSize). Every tenth detection
+    repeats the box of an earlier one (double masked object), with the
+    default maxSize some are larger than the object images.
+    """
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 256, (960, 1280, 3), dtype=np.uint8)
+    rois, masks = [], []
+    for i in range(numObjs):
+        if i % 10 == 9:
+            roi = rois[rng.integers(0, len(rois))]
+        else:
+            h, w = rng.integers(8, maxSize, 2)
+            y, x = rng.integers(0, 960 - h), rng.integers(0, 1280 - w)
+            roi = np.array([y, x, y + h, x + w], dtype=np.int32)
+        rois.append(roi)
+        # Elliptic object filling its box
+        h, w = roi[2] - roi[0], roi[3] - roi[1]
+        yy, xx = np.ogrid[:h, :w]
+        masks.append(((yy - h / 2) / (h / 2)) ** 2 + 
+                     ((xx - w / 2) / (w / 2)) ** 2 <= 1)
+    return image, {"rois": np.array(rois, dtype=np.int32),
+                   "class_ids": rng.integers(1, numClasses, numObjs).astype(np.int32),
+                   "scores": rng.random(numObjs).astype(np.float32),
+                   "local_masks": masks}
+
+
+def sameObjs(objsA, objsB):
+    if objsA is None or objsB is None:
+        return objsA is None and objsB is None
+    if len(objsA) != len(objsB):
+        return False
+    for a, b in zip(objsA, objsB):
+        if (not np.array_equal(a.imgObj, b.imgObj) or
+            a.imgObj.dtype != b.imgObj.dtype):
+            return False
+        for key in ("xPos", "yPos", "width", "height", "segMask", "segClass",
+                    "segScore", "specFolder", "clfSpecies", "clfScore"):
+            if getattr(a, key) != getattr(b, key):
+                return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare cutObj with its "
+                                     "previous implementation")
+    parser.add_argument("--objects", type=int, default=300,
+                        help="Detections per img region")
+    parser.add_argument("--regions", type=int, default=5,
+                        help="Number of img regions")
+    args = parser.parse_args()
+
+    config = ConfigParser()
+    config.optionxform = str
+    config.read("src/config/config.ini")
+    classNames = config.get("SEG", "ClassNames").split(",")
+
+    # cutObj only needs the class names, no model is loaded
+    seg = segmenter.PomoSegmentation.__new__(segmenter.PomoSegmentation)
+    seg.classNames = classNames
+
+    regions = [createRegion(len(classNames), args.objects, seed)
+               for seed in range(args.regions)]
+    passed = True
+    for drawDust in (False, True):
+        timeRef = timeNew = 0.0
+        numObjs = 0
+        for image, r in regions:
+            start = time.perf_counter()
+            objsRef = cutObjReference(classNames, image, r, drawDust)
+            timeRef += time.perf_counter() - start
+            start = time.perf_counter()
+            objsNew = seg.cutObj(image, r, drawDust)
+            timeNew += time.perf_counter() - start
+            passed &= sameObjs(objsRef, objsNew)
+            numObjs += len(objsNew or [])
+
+        print(f"drawDust {drawDust!s:<5}  {numObjs} objects   "
+              f"previous {timeRef * 1000:8.1f} ms   "
+              f"cutObj {timeNew * 1000:8.1f} ms   "
+              f"speedup {timeRef / timeNew:4.1f}x")
+
+    print("OK" if passed else "FAIL: objects differ")
+    sys.exit(0 if passed else 1)
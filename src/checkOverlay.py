@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:03:51 2026
+
+Parity check and benchmark of the overlay renderer (segmentation/overlay.py)
+against visualize.display_instances. Synthetic dense img regions (see
+checkCutObj.py, with overlapping and double masked objects) are rendered by
+both with the same random colors and the images are compared pixel by
+pixel. Fails (exit code 1) if any pixel differs.
+
+Additionally compares the size and encoding time of the raster overlay
+(tiffSEG.png) with the vector overlay (contours, tiffSEGV.json) and reports
+the min. IoU of the masks restored from the contours.
+
+Usage (from the root of the repository):
+
+    python src/checkOverlay.py [--objects N] [--regions N]
+"""
+
+import argparse
+import random
+import sys
+import time
+from configparser import ConfigParser
+
+import numpy as np
+import cv2
+
+from libs.pomoLib.segmentation import overlay
+from libs.pomoLib.segmentation import visualize
+from checkCutObj import createRegion
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the overlay "
+                                     "renderer with display_instances")
+    parser.add_argument("--objects", type=int, default=300,
+                        help="Detections per img region")
+    parser.add_argument("--regions", type=int, default=5,
+                        help="Number of img regions")
+    args = parser.parse_args()
+
+    config = ConfigParser()
+    config.optionxform = str
+    config.read("src/config/config.ini")
+    classNames = config.get("SEG", "ClassNames").split(",")
+
+    # Boxes up to the size of large pollen
+    regions = [createRegion(len(classNames), args.objects, seed, 160)
+               for seed in range(args.regions)]
+    passed = True
+    for drawDust in (False, True):
+        drawIds = [classNames.index(name) for name in
+                   ("pollen", "sporen", "fragment") +
+                   (("particle",) if drawDust else ())]
+        timeRef = timeNew = 0.0
+        for seed, (image, r) in enumerate(regions):
+            # Same random colors for both
+            random.seed(seed)
+            start = time.perf_counter()
+            imgRef = visualize.display_instances(image, r['rois'],
+                                                 r['local_masks'],
+                                                 r['class_ids'], classNames,
+                                                 drawDust, r['scores'])
+            timeRef += time.perf_counter() - start
+
+            random.seed(seed)
+            start = time.perf_counter()
+            imgNew = overlay.renderInstances(image, r['rois'], r['local_masks'],
+                                             r['class_ids'], drawIds)
+            timeNew += time.perf_counter() - start
+            passed &= np.array_equal(imgRef, imgNew)
+
+        print(f"drawDust {drawDust!s:<5}  display_instances "
+              f"{timeRef * 1000:8.1f} ms   renderInstances "
+              f"{timeNew * 1000:8.1f} ms   speedup {timeRef / timeNew:5.1f}x")
+
+    # Raster vs. vector overlay
+    drawIds = [classNames.index(name) for name in ("pollen", "sporen", "fragment")]
+    timeRaster = timeVector = 0.0
+    sizeRaster = sizeVector = 0
+    minIoU = 1.0
+    for image, r in regions:
+        start = time.perf_counter()
+        success, data = cv2.imencode(".png", overlay.renderInstances(
+            image, r['rois'], r['local_masks'], r['class_ids'], drawIds))
+        timeRaster += time.perf_counter() - start
+        sizeRaster += len(data)
+
+        start = time.perf_counter()
+        data = overlay.encodeContours(r, classNames, drawIds)
+        timeVector += time.perf_counter() - start
+        sizeVector += len(data)
+
+        restored, __ = overlay.contoursToResult(data)
+        drawn = [i for i in range(len(r['rois'])) if r['class_ids'][i] in drawIds]
+        for i, mask in zip(drawn, restored['local_masks']):
+            inter = np.logical_and(r['local_masks'][i], mask).sum()
+            union = np.logical_or(r['local_masks'][i], mask).sum()
+            minIoU = min(minIoU, inter / union if union else 1.0)
+
+    print(f"raster {sizeRaster / len(regions) / 1e3:8.1f} kB "
+          f"{timeRaster * 1000 / len(regions):7.1f} ms   vector "
+          f"{sizeVector / len(regions) / 1e3:8.1f} kB "
+          f"{timeVector * 1000 / len(regions):7.1f} ms   (per region, "
+          f"min. mask IoU {minIoU:.3f})")
+
+    print("OK" if passed else "FAIL: images differ")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:47:09 2026
+
+Parity check and benchmark of the resize backends of the segmenter
+(segmentation.utils.set_resize_backend). Compares the skimage and the cv2
+backend on
+
+    - the resized img regions (utils.resize_image of MaskRCNN.mold_inputs)
+    - the masks in the size of their bounding box (utils.unmold_mask_local)
+    - the detections of the segmenter (only with --model)
+
+and fails (exit code 1) if the results differ more than the tolerances.
+
+Usage (from the root of the repository):
+
+    python src/checkResizeBackend.py [--images FOLDER] [--model PATH]
+"""
+
+import argparse
+import os
+import sys
+import time
+from configparser import ConfigParser
+
+import numpy as np
+import cv2
+import skimage.io
+
+from libs.pomoLib.segmentation import segmenter
+from libs.pomoLib.segmentation import utils as segUtils
+
+
+# Max. difference of the resized img regions (uint8, truncated)
+TOL_IMAGE = 1
+# Min. IoU of the masks in the size of their bounding box
+TOL_MASK_IOU = 0.99
+# Detections: min. IoU of the boxes to be matched, max. difference of the
+# scores, min. IoU of the masks
+TOL_DET_BOX_IOU = 0.9
+TOL_DET_SCORE = 0.01
+TOL_DET_MASK_IOU = 0.95
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def loadImages(path, num):
+    """
+    Returns up to num images (RGB) of the folder or synthetic images of the
+    size of an img region if no folder is given
+    """
+    if not path:
+        rng = np.random.default_rng(0)
+        images = []
+        for __ in range(num):
+            img = rng.integers(0, 256, (960, 1280, 3), dtype=np.uint8)
+            images.append(cv2.GaussianBlur(img, (0, 0), 3))
+        return images
+
+    names = sorted(name for name in os.listdir(path)
+                   if name.lower().endswith((".png", ".jpg", ".tif", ".tiff")))
+    images = []
+    for name in names[:num]:
+        img = skimage.io.imread(os.path.join(path, name))
+        if img.ndim == 2:
+            img = np.stack([img] * 3, axis=2)
+        images.append(img[..., :3])
+    return images
+
+
+def createMasks(num):
+    """
+    Returns masks like the output of the mask head (28x28, float in [0, 1])
+    and boxes of different sizes to fit them in
+    """
+    rng = np.random.default_rng(1)
+    masks, boxes = [], []
+    for __ in range(num):
+        logits = cv2.GaussianBlur(rng.normal(0, 8, (28, 28)).astype(np.float32),
+                                  (0, 0), 3)
+        masks.append(1 / (1 + np.exp(-logits)))
+        height, width = rng.integers(4, 250, 2)
+        y1, x1 = rng.integers(0, 700, 2)
+        boxes.append(np.array([y1, x1, y1 + height, x1 + width]))
+    return masks, boxes
+
+
+def runBackend(backend, func, args, repeat):
+    """
+    Returns the results of func for all args with the backend and the mean
+    time per call (best of repeat runs)
+    """
+    segUtils.set_resize_backend(backend)
+    best = None
+    for __ in range(repeat):
+        start = time.perf_counter()
+        results = [func(*arg) for arg in args]
+        duration = (time.perf_counter() - start) / max(len(args), 1)
+        best = duration if best is None else min(best, duration)
+    return results, best
+
+
+def maskIoU(maskA, roiA, maskB, roiB):
+    """
+    Returns the IoU of two masks in the size of their bounding boxes
+    """
+    y1, x1 = min(roiA[0], roiB[0]), min(roiA[1], roiB[1])
+    y2, x2 = max(roiA[2], roiB[2]), max(roiA[3], roiB[3])
+    canvasA = np.zeros((y2 - y1, x2 - x1), dtype=bool)
+    canvasB = np.zeros((y2 - y1, x2 - x1), dtype=bool)
+    canvasA[roiA[0] - y1:roiA[2] - y1, roiA[1] - x1:roiA[3] - x1] = maskA
+    canvasB[roiB[0] - y1:roiB[2] - y1, roiB[1] - x1:roiB[3] - x1] = maskB
+    union = np.logical_or(canvasA, canvasB).sum()
+    if not union:
+        return 1.0
+    return np.logical_and(canvasA, canvasB).sum() / union
+
+
+def compareDetections(resA, resB):
+    """
+    Matches the detections of both backends (same class, box IoU above
+    TOL_DET_BOX_IOU).
+
+    Returns
+    -------
+    tuple
+        Number of unmatched detections, max. difference of the scores and
+        min. IoU of the masks of the matched detections
+    """
+    unmatched = 0
+    scoreDiff = 0.0
+    minIoU = 1.0
+    for ra, rb in zip(resA, resB):
+        iou = segUtils.compute_overlaps(ra["rois"], rb["rois"])
+        used = set()
+        for i in np.argsort(-ra["scores"]):
+            candidates = [j for j in np.argsort(-iou[i]) if j not in used and
+                          rb["class_ids"][j] == ra["class_ids"][i] and
+                          iou[i, j] >= TOL_DET_BOX_IOU]
+            if not candidates:
+                unmatched += 1
+                continue
+            j = candidates[0]
+            used.add(j)
+            scoreDiff = max(scoreDiff, abs(ra["scores"][i] - rb["scores"][j]))
+            minIoU = min(minIoU, maskIoU(ra["local_masks"][i], ra["rois"][i],
+                                         rb["local_masks"][j], rb["rois"][j]))
+        unmatched += len(rb["rois"]) - len(used)
+    return unmatched, scoreDiff, minIoU
+
+
+def loadSegmenter(config, path):
+    segConfig = segmenter.PollenConfig(1)
+    segConfig.DETECTION_MIN_CONFIDENCE = config.getfloat("SEG", "SegmentTresh")
+    classNames = config.get("SEG", "ClassNames").split(",")
+    return segmenter.PomoSegmentation(path, segConfig, classNames)
+
+
+def report(name, timeA, timeB, passed, details):
+    print(f"{name:<12} skimage {timeA * 1000:9.3f} ms   cv2 {timeB * 1000:9.3f} ms   "
+          f"speedup {timeA / timeB:5.1f}x   {'OK  ' if passed else 'FAIL'}  {details}")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the resize backends "
+                                     "of the segmenter")
+    parser.add_argument("--images", help="Folder with img regions (default: "
+                        "synthetic images)")
+    parser.add_argument("--num", type=int, default=8,
+                        help="Max. number of img regions")
+    parser.add_argument("--masks", type=int, default=500,
+                        help="Number of masks")
+    parser.add_argument("--model", help="Segmentation model (.h5), compares "
+                        "the detections if given")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per benchmark, the best one is used")
+    args = parser.parse_args()
+
+    config = ConfigParser()
+    config.optionxform = str
+    config.read("src/config/config.ini")
+
+    segConfig = segmenter.PollenConfig(1)
+
+    images = loadImages(args.images, args.num)
+    masks, boxes = createMasks(args.masks)
+    print(f"{len(images)} img regions, {len(masks)} masks\n")
+    allPassed = True
+
+    # Img regions as resized in MaskRCNN.mold_inputs
+    def moldImage(image):
+        return segUtils.resize_image(image, min_dim=segConfig.IMAGE_MIN_DIM,
+                                     min_scale=segConfig.IMAGE_MIN_SCALE,
+                                     max_dim=segConfig.IMAGE_MAX_DIM,
+                                     mode=segConfig.IMAGE_RESIZE_MODE)[0]
+
+    resA, timeA = runBackend("skimage", moldImage, [(img,) for img in images],
+                             args.repeat)
+    resB, timeB = runBackend("cv2", moldImage, [(img,) for img in images],
+                             args.repeat)
+    diff = max(int(np.abs(a.astype(np.int32) - b.astype(np.int32)).max())
+               for a, b in zip(resA, resB))
+    share = np.mean([np.mean(a != b) for a, b in zip(resA, resB)])
+    allPassed &= report("resize_image", timeA, timeB, diff <= TOL_IMAGE,
+                        f"max. diff {diff}, differing values {share:.4%}")
+
+    # Masks as unmolded in MaskRCNN.unmold_detections
+    resA, timeA = runBackend("skimage", segUtils.unmold_mask_local,
+                             list(zip(masks, boxes)), args.repeat)
+    resB, timeB = runBackend("cv2", segUtils.unmold_mask_local,
+                             list(zip(masks, boxes)), args.repeat)
+    minIoU = min(maskIoU(a, box, b, box) for a, b, box in zip(resA, resB, boxes))
+    allPassed &= report("unmold_mask", timeA, timeB, minIoU >= TOL_MASK_IOU,
+                        f"min. IoU {minIoU:.4f}")
+
+    # Detections of the segmenter
+    if args.model:
+        segmentation = loadSegmenter(config, args.model)
+        detect = lambda image: segmentation.detect_batch([image])[0]
+        # Warm up (graph is finalized on first call)
+        detect(images[0])
+
+        resA, timeA = runBackend("skimage", detect, [(img,) for img in images],
+                                 args.repeat)
+        resB, timeB = runBackend("cv2", detect, [(img,) for img in images],
+                                 args.repeat)
+        unmatched, scoreDiff, minIoU = compareDetections(resA, resB)
+        passed = (not unmatched and scoreDiff <= TOL_DET_SCORE and
+                  minIoU >= TOL_DET_MASK_IOU)
+        numDet = sum(len(r["rois"]) for r in resA)
+        allPassed &= report("detect", timeA, timeB, passed,
+                            f"{numDet} detections, {unmatched} unmatched, "
+                            f"max. score diff {scoreDiff:.4f}, "
+                            f"min. mask IoU {minIoU:.4f}")
+
+    sys.exit(0 if allPassed else 1)
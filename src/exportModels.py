@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:52:26 2026
+
+Exports the segmentation model (.h5) as frozen inference graph (.pb) with
+its metadata (.json), see segmentation/frozen.py. The exported model is used
+by setting SEG/ModelSegPath to the .pb file.
+
+Batch size (SEG/BatchSize) and detection threshold (SEG/SegmentTresh) are
+taken from the config and are part of the exported graph.
+
+Usage (from the root of the repository):
+
+    python src/exportModels.py [--model PATH] [--out PATH] [--batch N]
+"""
+
+import argparse
+import os
+import sys
+import time
+from configparser import ConfigParser
+
+import numpy as np
+import tensorflow as tf
+
+from libs.pomoLib.segmentation import segmenter
+from libs.pomoLib.segmentation import frozen
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def loadSegmenter(config, path, batchSize):
+    segConfig = segmenter.PollenConfig(batchSize)
+    segConfig.DETECTION_MIN_CONFIDENCE = config.getfloat("SEG", "SegmentTresh")
+    classNames = config.get("SEG", "ClassNames").split(",")
+    start = time.time()
+    seg = segmenter.PomoSegmentation(path, segConfig, classNames)
+    return seg, time.time() - start
+
+
+def compareModels(segA, segB, numImgs = 2):
+    """
+    Segmentates synthetic images with both models and returns the number of
+    detections of each model and the max. difference of the boxes and
+    scores
+    """
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, (960, 1280, 3), dtype=np.uint8)
+              for __ in range(numImgs)]
+    resA = segA.detect_batch(images)
+    resB = segB.detect_batch(images)
+
+    numA = sum(len(r["rois"]) for r in resA)
+    numB = sum(len(r["rois"]) for r in resB)
+    diff = 0.0
+    for ra, rb in zip(resA, resB):
+        if len(ra["rois"]) == len(rb["rois"]) and len(ra["rois"]):
+            diff = max(diff, np.abs(ra["rois"] - rb["rois"]).max(),
+                       np.abs(ra["scores"] - rb["scores"]).max())
+    return numA, numB, diff
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the segmentation "
+                                     "model as frozen graph")
+    parser.add_argument("--model", help="Segmentation model (.h5), default: "
+                        "SEG/ModelSegPath")
+    parser.add_argument("--out", help="Frozen graph (.pb), default: next to "
+                        "the model with the batch size in its name")
+    parser.add_argument("--batch", type=int, help="Batch size, default: "
+                        "SEG/BatchSize")
+    parser.add_argument("--check", action="store_true", help="Compare the "
+                        "detections of the exported and the original model")
+    args = parser.parse_args()
+
+    config = ConfigParser()
+    config.optionxform = str
+    config.read("src/config/config.ini")
+
+    pathModel = args.model or config.get("SEG", "ModelSegPath")
+    batchSize = args.batch or config.getint("SEG", "BatchSize", fallback=1)
+    pathOut = args.out or (os.path.splitext(pathModel)[0] + f"_b{batchSize}.pb")
+
+    seg, timeH5 = loadSegmenter(config, pathModel, batchSize)
+    frozen.exportFrozenGraph(seg.model, tf.compat.v1.keras.backend.get_session(),
+                             pathOut, seg.classNames, os.path.basename(pathModel))
+
+    segFrozen, timeFrozen = loadSegmenter(config, pathOut, batchSize)
+    print(f"Exported {pathOut}")
+    print(f"Startup: {timeH5:.1f} s (h5) -> {timeFrozen:.1f} s (frozen)")
+
+    if args.check:
+        numA, numB, diff = compareModels(seg, segFrozen)
+        print(f"Detections: {numA} (h5) / {numB} (frozen), max. difference "
+              f"{diff:.4f}")
+        if numA != numB or diff > 1e-3:
+            sys.exit(1)
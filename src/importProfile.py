@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:21:08 2026
+
+Startup report of the import time of PomoAI. Imports the given modules in a
+fresh interpreter (python -X importtime) and prints
+
+    - the import time per top level package (own time of all its modules)
+    - the modules with the longest import (cumulative, including the modules
+      they import)
+
+Fails (exit code 1) if one of the deferred packages (plots, notebook
+helpers, result file formats, see lazyImport.py) is imported at startup.
+
+Usage (from the root of the repository):
+
+    python src/importProfile.py [--modules MODULE ...] [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+
+# Modules imported by src/algorithm.py
+STARTUP_MODULES = ["libs.pomoLib.app", "libs.pomoLib.workerPool"]
+
+# Packages which are only imported on first use
+DEFERRED_PACKAGES = ["matplotlib", "IPython", "pandas", "lxml", "dateutil",
+                     "pytz"]
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def importTimes(modules):
+    """
+    Returns the import times of all modules imported by the modules in a new
+    interpreter.
+
+    Returns
+    -------
+    list
+        (module, own time [s], cumulative time [s]) in import order
+    """
+    env = dict(os.environ)
+    pathSrc = os.path.dirname(os.path.abspath(__file__))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [pathSrc, 
+                                                      env.get("PYTHONPATH")]))
+    code = "; ".join(f"import {module}" for module in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          env=env, capture_output=True, text=True)
+    lines = proc.stderr.splitlines()
+    if proc.returncode != 0:
+        error = "\n".join(line for line in lines 
+                          if not line.startswith("import time:"))
+        raise RuntimeError(f"Import failed:\n{error}")
+
+    times = []
+    for line in lines:
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.append((name.strip(), int(own) / 1e6, int(cumulative) / 1e6))
+
+    return times
+
+
+def perPackage(times):
+    """
+    Returns the summed own import time per top level package, longest first
+    """
+    packages = defaultdict(float)
+    for name, own, __ in times:
+        packages[name.split(".")[0]] += own
+    return sorted(packages.items(), key=lambda item: -item[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the import time of "
+                                     "PomoAI per module")
+    parser.add_argument("--modules", nargs="+", default=STARTUP_MODULES,
+                        help="Modules to import (default: modules of "
+                        "src/algorithm.py)")
+    parser.add_argument("--top", type=int, default=15,
+                        help="Number of packages and modules listed")
+    args = parser.parse_args()
+
+    times = importTimes(args.modules)
+    ownTotal = sum(own for __, own, __ in times)
+
+    print(f"{len(times)} modules imported in {ownTotal:.2f} s\n")
+    print(f"{'package':<30} {'own [s]':>9} {'share':>7}")
+    for package, own in perPackage(times)[:args.top]:
+        print(f"{package:<30} {own:9.3f} {own / ownTotal:7.1%}")
+
+    print(f"\n{'module':<50} {'cumulative [s]':>15}")
+    for name, __, cumulative in sorted(times, key=lambda t: -t[2])[:args.top]:
+        print(f"{name:<50} {cumulative:15.3f}")
+
+    loaded = sorted({name.split(".")[0] for name, __, __ in times} &
+                    set(DEFERRED_PACKAGES))
+    print()
+    if loaded:
+        print(f"FAIL: deferred packages imported at startup: {', '.join(loaded)}")
+        sys.exit(1)
+    print("OK: no deferred packages imported at startup")
@@ -12,38 +12,77 @@ logger.debug("AppLogger has been initialized")
 
 
 import os 
+import time
 from configparser import ConfigParser
 import zipfile
-import pickle
-import copy
 
 # own libs
 from libs.pomoLib import evaluation
 from libs.pomoLib.datatypes import sampleType, dcSpecies, dcTreshold, pathComp
 from libs.pomoLib import pomoUtils 
+from libs.pomoLib import pipeline
+from libs.pomoLib import watcher
+from libs.pomoLib import registry
+from libs.pomoLib import journal
+from libs.pomoLib import prefilter
 
 from libs.pomoLib.segmentation import segmenter
+from libs.pomoLib.segmentation import utils as segUtils
 from libs.pomoLib import classifier
  
 
 class PomoAI:
-    def __init__(self, config:ConfigParser,version):
+    def __init__(self, config:ConfigParser,version, loadModels = True,
+                 resetStale = True):
         self.config = config
         self.version = version
         
         logger.info(f"Initialize PomoAI {self.version}")
         
-        # Create evaluatedSamples if ParallelEvaluation is True
-        if not os.path.exists('evaluatedSamples.txt'):
-            logger.debug("Create evaluatedSamples.txt")
-            with open('evaluatedSamples.txt', 'w'): pass
+        # Registry of the evaluated samples. Samples of evaluatedSamples.txt
+        # are imported on first use.
+        self.registry = registry.SampleRegistry(self.config.get("MAIN", "PathRegistry",
+                                                                fallback="evaluatedSamples.db"))
+        # Samples of crashed evaluations have to be evaluated again. Not done
+        # by the worker processes, as they share the registry with the main
+        # process.
+        if resetStale:
+            self.registry.resetStale()
         
-        self.seg = self.initSeg()
-        self.classif = self.initClassif()
+        # Models are loaded on first use if loadModels is False (e.g. main 
+        # process of the worker pool)
+        self.seg = None
+        self.classif = None
+        if loadModels:
+            self.loadModels()
         
         self.lstOpenSamples: list[evaluation.Evaluator] = []
+        # Checkpoint journals of the open samples (see journal.py)
+        self.journals: dict = {}
+        # Models of resumed samples differing from the current ones
+        self.otherModels: dict = {}
         
+        # Watcher of the input folder (created on first check for new sample)
+        self.watcher = None
+        # Elements of the input folder to check for new samples: changed 
+        # elements and open samples which have not been taken yet. Evaluated
+        # elements and elements which are no (complete) sample are dropped
+        # until they change again.
+        self.setCandidates: set = set()
         
+        # Pipelined evaluation of the img regions (see pipeline.py)
+        self.pipeline = None
+        if self.config.getboolean("PIPELINE", "Enabled", fallback=False):
+            logger.info("Use pipelined evaluation of img regions")
+            self.pipeline = pipeline.RegionPipeline.fromConfig(self.config)
+        
+        
+        
+    def loadModels(self):
+        if self.seg is None:
+            self.seg = self.initSeg()
+        if self.classif is None:
+            self.classif = self.initClassif()
         
     def checkForNewSample(self):
         """
@@ -59,98 +98,159 @@ class PomoAI:
 
         """
         try:
-            # Check if any element in folder
-           if len(os.listdir(self.config.get('MAIN', 'PathSamplesIn'))):
-                # Load evaluated samples
-                with open('evaluatedSamples.txt', 'r', encoding="utf-8") as fd:
-                    listEvaluatedSamples = [line.replace('\n', '') for line in fd]
-                    
-                for elem in os.listdir(self.config.get('MAIN', 'PathSamplesIn')):
-                    # check wether elem contains character that looks like a dot in the middle. If so sample is corrupted
-                    if ("" in elem) or ("_______" in elem):
-                        continue
+            # Only new or changed elements are checked. The watcher reports 
+            # all elements every ResyncTime, files added inside of a sample
+            # folder (e.g. its images folder) don't change the input folder 
+            # and are noticed with the resync.
+            self.__addCandidates(self.watchInput())
+            
+            entries = self.watcher.entries
+            
+            for elem in sorted(self.setCandidates):
+                # Checked once per change
+                self.setCandidates.discard(elem)
                 
-                    # Check if sample already has been evaluated
-                    root, ext = os.path.splitext(elem)
-                    if root in listEvaluatedSamples:
-                        continue
+                # check wether elem contains character that looks like a dot in the middle. If so sample is corrupted
+                if ("" in elem) or ("_______" in elem):
+                    continue
+                
+                # Check if sample already has been evaluated or is 
+                # evaluated by another process
+                root, ext = os.path.splitext(elem)
+                if not self.registry.isOpen(root):
+                    continue
+                
+                # Check if sample is folder, raw stack or zipped folder
+                if entries[elem]:
+                    # Check if folder is a sample folder
+                    tempPath = os.path.join(self.config.get("MAIN", "PathSamplesIn"), 
+                                            elem, "analysis")
                     
-                    # Check if sample is folder, raw stack or zipped folder
-                    if os.path.isdir(os.path.join(self.config.get("MAIN", "PathSamplesIn"), elem)):
-                        # Check if folder is a sample folder
-                        tempPath = os.path.join(self.config.get("MAIN", "PathSamplesIn"), 
-                                                elem, "analysis")
-                        
-                        if not os.path.isdir(os.path.join(tempPath)):
-                            continue
+                    if not os.path.isdir(os.path.join(tempPath)):
+                        continue
 
-                        
-                        ascFile = [file for file in os.listdir(tempPath) if
-                                   file.endswith("asc.txt")]
-                        
-                        if not ascFile:
-                            logger.debug("Sample without analysis file. Could not evaluate!")
-                            continue
-                            
-                            
-                        tempPath = os.path.join(self.config.get("MAIN", "PathSamplesIn"), 
-                                                elem, "images")
-                        
-                        if not os.path.isdir(os.path.join(tempPath)):
-                            logger.debug("Sample without images folder. Could not evaluate!")
-                            continue
-                            
-                        return {"sampleType": sampleType.folder, "pathSample": elem}
                     
+                    ascFile = [file for file in os.listdir(tempPath) if
+                               file.endswith("asc.txt")]
+                    
+                    if not ascFile:
+                        logger.debug("Sample without analysis file. Could not evaluate!")
+                        continue
                         
-                    elif elem.endswith(".tif") or elem.endswith("asc.txt"):
-                        
-                        stringSplit = pomoUtils.getPathInfo(elem)
                         
-                        # Check if elem is part of an unfinished sample
-                        for sample in self.lstOpenSamples:
-                            if (sample.barcode == stringSplit[pathComp.barcode.value] and
-                                sample.sampleDateTime == stringSplit[pathComp.dateTime.value] and
-                                sample.device == stringSplit[pathComp.device.value]):
-                                
-                                    logger.info(f"Continue evaluation of sample {sample.nameSample}")
-                                    sample.active = True
-                                    return None
+                    tempPath = os.path.join(self.config.get("MAIN", "PathSamplesIn"), 
+                                            elem, "images")
+                    
+                    if not os.path.isdir(os.path.join(tempPath)):
+                        logger.debug("Sample without images folder. Could not evaluate!")
+                        continue
                         
-                        # Check if interrupted sample (unexpected closing of PomoAI)
-                        logger.debug("Check for interrupted sample")
+                    if not self.registry.claim(root):
+                        continue
+                    return {"sampleType": sampleType.folder, "pathSample": elem}
+                
+                    
+                elif elem.endswith(".tif") or elem.endswith("asc.txt"):
+                    
+                    stringSplit = pomoUtils.getPathInfo(elem)
+                    
+                    # Check if elem is part of an unfinished sample. The
+                    # sample is evaluated with the other active samples.
+                    openSample = next((sample for sample in self.lstOpenSamples if
+                                       sample.barcode == stringSplit[pathComp.barcode.value] and
+                                       sample.sampleDateTime == stringSplit[pathComp.dateTime.value] and
+                                       sample.device == stringSplit[pathComp.device.value]),
+                                      None)
+                    if openSample:
+                        if not openSample.active:
+                            logger.info(f"Continue evaluation of sample {openSample.nameSample}")
+                        openSample.active = True
+                        continue
+                    
+                    # Check if interrupted sample (unexpected closing of PomoAI)
+                    logger.debug("Check for interrupted sample")
+                    
+                    sampleName = (f"{stringSplit[pathComp.dateTime.value]}"
+                                  f"_{stringSplit[pathComp.barcode.value]}")
+                    
+                    pathEvalOut = self.config.get("MAIN", "PathEvalOut")
+                    
+                    if os.path.isdir(os.path.join(pathEvalOut, sampleName, 
+                                                  "temp")):
                         
-                        sampleName = (f"{stringSplit[pathComp.dateTime.value]}"
-                                      f"_{stringSplit[pathComp.barcode.value]}")
+                        reloadedSample = self.reloadSample(pathEvalOut, 
+                                                           sampleName)
                         
-                        pathEvalOut = self.config.get("MAIN", "PathEvalOut")
+                        # Add loaded sample to active list. It may have 
+                        # been saved while inactive.
+                        reloadedSample.active = True
+                        self.lstOpenSamples.append(reloadedSample)
+                        continue
                         
-                        if ((sampleName in os.listdir(pathEvalOut)) and 
-                            ("temp" in os.listdir(os.path.join(pathEvalOut,
-                                                               sampleName)))):
-                            
-                            reloadedSample = self.reloadSample(pathEvalOut, 
-                                                               sampleName)
-                            
-                            # Add loaded sample to active list
-                            self.lstOpenSamples.append(reloadedSample)
-                            return None
-                            
-                            
-                        return {"sampleType": sampleType.file, "pathSample": elem}
                         
-                    elif zipfile.is_zipfile(os.path.join(self.config.get("MAIN", "PathSamplesIn"), elem)):
-                        with zipfile.ZipFile(os.path.join(self.config.get("MAIN", "PathSamplesIn"), elem), 'r') as f:
-                            for name in f.namelist():
-                                if name.endswith('/'):
-                                    folder_name = name.split('/')[0]
-                                    if folder_name + "/analysis/" in f.namelist():
-                                        return {"sampleType": sampleType.zipped, "pathSample": elem}
+                    return {"sampleType": sampleType.file, "pathSample": elem}
+                    
+                elif zipfile.is_zipfile(os.path.join(self.config.get("MAIN", "PathSamplesIn"), elem)):
+                    isSample = False
+                    with zipfile.ZipFile(os.path.join(self.config.get("MAIN", "PathSamplesIn"), elem), 'r') as f:
+                        names = set(f.namelist())
+                        for name in names:
+                            if name.endswith('/'):
+                                folder_name = name.split('/')[0]
+                                if folder_name + "/analysis/" in names:
+                                    isSample = True
+                                    break
+                                
+                    if isSample and self.registry.claim(root):
+                        return {"sampleType": sampleType.zipped, "pathSample": elem}
 
-                            
+                        
         except FileNotFoundError as e:
             logger.error(e)
             
+    def watchInput(self, timeout: float = 0):
+        """
+        Returns the names of the elements of the input folder that have 
+        changed since the last call. Waits up to timeout seconds for a change.
+        """
+        if self.watcher is None:
+            self.watcher = watcher.createWatcher(self.config.get("MAIN", "PathSamplesIn"),
+                                                 self.config.getfloat("MAIN", "ResyncTime", 
+                                                                      fallback=60.0),
+                                                 self.config.getboolean("MAIN", "UseInotify", 
+                                                                        fallback=True))
+            # First call: all elements are new
+            return set(self.watcher.entries)
+        
+        if timeout > 0:
+            return self.watcher.wait(timeout)
+        return self.watcher.poll()
+        
+    def waitForChanges(self, timeout: float):
+        """
+        Waits up to timeout seconds for a change of the input folder. The 
+        changed elements are checked again by the next checkForNewSample.
+
+        Returns
+        -------
+        bool
+            True if the input folder has changed
+        """
+        changed = self.watchInput(timeout)
+        self.__addCandidates(changed)
+        return bool(changed)
+        
+    def __addCandidates(self, changed: set):
+        """
+        Adds the changed elements to the elements to check for new samples
+        (removed elements are dropped)
+        """
+        for elem in changed:
+            if elem in self.watcher.entries:
+                self.setCandidates.add(elem)
+            else:
+                self.setCandidates.discard(elem)
+        
     def loadPollenTreshold(self, pathPollenTreshold):
         if not os.path.isfile(pathPollenTreshold):
             logger.error(f"Could not find {pathPollenTreshold}")
@@ -189,6 +289,8 @@ class PomoAI:
         return pollenSpecies
             
     def createNewSampleEvaluator(self, sampleInfo):
+        self.loadModels()
+        
         # Read config for saving of image stacks
         if not 0 <= self.config.getint("MAIN", "SaveStacks") <= 2:
             logger.error("SaveStack in config.ini must be between 0-2")
@@ -209,65 +311,147 @@ class PomoAI:
                                          self.config.get("MAIN", "DeviceType"),
                                          self.config.get("MAIN", "Name"),
                                          self.config.get("MAIN", "SerialNumber"),
-                                         self.version)
+                                         self.version,
+                                         self.config.getint("CLASSIF", "BatchSize",
+                                                            fallback=1),
+                                         self.config.getfloat("CLASSIF", "MaxDelay",
+                                                              fallback=0.0),
+                                         self.config.getboolean("OUTPUT", "IncrementalArchive",
+                                                                fallback=False),
+                                         self.config.get("OUTPUT", "SegMaskFormat",
+                                                         fallback="dense"),
+                                         prefilter.EmptyRegionFilter.fromConfig(self.config),
+                                         self.config.get("OUTPUT", "OverlayPolicy",
+                                                         fallback="always"),
+                                         self.config.get("OUTPUT", "OverlayFormat",
+                                                         fallback="raster"))
         
         self.saveSamplePickle(evaluator)
+        
+        # Sample may have been claimed by another process (worker pool)
+        self.registry.markInProgress(evaluator.nameSample)
             
         # Add sample to active list     
         self.lstOpenSamples.append(evaluator)
         
+        return evaluator
+        
+    def runSample(self, sample: evaluation.Evaluator):
+        """
+        Evaluates the img regions of the sample until the end of the sample
+        is reached or no new img region is available at the moment.
+
+        Returns
+        -------
+        numRegions : int
+            Number of evaluated img regions
+
+        """
+        numRegions = 0
+        while sample.active:
+            if self.pipeline:
+                # Evaluates all currently available regions
+                numRegions += self.pipeline.run(sample, self.saveSamplePickle)
+                imgRegion = None
+            else:
+                # Group regions to segmentate them in one forward pass
+                imgRegion = sample.nextImageRegions(self.seg.batchSize)
+            if imgRegion:
+                sample.analyzeRegions(imgRegion)
+                self.saveSamplePickle(sample)
+                numRegions += len(imgRegion)
+            else:
+                if sample.pendingRegions():
+                    # Saving the waiting regions removes them from the input
+                    # folder, the end of the sample waits for them
+                    sample.flushRegions()
+                    self.saveSamplePickle(sample)
+                    sample.active = True
+                    continue
+                
+                if sample.endOfSample:
+                    sample.sampleEnd()
+                    self.addToEvalList(sample)
+                    # Temp folder has been removed by sampleEnd
+                    self.journals.pop(sample.sampleDateTime + "_" + sample.barcode, 
+                                      None)
+                    
+                    self.lstOpenSamples.remove(sample)
+                else:
+                    logger.info(f"Sample {sample.nameSample} set to inactive")
+                    logger.info("Waiting for new sample or new img region")
+                    sample.active = False
+                    
+        return numRegions
+        
     
     def saveSamplePickle(self, evaluator):
         logger.debug("Save sample in temp folder")
-        # Save instance as pickle in case of unexpeced errors
-        # Can't pickle segmenter and classifier. Save path of model instead                                   
-        evalTemp = copy.copy(evaluator)
-        evalTemp.segmenter = evalTemp.segmenter.pathModel
-        evalTemp.classifier = evalTemp.classifier.pathModel
-        
-        with open(os.path.join(evalTemp._pathOutTemp, 
-                               evalTemp.sampleDateTime + "_" +
-                               evalTemp.barcode + "_sample.pkl"), "wb") as f:
-            pickle.dump(evalTemp, f)
-            
-        del evalTemp
+        # Save changes of the sample in case of unexpeced errors
+        self.__getJournal(evaluator).checkpoint(evaluator)
+        
+    def __getJournal(self, evaluator):
+        sampleName = evaluator.sampleDateTime + "_" + evaluator.barcode
+        if sampleName not in self.journals:
+            self.journals[sampleName] = self.__createJournal(evaluator._pathOutTemp,
+                                                             sampleName)
+        return self.journals[sampleName]
+    
+    def __createJournal(self, pathTemp, sampleName):
+        return journal.CheckpointJournal(pathTemp, sampleName,
+                                         self.config.getint("MAIN", "CheckpointCompaction", 
+                                                            fallback=100))
     
     def reloadSample(self, pathEvalOut, sampleName):
         logger.info(f"Reload sample {sampleName}")
+        start = time.time()
         # Load pickled instance of sample
         pathPickles = os.path.join(pathEvalOut, sampleName, "temp")
         
+        # Objects of the regions are loaded on first access
         logger.debug("Load instance of sample from temp dir")
-        sample = pickle.load(open(os.path.join(pathPickles, 
-                                               f"{sampleName}_sample.pkl"), "rb"))
+        sampleJournal = self.__createJournal(pathPickles, sampleName)
+        sample = sampleJournal.load()
+        self.journals[sampleName] = sampleJournal
         
-        # Check if model version is still the same
+        # Continue with the models the sample has been started with
         logger.debug("Init seg/classif models")
-        if not sample.segmenter == self.seg.pathModel:
-            logger.debug("Continue with different seg model")
-            # Laden des ursprünglichen Models könnte noch implementiert werden
-            
-
-        if not sample.classifier == self.classif.pathModel:
-            logger.debug("Continue with different classif model")
-            # Laden des ursprünglichen Models könnte noch implementiert werden
-            
-        sample.segmenter = self.seg
-        sample.classifier = self.classif
-            
-        # Load instances of evaluated image regions
-        logger.debug("Load img regions from temp folder")
-        sample.lstImgRegions = [pickle.load(open(os.path.join(pathPickles, 
-                                                              regPkl), "rb")) 
-                                for regPkl in os.listdir(os.path.join(pathPickles)) 
-                                if not regPkl.endswith("_sample.pkl")]
+        self.loadModels()
+        sample.segmenter = self.__getModel(sample.segmenter, self.seg, 
+                                           self.initSeg)
+        sample.classifier = self.__getModel(sample.classifier, self.classif, 
+                                            self.initClassif)
+        
+        end = time.time()
+        logger.info(f"Resumed sample {sampleName} with "
+                    f"{len(sample.lstImgRegions)} img regions "
+                    f"({(end - start):.2f} s)")
         
         return sample 
         
     
+    def __getModel(self, pathModel, currentModel, initModel):
+        """
+        Returns the model with the given path. Loads it (once) if it is not
+        the current model. Continues with the current model if the model 
+        can't be loaded.
+        """
+        if pathModel == currentModel.pathModel:
+            return currentModel
+        
+        if pathModel not in self.otherModels:
+            logger.info(f"Sample has been started with model {pathModel}")
+            try:
+                self.otherModels[pathModel] = initModel(pathModel)
+            except Exception as e:
+                logger.warning(f"Could not load model {pathModel} ({e}). "
+                               f"Continue with {currentModel.pathModel}")
+                self.otherModels[pathModel] = currentModel
+                
+        return self.otherModels[pathModel]
+        
     def addToEvalList(self, sample: evaluation.Evaluator):
-        with open('evaluatedSamples.txt', 'a', encoding="utf-8") as fd:
-            fd.write("\n" + sample.nameSample)
+        self.registry.markDone(sample.nameSample)
             
     
         
@@ -277,7 +461,8 @@ class PomoAI:
         
         # Initialize segmenter
         logger.debug("Load segmenter config")
-        segConfig = segmenter.PollenConfig()
+        segConfig = segmenter.PollenConfig(self.config.getint("SEG", "BatchSize",
+                                                              fallback=1))
 
         logger.debug("Set segmenter config to values from config.ini")
         segConfig.DETECTION_MIN_CONFIDENCE = self.config.getfloat("SEG", "SegmentTresh")
@@ -285,17 +470,46 @@ class PomoAI:
         logger.debug("Get seg class names from config.ini")
         classNames = self.config.get("SEG", "ClassNames").split(",")
 
+        # Implementation of the resizing of img regions and masks
+        resizeBackend = self.config.get("SEG", "ResizeBackend", fallback="skimage")
+        logger.debug(f"Set resize backend of segmenter to {resizeBackend}")
+        segUtils.set_resize_backend(resizeBackend)
+
+        # Segmentate img regions in overlapping tiles (native resolution)
+        # Cascade: tiles are only segmentated where the whole region has
+        # candidates
+        cascade = self.config.getboolean("SEG", "Cascade", fallback=False)
+        tileSize = 0
+        if self.config.getboolean("SEG", "Tiled", fallback=False) or cascade:
+            tileSize = self.config.getint("SEG", "TileSize", 
+                                          fallback=int(segConfig.IMAGE_MAX_DIM))
+            logger.debug(f"Segmentate img regions in tiles of {tileSize} px")
+        tileOverlap = self.config.getint("SEG", "TileOverlap", fallback=128)
+        cascadeCrowded = self.config.getint("SEG", "CascadeCrowded", 
+                                            fallback=20)
+        cascadeDim = self.config.getint("SEG", "CascadeDim", fallback=512)
+
+        # Masks only for pollen, spores and fragments
+        selectiveMasks = self.config.getboolean("SEG", "SelectiveMasks", 
+                                                fallback=False)
+
         logger.info("Initialize segmenter")
-        return segmenter.PomoSegmentation(path, segConfig, classNames)
+        return segmenter.PomoSegmentation(path, segConfig, classNames,
+                                          tileSize, tileOverlap, 
+                                          selectiveMasks, cascade, 
+                                          cascadeCrowded, cascadeDim)
         
         
     def initClassif(self, path = None):
         if not path:
             path = self.config.get("CLASSIF", "ModelClassifPath")
             
+        uint8Input = self.config.getboolean("CLASSIF", "Uint8Input", 
+                                            fallback=False)
+        
         # Initialize classifier
         logger.info("Initialize classifier")
-        pomoClassifier = classifier.PomoClassification(path)
+        pomoClassifier = classifier.PomoClassification(path, uint8Input)
 
         pathPollenTreshold = os.path.join("src/config", 
                                           "tresholdPollen_" + 
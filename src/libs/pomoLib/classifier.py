@@ -19,8 +19,35 @@ logger.debug("ClassifLogger has been initialized")
 
 import cv2
 import numpy as np
+import tensorflow as tf
 from tensorflow.keras import models
 import os
+import time
+
+from libs.pomoLib import liteModel
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def uint8InputModel(model):
+    """
+    Returns the model with a single channel uint8 input [N, H, W, 1] (the 
+    gray object images of cutObj). The channels are replicated and the 
+    values scaled to 0..1 in the graph, with the same float32 operations as
+    PomoClassification.prepareFloatInput.
+    """
+    height, width = model.input_shape[1:3]
+    inputs = tf.keras.Input(shape = (height, width, 1), dtype = tf.uint8,
+                            name = "obj_uint8")
+    imgRgb = tf.keras.layers.Lambda(
+        lambda img: tf.image.grayscale_to_rgb(tf.cast(img, tf.float32) / 255.0),
+        name = "gray_to_rgb")(inputs)
+    return models.Model(inputs, model(imgRgb), name = model.name + "_uint8")
 
 
 """
@@ -32,7 +59,7 @@ Classes
 
 class PomoClassification:
     
-    def __init__(self, pathModel):
+    def __init__(self, pathModel, uint8Input: bool = False):
         self.pathModel = pathModel
         
         self.speciesNames: list = []
@@ -47,20 +74,76 @@ class PomoClassification:
                 logger.warning("Could not get version of classifier")
                 self._modelVersion = "vX.X"
             logger.info(f"Load classifier model: {tail}")
-            # Load model
-            self._model = models.load_model(pathModel)
+            # Load model. TFLite models (quantizeModels.py) are used with the
+            # same predict interface.
+            if pathModel.endswith(".tflite"):
+                self._model = liteModel.LiteModel(pathModel)
+                if uint8Input:
+                    logger.info("TFLite classifier keeps its float input")
+                    uint8Input = False
+            else:
+                self._model = models.load_model(pathModel)
+                if uint8Input:
+                    self._model = uint8InputModel(self._model)
             
         else:
             logger.error("File/path of classifier model is not existing")
             raise ValueError("File/path of classifier model is not existing")
+        
+        # Gray uint8 objects are fed to the model (see uint8InputModel)
+        self.uint8Input = uint8Input
+        
+        # Keras keeps its session per thread. Remember the session holding 
+        # the loaded weights to be able to use the model from other threads.
+        self._session = (None if pathModel.endswith(".tflite") else
+                         tf.compat.v1.keras.backend.get_session())
             
         # Check if classNames numb same as class num in model
         
     def setSpeciesNames(self, Spec:list):
         self.speciesNames = Spec
+        
+    def bindToThread(self):
+        """
+        Makes the loaded model usable in the calling thread. Has to be called 
+        once by every thread (except the one which loaded the model) before 
+        classifyObj is used.
+        """
+        if self._session is not None:
+            tf.compat.v1.keras.backend.set_session(self._session)
              
 
-    def classifyObj(self, cuttedObj, print_klassifikation = False):
+    def prepareInput(self, cuttedObj):
+        """
+        Returns the input of the model for the cutted objects
+        """
+        if self.uint8Input:
+            return self.prepareUint8Input(cuttedObj)
+        return self.prepareFloatInput(cuttedObj)
+    
+    @staticmethod
+    def prepareUint8Input(cuttedObj):
+        """
+        Returns the gray objects as uint8 batch [N, 350, 350, 1]. Objects 
+        with channels have to be gray (equal channels), the first one is 
+        used.
+        """
+        vgg19_image_size = 350
+        
+        if not len(cuttedObj):
+            return np.zeros((0, vgg19_image_size, vgg19_image_size, 1), 
+                            np.uint8)
+        # Views of the objects, copied once by stack
+        imgPred = np.stack([obj if obj.ndim == 2 else obj[..., 0] 
+                            for obj in cuttedObj])
+        return imgPred.astype(np.uint8, copy=False)[..., np.newaxis]
+    
+    @staticmethod
+    def prepareFloatInput(cuttedObj):
+        """
+        Returns the objects as RGB float batch [N, 350, 350, 3] scaled to 
+        0..1 (input of the original model)
+        """
         vgg19_image_size = 350
         
         numImg = len(cuttedObj)
@@ -77,6 +160,10 @@ class PomoClassification:
             
             imgPred[i] = pollePrep
             
+        return imgPred
+
+    def classifyObj(self, cuttedObj, print_klassifikation = False):
+        imgPred = self.prepareInput(cuttedObj)
 
         result = self._model.predict(imgPred)
         
@@ -98,6 +185,117 @@ class PomoClassification:
             
             
         return classifiedObjs
+    
+    
+def setClassifResult(obj, result: dict):
+    """
+    Writes a result of PomoClassification.classifyObj to the given 
+    dcPomoObject
+    """
+    obj.specFolder = result["species"].nameGer
+    
+    obj.clfScore = result["hitRate"]
+    obj.clfSpeciesInt = result["index"]
+    obj.clfSpecies = result["species"]
+    
+    obj.clfScoreSec = result["hitRateSecond"]
+    obj.clfSpeciesIntSec = result["indexSecond"]
+    obj.clfSpeciesSec = result["speciesSecond"]
+
+
+class ClassifAccumulator:
+    """
+    Collects the objects of several image regions to classify them together 
+    in one batch instead of one small batch per region.
+    
+    The accumulator is flushed as soon as "batchSize" objects are waiting or
+    the oldest waiting region has been waiting for longer than "maxDelay" 
+    seconds. Regions are returned by flush in the order they have been added,
+    also regions without any objects to classify.
+    """
+    
+    def __init__(self, batchSize: int = 32, maxDelay: float = 10.0):
+        if batchSize < 1:
+            logger.error("Batch size of classification must be at least 1")
+            raise ValueError("Batch size of classification must be at least 1")
+        
+        self.batchSize = batchSize
+        self.maxDelay = maxDelay
+        
+        self._pending: list = []
+        self._numObjs = 0
+        self._timeFirst: float = None
+        
+    def __len__(self):
+        return len(self._pending)
+    
+    def __getstate__(self):
+        # Waiting items are not saved. Their img regions are still in the 
+        # input folder and are evaluated again after a restart.
+        state = self.__dict__.copy()
+        state["_pending"] = []
+        state["_numObjs"] = 0
+        state["_timeFirst"] = None
+        return state
+    
+    @property
+    def numObjs(self):
+        return self._numObjs
+    
+    def items(self):
+        """
+        Returns the waiting items in the order they have been added
+        """
+        return [item for item, lstObjs in self._pending]
+        
+    def add(self, item, objs: list):
+        """
+        Adds an item (e.g. a RegionAnalyzer) and its objects (dcPomoObject)
+        to be classified.
+        """
+        if not self._pending:
+            self._timeFirst = time.time()
+        
+        self._pending.append((item, list(objs)))
+        self._numObjs += len(objs)
+        
+    def timeLeft(self):
+        """
+        Returns the seconds until the deadline of the oldest waiting region
+        or None if no region is waiting.
+        """
+        if not self._pending:
+            return None
+        return max(0.0, self._timeFirst + self.maxDelay - time.time())
+        
+    def ready(self):
+        if not self._pending:
+            return False
+        return self._numObjs >= self.batchSize or self.timeLeft() <= 0
+    
+    def flush(self, classifier: PomoClassification):
+        """
+        Classifies all waiting objects, writes the results to the objects and
+        returns the waiting items in the order they have been added.
+        """
+        pending = self._pending
+        self._pending = []
+        self._numObjs = 0
+        self._timeFirst = None
+        
+        objs = [obj for item, lstObjs in pending for obj in lstObjs]
+        
+        if objs:
+            classifObj = classifier.classifyObj([obj.imgObj for obj in objs])
+            
+            if not len(classifObj) == len(objs):
+                logger.error("Something went wrong during classification!")
+                raise Exception("Something went wrong during classification!")
+                
+            for obj, result in zip(objs, classifObj):
+                setClassifResult(obj, result)
+        
+        return [item for item, lstObjs in pending]
           
 
 
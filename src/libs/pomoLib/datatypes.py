@@ -43,6 +43,8 @@ class imgElemType(Enum):
     tif = "tiff.tif"
     synth = "tiffSYN.png"
     seg = "tiffSEG.png"
+    # Vector overlay (contours of the objects, see segmentation/overlay.py)
+    segVector = "tiffSEGV.json"
     
     
 """
@@ -74,7 +76,8 @@ class dcPomoObject:
     
     imgObj: list = None 
     imgObjStack: list = None
-    segMask: list = field(default_factory=lambda : [])
+    # Run-length encoded mask (see maskCodec.py)
+    segMask: str = field(default = "")
     
     segClass: str = field(default = "")
     segScore: float = field(default = 0.0)
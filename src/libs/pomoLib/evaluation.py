@@ -10,27 +10,38 @@ logger = logging.getLogger("root.EvalLogger")
 logger.debug("EvalLogger has been initialized")
 
 import os
+import io
 import cv2
 import shutil
 import numpy as np
 import skimage.io
 from collections import Counter
 import time
+import copy
+import pickle
 import tifffile
-import pandas as pd
-from lxml import etree as xml
 import xml.etree.ElementTree as ElementTree
-import pickle
 
 #own libs
 from libs.pomoLib import pomoUtils
+from libs.pomoLib import maskCodec
 from libs.pomoLib.datatypes import (sampleType, pathComp, posImg, imgElemType, 
                                     dcPomoObject)
 # removed synthes lib for SYLVA
 from libs.pomoLib.segmentation.segmenter import PomoSegmentation
-from libs.pomoLib.classifier import PomoClassification
-from dateutil.parser import parse
-import pytz
+from libs.pomoLib.segmentation import overlay
+from libs.pomoLib.classifier import (PomoClassification, ClassifAccumulator, 
+                                     setClassifResult)
+from libs.pomoLib.sampleSource import FolderSource, ZipSource
+from libs.pomoLib.outputSink import ArchiveSink
+from libs.pomoLib.prefilter import EmptyRegionFilter
+from libs.pomoLib.lazyImport import LazyModule
+# Only needed for the result files at the end of a sample, imported on first
+# use
+pd = LazyModule("pandas")
+xml = LazyModule("lxml.etree")
+dateParser = LazyModule("dateutil.parser")
+pytz = LazyModule("pytz")
 #from tensorflow.keras import models
 
 
@@ -42,25 +53,82 @@ class RegionAnalyzer:
     """
     
     def __init__(self, pathImg: str, fgBlkSynth: bool = False, 
-                 fgBlkRoughSynth: bool = False):
+                 fgBlkRoughSynth: bool = False, source: FolderSource = None):
 
         self.pathImg: str = pathImg
         self.fgBlkSynth: bool = fgBlkSynth
         self.fgBlkRoughSynth: bool = fgBlkRoughSynth
         
         (self.imgStack, 
-         self.imgSynth) = self.__getStackForAnalyzer()
+         self.imgSynth) = self.__getStackForAnalyzer(source)
         
         self.imgSynthBlk = None
         self.imgSynthBlkRough = None
         self.imgSeg = None
+        # Detections of the overlay if it is not rendered while segmentating
+        self.segResult: dict = None
         self.posImg: posImg() = posImg
         self.imgWidth: int = None
         self.imgHeight: int = None
         self.__getImgSize()
         self.dustPart: int = 0
+        # Region has been skipped by the pre-filter (no segmentation)
+        self.emptyRegion: bool = False
+        # Objects of a reloaded region are loaded on first access
+        self._lstPomoObjsRef = None
         self.lstPomoObjs: list = [dcPomoObject]
         
+    def __setstate__(self, state):
+        # Regions pickled before the objects could be loaded lazily
+        state = dict(state)
+        if "lstPomoObjs" in state:
+            state["_lstPomoObjs"] = state.pop("lstPomoObjs")
+        state.setdefault("_lstPomoObjsRef", None)
+        state.setdefault("emptyRegion", False)
+        state.setdefault("segResult", None)
+        self.__dict__.update(state)
+        
+    @property
+    def lstPomoObjs(self):
+        if self._lstPomoObjsRef is not None:
+            self._lstPomoObjs = self._lstPomoObjsRef.load()
+            self._lstPomoObjsRef = None
+        return self._lstPomoObjs
+    
+    @lstPomoObjs.setter
+    def lstPomoObjs(self, val):
+        self._lstPomoObjsRef = None
+        self._lstPomoObjs = val
+        
+    @property
+    def objsLoaded(self):
+        return self._lstPomoObjsRef is None
+        
+    def setObjsRef(self, ref):
+        """
+        Drops the objects of the region. They are loaded from ref (with a 
+        method load) on the next access of lstPomoObjs.
+        """
+        self._lstPomoObjs = None
+        self._lstPomoObjsRef = ref
+        
+    def getObjsBlob(self):
+        """
+        Returns the pickled objects of the region. Objects which are not 
+        loaded yet are not unpickled.
+        """
+        if self._lstPomoObjsRef is not None:
+            return self._lstPomoObjsRef.read()
+        return pickle.dumps(self._lstPomoObjs, pickle.HIGHEST_PROTOCOL)
+        
+    def getSummary(self):
+        """
+        Returns a copy of the region without its objects
+        """
+        summary = copy.copy(self)
+        summary._lstPomoObjs = None
+        summary._lstPomoObjsRef = None
+        return summary
         
     @property
     def pathImg(self):
@@ -86,14 +154,15 @@ class RegionAnalyzer:
             logger.error("Could not get size of image")
             raise Exception ("Could not get size of image")
     
-    def __getStackForAnalyzer(self):
+    def __getStackForAnalyzer(self, source: FolderSource = None):
         """
         This function checks if the argument is a stack or a synth image.
 
         Parameters
         ----------
-        img : Array of uint8
-            Image to be checked
+        source : FolderSource, optional
+            Source of the sample to read the image from (e.g. a zip archive). 
+            If None, the image is read from pathImg.
 
         Returns
         -------
@@ -103,16 +172,19 @@ class RegionAnalyzer:
             If synth return the synth, otherwise None
 
         """
-        perFail = False
-        while(1):
-            try:
-                img = skimage.io.imread(self.pathImg)
-            except:
-                if not perFail:
-                    logger.warning(f"No permission to load file{self.pathImg}")
-                    perFail = True
-            else:
-                break
+        if source is not None:
+            img = source.readImage(os.path.basename(self.pathImg))
+        else:
+            perFail = False
+            while(1):
+                try:
+                    img = skimage.io.imread(self.pathImg)
+                except:
+                    if not perFail:
+                        logger.warning(f"No permission to load file{self.pathImg}")
+                        perFail = True
+                else:
+                    break
         
 
         if self.pathImg.endswith(".tif"):
@@ -133,16 +205,31 @@ class RegionAnalyzer:
         
         # Removed synthesizer for SYLVA 
         
-    def segmentate(self, pomoSegmenter: PomoSegmentation):
+    def getSegInput(self):
         # Convert image from gray to color (needed for segmentation)
         if not len(self.imgSynth.shape) == 3:
             self.imgSynth = cv2.cvtColor(self.imgSynth, cv2.COLOR_GRAY2RGB)
+        return self.imgSynth
+        
+    def segmentate(self, pomoSegmenter: PomoSegmentation, r: dict = None,
+                   renderOverlay: bool = True):
+        """
+        Segmentates the synth image and cuts the found objects. If r is given
+        (result of an already done detection, e.g. a batch of several 
+        regions), only the results are processed. Without renderOverlay the
+        detections are kept to render the overlay later.
+        """
+        self.getSegInput()
         # Segmentate object from synth img
-        results = pomoSegmenter.detect(self.imgSynth, verbose=0)
-        r = results[0]
+        if r is None:
+            results = pomoSegmenter.detect(self.imgSynth, verbose=0)
+            r = results[0]
         # Create masked image
-        self.imgSeg = pomoSegmenter.maskedImage(self.imgSynth, r, 
-                                                drawDust = False)
+        if renderOverlay:
+            self.imgSeg = pomoSegmenter.maskedImage(self.imgSynth, r, 
+                                                    drawDust = False)
+        else:
+            self.segResult = r
         # # Generate image name
         # self.nameImgSeg = self.__getImgName(imgElemType.seg.value)
         # Count of dust pariticals
@@ -172,16 +259,17 @@ class RegionAnalyzer:
         
         # Extract classif results 
         for i, obj in zip(range(len(objIndex)), classifObj):
-
-            self.lstPomoObjs[objIndex[i]].specFolder = obj["species"].nameGer
+            setClassifResult(self.lstPomoObjs[objIndex[i]], obj)
             
-            self.lstPomoObjs[objIndex[i]].clfScore = obj["hitRate"]
-            self.lstPomoObjs[objIndex[i]].clfSpeciesInt = obj["index"]
-            self.lstPomoObjs[objIndex[i]].clfSpecies = obj["species"]
-            
-            self.lstPomoObjs[objIndex[i]].clfScoreSec = obj["hitRateSecond"]
-            self.lstPomoObjs[objIndex[i]].clfSpeciesIntSec = obj["indexSecond"]
-            self.lstPomoObjs[objIndex[i]].clfSpeciesSec = obj["speciesSecond"]
+    def getClassifObjs(self):
+        """
+        Returns the objects that have to be classified (pollen and spores)
+        """
+        if self.lstPomoObjs is None:
+            return []
+        
+        return [obj for obj in self.lstPomoObjs if 
+                (obj.segClass == "pollen" or obj.segClass == "sporen")]
 
                  
     def createLittleStack(self, pathLittleStack):
@@ -217,11 +305,21 @@ class Evaluator:
     This class represents a sample.
     """
     
+    # Defaults for samples checkpointed before these options existed
+    prefilter = None
+    overlayPolicy = "always"
+    overlayFormat = "raster"
+    _overlayWorker = None
+    
     def __init__(self, sampleInfo: dict, segmenter, classifier, 
                  pathSampleFolder: str, pathEvalOut: str, pathOutAnalysis: str, 
                  saveLittleStacks: bool, evalSynthOnly: bool, saveStacks: int,
                  volStrom: int, carrierTypePlastic: bool, deviceType: str, 
-                 deviceName: str, serialNumber: str, version:str):
+                 deviceName: str, serialNumber: str, version:str,
+                 classifBatchSize: int = 1, classifMaxDelay: float = 0.0,
+                 incrementalArchive: bool = False, segMaskFormat: str = "dense",
+                 prefilter: EmptyRegionFilter = None, 
+                 overlayPolicy: str = "always", overlayFormat: str = "raster"):
         
         self.sampleType: sampleType = sampleInfo.get("sampleType")
         self.segmenter = segmenter
@@ -243,6 +341,30 @@ class Evaluator:
         self.deviceType = deviceType
         self.versionPomoAI = version
         
+        # Format of the SegMask column of the csv file
+        if segMaskFormat not in ("dense", "rle"):
+            logger.error("SegMaskFormat must be dense or rle")
+            raise ValueError("SegMaskFormat must be dense or rle")
+        self.segMaskFormat = segMaskFormat
+        
+        # Skips the segmentation of empty regions (None = segmentate all)
+        self.prefilter = prefilter
+        
+        # Rendering of the segmentation overlays (tiffSEG.png)
+        if overlayPolicy not in overlay.OVERLAY_POLICIES:
+            logger.error("OverlayPolicy must be " + 
+                         ", ".join(overlay.OVERLAY_POLICIES))
+            raise ValueError("OverlayPolicy must be " + 
+                             ", ".join(overlay.OVERLAY_POLICIES))
+        self.overlayPolicy = overlayPolicy
+        if overlayFormat not in overlay.OVERLAY_FORMATS:
+            logger.error("OverlayFormat must be " + 
+                         ", ".join(overlay.OVERLAY_FORMATS))
+            raise ValueError("OverlayFormat must be " + 
+                             ", ".join(overlay.OVERLAY_FORMATS))
+        self.overlayFormat = overlayFormat
+        self._overlayWorker = None
+        
         self.versionClassif = classifier._modelVersion
         self.versionSegment = segmenter._modelVersion
         self.active = True
@@ -251,50 +373,54 @@ class Evaluator:
         self.dustPartTotal = 0
         self.lstDYT = []
         
+        # Collect objects of several regions for classification
+        self.classifAcc: ClassifAccumulator = None
+        if classifBatchSize > 1:
+            self.classifAcc = ClassifAccumulator(classifBatchSize, 
+                                                 classifMaxDelay)
+        
         self.activePomoAI: bool = False
         self.pathStatusASC: str = None
         self.nameSample: str = None
         self.activeImgRegion: str = None
         self.numExistingRegions = 0
+        self.numStartedRegions = 0
         self.lstCreatedSpecFolder = []
         self.lstImgRegions: list[RegionAnalyzer] = []
         self.regIter = None  #Cont. name of region of already eval sample
         self.beginnDerProbenahme: str = None 
         self.endeDerProbenahme: str = None 
         self.stationNumber: str = None
-        self.unzippedPathSample: str = None
+        # Images and analysis files of a folder or zipped sample
+        self.source: FolderSource = None
+        self.__nameStatusASC: str = None
 
         # Get name of element of sample
         if not self.sampleType == sampleType.file:
-            # Unzip sample if zipped
+            # Read zipped sample directly from the archive
             if self.sampleType == sampleType.zipped:
-                logger.info("Unzip sample")
+                logger.info("Open zipped sample")
                 
                 pathZipFile = os.path.join(self.pathSampleFolder, 
                                            sampleInfo.get("pathSample"))
                 
-                pathSample = pomoUtils.unzipProbe(pathZipFile)
-                self.unzippedPathSample = pathSample
+                self.source = ZipSource(pathZipFile)
 
             elif self.sampleType == sampleType.folder:
-                pathSample = sampleInfo.get("pathSample")
+                self.source = FolderSource(os.path.join(self.pathSampleFolder,
+                                                        sampleInfo.get("pathSample")))
             
-            self.pathImgRegionFolder = os.path.join(self.pathSampleFolder, 
-                                                    pathSample, 
-                                                    "images")
+            self.pathImgRegionFolder = os.path.join(self.source.path, "images")
             
                 
             # Check if analysis file exists. Means sample has been evaluated
-            for elem in os.listdir((os.path.join(self.pathSampleFolder, 
-                                                 pathSample, 
-                                                 "analysis"))):
+            for elem in self.source.listAnalysis():
                 
                 if "xml.xml" in elem:
                     print("Processing xml: ", elem)
                     
-                    xml_root = ElementTree.parse(os.path.join(self.pathSampleFolder, 
-                                                      pathSample, "analysis",
-                                                      elem))                   
+                    with self.source.openAnalysis(elem) as f:
+                        xml_root = ElementTree.parse(f)                   
                         
                     if (xml_root.find("./Device") is not None and xml_root.find("./Device").text):
                         self.deviceName = xml_root.find("./Device").text
@@ -317,13 +443,12 @@ class Evaluator:
                         
                 if "asc.txt" in elem:
                     self.evalPast = True
-                    self.pathStatusASC = os.path.join(self.pathSampleFolder, 
-                                                      pathSample, "analysis",
-                                                      elem)
+                    # Copied to the output folder (see below)
+                    self.__nameStatusASC = elem
             
                     # Get name and number of regions
                     lstNameRegions = [elem for elem in 
-                                      os.listdir(self.pathImgRegionFolder)
+                                      self.source.listImages()
                                       if elem.endswith("SYN._FP.png") or 
                                       elem.endswith("SYN.png")]
                     
@@ -371,14 +496,38 @@ class Evaluator:
         # Create the output dir
         self.__createSampleOutputFolder() 
         
-        if self.pathStatusASC is not None:
-            tail, head = os.path.split(self.pathStatusASC)
+        # Result archive built while the sample is evaluated. Not used for
+        # single img regions, as these samples can be resumed after a crash.
+        self.sink: ArchiveSink = None
+        if incrementalArchive and self.sampleType != sampleType.file:
+            self.sink = ArchiveSink(os.path.join(self.pathEvalOut, 
+                                                 self.nameSample + ".zip"),
+                                    os.path.join(self.pathEvalOut, 
+                                                 self.nameSample))
+        # Number of objects and DYT num of every species folder
+        self.__specCount = Counter()
+        self.__specTresh = {}
+        
+        if self.__nameStatusASC is not None:
+            self.pathStatusASC = os.path.join(self.__pathOutAnalysis,
+                                              self.__nameStatusASC)
             
-            shutil.copyfile(self.pathStatusASC, os.path.join(self.__pathOutAnalysis,
-                                                             head))
+            self.source.copyAnalysis(self.__nameStatusASC, self.pathStatusASC)
         
         logger.info(f"Starting evaluation of sample: {self.nameSample}")
         
+    def __getstate__(self):
+        # Can't pickle segmenter and classifier. Save path of model instead
+        state = self.__dict__.copy()
+        state["segmenter"] = getattr(self.segmenter, "pathModel", self.segmenter)
+        state["classifier"] = getattr(self.classifier, "pathModel", self.classifier)
+        # Open archive can't be pickled (only used by not resumable samples)
+        state["sink"] = None
+        # Overlays pending in the background are lost, their detections are
+        # saved (see renderOverlays.py)
+        state["_overlayWorker"] = None
+        return state
+        
     # def getPollenTreshold(self, pathPollenTreshold):
     #     logger.info("Load Treshold")
         
@@ -424,7 +573,12 @@ class Evaluator:
         if not os.path.isdir(self._pathOutTemp):
             os.mkdir(self._pathOutTemp)
     
-    def nextImageRegion(self):
+    def nextImageRegion(self, skip = ()):
+        """
+        Looks for the next image region of the sample and loads it. Regions
+        named in skip are ignored (used by the pipelined mode for regions that
+        are still in progress and not yet removed from the input folder).
+        """
         self.activeImgRegion = None
         # Standalone PomoAI looking at "D:/Pollenmonitor/TestInDir"
         if self.sampleType == sampleType.file:
@@ -433,6 +587,9 @@ class Evaluator:
                 
                 if not elem.endswith(".tif") and not elem.endswith("asc.txt"):
                     continue
+                
+                if elem in skip:
+                    continue
                     
                 # Check if element is from current sample
                 pathInfo = pomoUtils.getPathInfo(elem)
@@ -505,12 +662,17 @@ class Evaluator:
             else:
                 sampleElems = [elem for 
                                elem in 
-                               os.listdir(os.path.join(self.pathImgRegionFolder))
+                               self.source.listImages()
                                if elem.endswith("SYN.png") or 
                                   elem.endswith("SYN._FP.png")]
                 
                 
                 for elem in sampleElems:
+                    # Regions are in progress by their synth img or stack
+                    if (elem in skip or 
+                        pomoUtils.modPath(elem, pathComp.elemType.value, 
+                                          "tiff.tif") in skip):
+                        continue
                     if not self.lstImgRegions:
                         self.activeImgRegion = elem
                         break
@@ -534,10 +696,7 @@ class Evaluator:
                                               "tiff.tif")
                 
                 if stackPath:
-                    if os.path.isfile(os.path.join(self.pathSampleFolder,
-                                                   self.nameSample,
-                                                   "images",
-                                                   stackPath)):
+                    if self.source.hasImage(stackPath):
                         self.activeImgRegion = stackPath
                     else:
                         comp = pomoUtils.getPathInfo(self.activeImgRegion)
@@ -554,22 +713,109 @@ class Evaluator:
                                               self.activeImgRegion)           
               
             # Create instance of imageAnalyser and save add it to lstImgRegion
-            ImgRegion = RegionAnalyzer(pathNewImageRegion)
+            ImgRegion = RegionAnalyzer(pathNewImageRegion, source = self.source)
             return ImgRegion
         else:
             self.active = False
             return None
                     
+    def nextImageRegions(self, num: int):
+        """
+        Loads up to num image regions. Returns less regions if no more
+        regions are available at the moment.
+        """
+        # Regions waiting for classification are not saved yet, their img
+        # stays in the input folder
+        skip = {os.path.basename(reg.pathImg) for reg in self.pendingRegions()}
+        lstImgRegs = []
+        while len(lstImgRegs) < num:
+            imgReg = self.nextImageRegion(skip)
+            if not imgReg:
+                break
+            lstImgRegs.append(imgReg)
+            skip.add(os.path.basename(imgReg.pathImg))
+        
+        # Sample gets inactive on the next call without any region left
+        if lstImgRegs:
+            self.active = True
+            
+        return lstImgRegs
+                    
     def analyzeRegion(self, imgReg: RegionAnalyzer):
+        """
+        Runs all steps of the evaluation of a image region one after another.
+        The single steps are used by the pipelined mode (see pipeline.py) as
+        well.
+        """
+        self.analyzeRegions([imgReg])
+        
+    def analyzeRegions(self, lstImgRegs: list):
+        """
+        Like analyzeRegion, but segmentates all given regions together in as 
+        few forward passes as possible.
+        """
+        for imgReg in lstImgRegs:
+            self.prepareRegion(imgReg)
+        self.segmentRegions(lstImgRegs)
+        
+        if self.classifAcc is None:
+            for imgReg in lstImgRegs:
+                self.classifyRegion(imgReg)
+                self.saveRegion(imgReg)
+            return None
+        
+        # Regions are classified and saved as soon as enough objects are 
+        # collected or the oldest region waits for too long
+        for imgReg in lstImgRegs:
+            self.classifAcc.add(imgReg, imgReg.getClassifObjs())
+        if self.classifAcc.ready():
+            self.flushRegions()
+            
+    def pendingRegions(self):
+        """
+        Returns the regions waiting in the classification accumulator
+        """
+        if self.classifAcc is None:
+            return []
+        return self.classifAcc.items()
+        
+    def flushRegions(self):
+        """
+        Classifies and saves all regions waiting in the classification
+        accumulator.
+        """
+        for imgReg in self.classifyPending():
+            self.saveRegion(imgReg)
+            
+    def classifyPending(self):
+        """
+        Classifies all objects waiting in the classification accumulator. 
+        Returns the regions of the objects in the order they have been added.
+        """
+        if self.classifAcc is None or not len(self.classifAcc):
+            return []
+        
+        numObjs = self.classifAcc.numObjs
+        start = time.time()
+        lstImgRegs = self.classifAcc.flush(self.classifier)
+        end = time.time()
+        if numObjs:
+            logger.info(f"Classify {numObjs} objects of {len(lstImgRegs)} "
+                        f"regions ({(end - start):.0f} s)")
+        return lstImgRegs
+        
+    def prepareRegion(self, imgReg: RegionAnalyzer):
         if not isinstance(imgReg, RegionAnalyzer):
             raise TypeError("Given object is no 'RegionAnalyzer'")
         
+        self.numStartedRegions += 1
+        
         head, tail = os.path.split(imgReg.pathImg)
         if self.numExistingRegions != 0:
-            logger.info(f"Analyse region({len(self.lstImgRegions) + 1}/"
+            logger.info(f"Analyse region({self.numStartedRegions}/"
                         f"{self.numExistingRegions}): {tail}")
         else:
-            logger.info(f"Analyse region({len(self.lstImgRegions) + 1}):"
+            logger.info(f"Analyse region({self.numStartedRegions}):"
                         f" {tail}")
         
         # Extract position of img region
@@ -586,24 +832,57 @@ class Evaluator:
         end = time.time()
         logger.info(f"Synthezise ({(end - start):.0f} s)")
         
+    def segmentRegion(self, imgReg: RegionAnalyzer):
+        self.segmentRegions([imgReg])
+        
+    def segmentRegions(self, lstImgRegs: list):
+        # Regions without objects are not segmentated. They are saved and 
+        # counted for the analysed volume like all other regions.
+        if self.prefilter is not None:
+            for imgReg in lstImgRegs:
+                imgReg.emptyRegion = self.prefilter.isEmpty(imgReg.imgSynth)
+        lstSegRegs = [imgReg for imgReg in lstImgRegs if not imgReg.emptyRegion]
+        
+        # Otherwise the overlay is created when the region is saved
+        renderOverlay = (self.overlayPolicy == "always" and 
+                         self.overlayFormat == "raster")
         
         # Segmentate
         start = time.time()
-        imgReg.segmentate(self.segmenter)
+        results = iter(self.segmenter.detect_batch([imgReg.getSegInput() for 
+                                                    imgReg in lstSegRegs])
+                       if lstSegRegs else [])
+        for imgReg in lstImgRegs:
+            if imgReg.emptyRegion:
+                logger.info("Skip segmentation of empty region")
+                imgReg.segmentate(self.segmenter, 
+                                  PomoSegmentation.emptyResult(),
+                                  renderOverlay)
+            else:
+                imgReg.segmentate(self.segmenter, next(results), 
+                                  renderOverlay)
         end = time.time()
-        logger.info(f"Segmentate ({(end - start):.0f} s)")
+        if len(lstImgRegs) > 1:
+            logger.info(f"Segmentate {len(lstImgRegs)} regions "
+                        f"({(end - start):.0f} s)")
+        else:
+            logger.info(f"Segmentate ({(end - start):.0f} s)")
         
+    def classifyRegion(self, imgReg: RegionAnalyzer):
+        if not self.__hasClassifObjs(imgReg):
+            return None
         
-        if (imgReg.lstPomoObjs is not None) and any(((i.segClass == "pollen") or 
-                                                     (i.segClass == "sporen")) 
-                                                    for i in imgReg.lstPomoObjs):
-          
-            # Classify objects
-            start = time.time()
-            imgReg.classify(self.classifier)
-            end = time.time()
-            logger.info(f"Classify ({(end - start):.0f} s)")
-            
+        # Classify objects
+        start = time.time()
+        imgReg.classify(self.classifier)
+        end = time.time()
+        logger.info(f"Classify ({(end - start):.0f} s)")
+        
+    def __hasClassifObjs(self, imgReg: RegionAnalyzer):
+        return len(imgReg.getClassifObjs()) > 0
+        
+    def saveRegion(self, imgReg: RegionAnalyzer):
+        if self.__hasClassifObjs(imgReg):
             species = []
             for obj in imgReg.lstPomoObjs:
                 # if object is undefined (Score lower than Threshold)
@@ -654,6 +933,10 @@ class Evaluator:
                 objImgName += ".png"
                     
                 species.append(obj.specFolder)
+                if self.sink is not None:
+                    self.__specCount[obj.specFolder] += 1
+                    if obj.specFolder not in self.__specTresh:
+                        self.__specTresh[obj.specFolder] = obj.clfSpecies.default.num
                 
                 # Save image
                 logger.debug(f"Save image {objImgName}")
@@ -684,6 +967,11 @@ class Evaluator:
                 logger.info("Save little stacks")
                 # Create little stacks
                 imgReg.createLittleStack(self.__pathOutLittleStack)
+                
+            # Objects of species that can't be affected by the DYT anymore
+            # are moved to the result archive
+            if self.sink is not None:
+                self.__moveFinalSpecies(species)
         else:
             logger.info("No objects found")
         
@@ -700,18 +988,42 @@ class Evaluator:
         
         # Save synthesized image
         logger.debug("Save synth image")
-        cv2.imwrite(os.path.join(self.__pathOutImg, nameImgSynth), 
-                    imgReg.imgSynth)
+        self.__writeImage(os.path.join(self.__pathOutImg, nameImgSynth), 
+                          imgReg.imgSynth)
         
+        imgSynth = imgReg.imgSynth
         imgReg.imgSynth = nameImgSynth
         
         # Generate seg image name
         nameImgSeg = self.__getImgName(imgReg.pathImg,
                                        imgElemType.seg.value)
-        
-        # Save segmented image
-        logger.debug("Save segmented image")
-        cv2.imwrite(os.path.join(self.__pathOutImg, nameImgSeg), imgReg.imgSeg)
+        pathImgSeg = os.path.join(self.__pathOutImg, nameImgSeg)
+        
+        if imgReg.segResult is None:
+            # Save segmented image
+            logger.debug("Save segmented image")
+            self.__writeImage(pathImgSeg, imgReg.imgSeg)
+        elif self.overlayFormat == "vector":
+            # Contours of the objects instead of the segmented image. The
+            # name of the segmented image (rendered on demand) is kept.
+            logger.debug("Save contours of segmented image")
+            nameVector = self.__getImgName(imgReg.pathImg,
+                                           imgElemType.segVector.value)
+            self.__writeBytes(os.path.join(self.__pathOutImg, nameVector),
+                              self.segmenter.encodeOverlay(imgReg.segResult,
+                                                           "vector"))
+            imgReg.segResult = None
+        else:
+            # Overlay is rendered later from the saved detections
+            logger.debug("Save detections of segmented image")
+            self.__writeBytes(overlay.resultPath(pathImgSeg), 
+                              self.segmenter.encodeOverlay(imgReg.segResult))
+            if self.overlayPolicy == "background":
+                if self._overlayWorker is None:
+                    self._overlayWorker = overlay.OverlayWorker()
+                self._overlayWorker.submit(self.__renderOverlay, pathImgSeg,
+                                           imgSynth, imgReg.segResult)
+            imgReg.segResult = None
         
         imgReg.imgSeg = nameImgSeg
             
@@ -725,36 +1037,80 @@ class Evaluator:
             (self.saveStacks == 2 and imgReg.lstPomoObjs is not None)):
 
             logger.debug("Save stack image")
-            skimage.io.imsave(os.path.join(self.__pathOutImg, nameImgStack), 
-                              imgReg.imgStack)
+            if self.sink is not None:
+                data = io.BytesIO()
+                tifffile.imwrite(data, imgReg.imgStack)
+                self.sink.writeBytes(os.path.join(self.__pathOutImg, nameImgStack),
+                                     data.getvalue())
+            else:
+                skimage.io.imsave(os.path.join(self.__pathOutImg, nameImgStack), 
+                                  imgReg.imgStack)
            
         imgReg.imgStack = nameImgStack
         
         # Add found count of partical to total count
         self.dustPartTotal += imgReg.dustPart
         
-        # Save instace of img region
+        # Save instace of img region. Saved to temp folder by the checkpoint
+        # of the sample (see journal.py) in case of unexpeced programm error
         self.lstImgRegions.append(imgReg)
         
-        # save instance of img region to temp folder in case of unexpeced 
-        # programm error
-        if self.activePomoAI:
-            with open(os.path.join(self._pathOutTemp,
-                                   (self.sampleDateTime + "_" + 
-                                    self.barcode + "_" + 
-                                    imgReg.posImg.zPos + "_" + 
-                                    imgReg.posImg.xPos + "_" +
-                                    imgReg.posImg.yPos + ".pkl")), "wb") as f:
-                
-                pickle.dump(imgReg, f)
-        
         # Last action: delete img stack
         if self.activePomoAI:
             logger.info("Remove img stack from sample input folder")
-            os.remove(os.path.join(self.pathSampleFolder, 
-                                   self.activeImgRegion))
+            os.remove(imgReg.pathImg)
             
 
+    def __writeImage(self, path, img):
+        """
+        Writes the image to the result archive if it is built incrementally,
+        otherwise to path.
+        """
+        if self.sink is None:
+            cv2.imwrite(path, img)
+            return None
+        
+        success, data = cv2.imencode(os.path.splitext(path)[1], img)
+        if not success:
+            logger.error(f"Could not encode {path}")
+            raise ValueError(f"Could not encode {path}")
+        self.sink.writeBytes(path, data.tobytes())
+        
+    def __writeBytes(self, path, data: bytes):
+        """
+        Like __writeImage for encoded data
+        """
+        if self.sink is None:
+            with open(path, "wb") as f:
+                f.write(data)
+            return None
+        
+        self.sink.writeBytes(path, data)
+        
+    def __renderOverlay(self, pathImgSeg, imgSynth, r):
+        """
+        Renders and writes the overlay (background mode, see OverlayWorker)
+        """
+        if imgSynth.ndim == 2:
+            imgSynth = cv2.cvtColor(imgSynth, cv2.COLOR_GRAY2RGB)
+        self.__writeImage(pathImgSeg, self.segmenter.maskedImage(imgSynth, r))
+        
+    def __moveFinalSpecies(self, species):
+        """
+        Moves the object images (and little stacks) of the given species to 
+        the result archive, if the species can't be affected by the DYT 
+        anymore (see __computeTreshold).
+        """
+        for spec in species:
+            if (spec not in ("Fragment", "Undefined", "NoPollen", "Gammel") and
+                self.__specCount[spec] <= self.__specTresh[spec]):
+                continue
+            
+            self.sink.moveFolder(os.path.join(self.__pathOutClassif, spec))
+            if self.saveLittleStacks:
+                self.sink.moveFolder(os.path.join(self.__pathOutLittleStack, 
+                                                  spec))
+        
     def __computeTreshold(self):
         logger.debug("Compute Treshold")
         
@@ -888,6 +1244,7 @@ class Evaluator:
     
     def createAnalysisFiles(self):
         logger.info("Create analyse files")
+        start = time.time()
         
         # Enable for sylva
         #self.__createJsonOuputFile()
@@ -896,11 +1253,31 @@ class Evaluator:
         self.__createXmlAnalysisFile()
         self.__createCsvFile()
         
+        end = time.time()
+        pathCsv = os.path.join(self.__pathOutCsv, (self.sampleDateTime + "_" + 
+                                                   self.barcode + '_01.csv'))
+        logger.info(f"Analyse files created ({(end - start):.1f} s, csv "
+                    f"{os.path.getsize(pathCsv) / 1e6:.1f} MB, "
+                    f"SegMask {self.segMaskFormat})")
+        
         
         
     def sampleEnd(self):
         logger.info("End of sample reached")
         
+        # Regions waiting for classification must be complete before the 
+        # dynamic treshold is computed
+        self.flushRegions()
+        
+        # Overlays rendered in the background must be in the output
+        if self._overlayWorker is not None:
+            self._overlayWorker.close()
+            self._overlayWorker = None
+        
+        if self.prefilter is not None:
+            numEmpty = sum(reg.emptyRegion for reg in self.lstImgRegions)
+            logger.info(f"Skipped {numEmpty} of {len(self.lstImgRegions)} "
+                        "regions as empty")
         
         self.__computeTreshold()
         
@@ -923,7 +1300,15 @@ class Evaluator:
         shutil.rmtree(self._pathOutTemp)
         
         folder_to_zip = os.path.join(self.pathEvalOut, self.nameSample)
-        zip_file_path = shutil.make_archive(folder_to_zip, 'zip', folder_to_zip)
+        if self.sink is not None:
+            # Only the remaining outputs have to be added
+            start = time.time()
+            zip_file_path = self.sink.finalize()
+            end = time.time()
+            logger.info(f"Finalize result archive ({(end - start):.1f} s, "
+                        f"{self.sink.numBytes / 1e6:.1f} MB)")
+        else:
+            zip_file_path = shutil.make_archive(folder_to_zip, 'zip', folder_to_zip)
         
         zip_file_name = os.path.basename(zip_file_path)
         
@@ -931,7 +1316,8 @@ class Evaluator:
         shutil.move(zip_file_path, destination_path)
         
         shutil.rmtree(folder_to_zip)
-        shutil.rmtree(self.unzippedPathSample, ignore_errors=True)
+        if self.source is not None:
+            self.source.close()
 
         print(f"Folder '{folder_to_zip}' zipped and moved to '{destination_path}'")
         
@@ -1033,8 +1419,10 @@ class Evaluator:
                                     f"{region.imgSynth} {xOff} {yOff} "
                                     f"{wOff} {hOff}|")
                 
-                flattenMask = obj.segMask.flatten().tolist()
-                flattenMask = str(flattenMask).replace("[","").replace("]","").replace(" ","").replace(",","") 
+                if self.segMaskFormat == "rle":
+                    flattenMask = maskCodec.toRle(obj.segMask)
+                else:
+                    flattenMask = maskCodec.toDense(obj.segMask)
                 
                 sortedOut = "--"
                 if obj.sortedOut:
@@ -1220,7 +1608,7 @@ class Evaluator:
 
     def __timestamp_to_datetime(self, timestamp: str):    
         """Returns a given timestamp string from BAA500 XML file as a datetime (for example datetime.datetime(2023, 9, 10, 3, 0, 3))."""
-        ts = parse(timestamp)
+        ts = dateParser.parse(timestamp)
     
         # Sometime, the instrument writes as start time "10:00:03" or "10:01:10" we set minutes and seconds back to 0 
         if ts.time().minute <= 10:
@@ -1229,7 +1617,7 @@ class Evaluator:
         ts = ts.replace(second=0)
 
         ts = self.__convert_datetime_timezone(ts, "Europe/Berlin", "UTC")
-        ts = parse(ts)
+        ts = dateParser.parse(ts)
         return ts.timestamp()
         
     def __createJsonOuputFile(self):
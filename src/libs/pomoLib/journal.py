@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 08:52:05 2026
+
+Checkpoints of a sample in the temp folder. Instead of pickling the whole
+sample after every region, only the new regions are appended to a journal.
+The journal is merged into a snapshot of the sample from time to time.
+"""
+
+import logging
+logger = logging.getLogger("root.JournalLogger")
+logger.debug("JournalLogger has been initialized")
+
+import os
+import pickle
+import struct
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class BlobRef:
+    """
+    Reference to the pickled objects of a region inside of a checkpoint file
+    """
+
+    def __init__(self, path: str, offset: int, length: int):
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(self.length)
+        if len(data) != self.length:
+            raise EOFError(f"Incomplete objects in {self.path} at {self.offset}")
+        return data
+
+    def load(self):
+        return pickle.loads(self.read())
+
+
+class CheckpointJournal:
+    """
+    Checkpoint of an evaluation.Evaluator consisting of two files in the temp
+    folder of the sample:
+
+        <name>_sample.pkl   -> snapshot of the sample (all regions)
+        <name>_journal.pkl  -> records appended since the snapshot
+
+    Both files consist of records. A record starts with the length of its
+    header, followed by the header and the pickled objects of its regions:
+
+        header = (state, region summaries, length of pickled objects)
+
+    The state is the sample without its regions (snapshot) or the dict of
+    its attributes (journal). On reload only the headers are read, the
+    objects of the regions are loaded on first access (see
+    RegionAnalyzer.lstPomoObjs). A record that is incomplete due to a crash
+    is detected and dropped on reload.
+    """
+
+    _MAGIC = b"POMOCKPT1\n"
+    _LENGTH = struct.Struct("<Q")
+
+    def __init__(self, pathTemp: str, name: str, compactEvery: int = 100):
+        self.pathSnapshot = os.path.join(pathTemp, f"{name}_sample.pkl")
+        self.pathJournal = os.path.join(pathTemp, f"{name}_journal.pkl")
+        self.compactEvery = compactEvery
+
+        # Number of regions in snapshot and snapshot + journal
+        self._numSnapshot: int = None
+        self._numWritten = 0
+
+    def checkpoint(self, sample):
+        """
+        Saves the changes of the sample since the last checkpoint
+        """
+        numRegions = len(sample.lstImgRegions)
+        if (self._numSnapshot is None or
+            numRegions - self._numSnapshot >= self.compactEvery):
+            self.compact(sample)
+            return None
+
+        state = sample.__getstate__()
+        del state["lstImgRegions"]
+        regions = sample.lstImgRegions[self._numWritten:numRegions]
+        data, __ = self.__packRecord(state, regions)
+
+        with open(self.pathJournal, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._numWritten = numRegions
+
+    def compact(self, sample):
+        """
+        Writes a snapshot of the whole sample and clears the journal
+        """
+        logger.debug("Write snapshot of sample to temp folder")
+        shell = sample.__getstate__()
+        regions = shell.pop("lstImgRegions")
+        shell = (type(sample), shell)
+        data, offsets = self.__packRecord(shell, regions, len(self._MAGIC))
+
+        pathTemp = self.pathSnapshot + ".tmp"
+        with open(pathTemp, "wb") as f:
+            f.write(self._MAGIC + data)
+            f.flush()
+            os.fsync(f.fileno())
+        # Snapshot is replaced at once, the old one stays valid until then
+        os.replace(pathTemp, self.pathSnapshot)
+
+        with open(self.pathJournal, "wb"):
+            pass
+
+        # Objects not loaded yet have been moved to the new snapshot
+        for reg, (offset, length) in zip(regions, offsets):
+            if not reg.objsLoaded:
+                reg.setObjsRef(BlobRef(self.pathSnapshot, offset, length))
+
+        self._numSnapshot = len(regions)
+        self._numWritten = self._numSnapshot
+
+    def load(self):
+        """
+        Loads the snapshot and replays the records of the journal. Objects of
+        the regions are not loaded.
+
+        Returns
+        -------
+        evaluation.Evaluator
+            Sample with the segmenter and classifier replaced by the path of
+            their models
+        """
+        with open(self.pathSnapshot, "rb") as f:
+            if f.read(len(self._MAGIC)) == self._MAGIC:
+                record = self.__readRecord(f, self.pathSnapshot)
+                if record is None:
+                    raise EOFError(f"Incomplete snapshot {self.pathSnapshot}")
+                (cls, state), regions = record
+                sample = cls.__new__(cls)
+                sample.__dict__.update(state)
+                sample.lstImgRegions = regions
+            else:
+                # Sample pickled as a whole by an older version
+                f.seek(0)
+                sample = pickle.load(f)
+
+        self._numSnapshot = len(sample.lstImgRegions)
+
+        numRecords = 0
+        if os.path.isfile(self.pathJournal):
+            offset = 0
+            with open(self.pathJournal, "rb") as f:
+                while True:
+                    record = self.__readRecord(f, self.pathJournal)
+                    if record is None:
+                        break
+                    state, regions = record
+                    sample.__dict__.update(state)
+                    sample.lstImgRegions.extend(regions)
+                    offset = f.tell()
+                    numRecords += 1
+
+            # Drop an incomplete last record, new records are appended behind
+            # the last complete one
+            if offset != os.path.getsize(self.pathJournal):
+                logger.warning(f"Drop incomplete record of {self.pathJournal}")
+                with open(self.pathJournal, "r+b") as f:
+                    f.truncate(offset)
+
+        self._numWritten = len(sample.lstImgRegions)
+        logger.debug(f"Replayed {numRecords} records "
+                     f"({self._numWritten - self._numSnapshot} regions) of "
+                     "journal")
+        return sample
+
+    def __packRecord(self, state, regions, base = 0):
+        """
+        Returns the record and the position (offset, length) of the objects
+        of every region. The offsets are relative to base.
+        """
+        blobs = [reg.getObjsBlob() for reg in regions]
+        header = pickle.dumps((state, [reg.getSummary() for reg in regions],
+                               [len(blob) for blob in blobs]),
+                              pickle.HIGHEST_PROTOCOL)
+
+        offsets = []
+        offset = base + self._LENGTH.size + len(header)
+        for blob in blobs:
+            offsets.append((offset, len(blob)))
+            offset += len(blob)
+
+        return b"".join([self._LENGTH.pack(len(header)), header] + blobs), offsets
+
+    def __readRecord(self, f, path):
+        """
+        Reads the record at the current position of f. Returns None if the
+        record is incomplete.
+        """
+        head = f.read(self._LENGTH.size)
+        if len(head) < self._LENGTH.size:
+            return None
+        length, = self._LENGTH.unpack(head)
+        data = f.read(length)
+        if len(data) < length:
+            return None
+        try:
+            state, regions, lengths = pickle.loads(data)
+        except Exception as e:
+            logger.warning(f"Damaged record in {path}: {e}")
+            return None
+
+        # Objects are loaded on first access, only check if they are complete
+        offset = f.tell()
+        end = offset + sum(lengths)
+        if end > os.fstat(f.fileno()).st_size:
+            return None
+        for reg, length in zip(regions, lengths):
+            reg.setObjsRef(BlobRef(path, offset, length))
+            offset += length
+        f.seek(end)
+
+        return state, regions
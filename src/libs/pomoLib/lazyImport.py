@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:05:42 2026
+
+Deferred imports of modules that are not needed to evaluate samples (plots,
+notebook helpers, output formats written once per sample). The module is
+imported on the first access of one of its attributes, so importing the
+pomoLib modules only loads what the inference needs. src/importProfile.py
+reports the import times and checks that the deferred modules stay
+unloaded.
+"""
+
+import logging
+logger = logging.getLogger("root.LazyImportLogger")
+logger.debug("LazyImportLogger has been initialized")
+
+import importlib
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class LazyModule:
+    """
+    Placeholder of a module, imported on first use:
+
+        plt = LazyModule("matplotlib.pyplot")
+        plt.figure()    # imports matplotlib.pyplot
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        # Only called for attributes the placeholder doesn't have
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        if self._module is None:
+            logger.debug(f"Import {self._name} on first use")
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "imported" if self._module is not None else "not imported"
+        return f"<LazyModule {self._name} ({state})>"
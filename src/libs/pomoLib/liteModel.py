@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:41:07 2026
+
+TFLite versions of the models for CPU inference. Contains the conversion of
+the classifier (Keras model) and the segmenter (frozen graph, see
+segmentation/frozen.py) with post-training quantization and the runtime of
+the converted models.
+
+Quantization modes:
+
+    int8    -> weights and activations int8, calibrated with representative
+               inputs (ops without int8 kernel stay float)
+    fp16    -> weights float16
+    dynamic -> weights int8, activations quantized at runtime (no
+               calibration)
+
+Inputs and outputs of the converted models stay float32.
+"""
+
+import logging
+logger = logging.getLogger("root.LiteLogger")
+logger.debug("LiteLogger has been initialized")
+
+import threading
+import numpy as np
+import tensorflow as tf
+
+
+QUANT_MODES = ("int8", "fp16", "dynamic")
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def convertKerasModel(pathModel: str, pathOut: str, mode: str,
+                      calibData = None):
+    """
+    Converts a Keras model (.h5/.hdf5) to TFLite.
+
+    Parameters
+    ----------
+    pathModel : str
+        Keras model
+    pathOut : str
+        TFLite model
+    mode : str
+        Quantization mode (see QUANT_MODES)
+    calibData : callable, optional
+        Returns an iterator of representative inputs (list with one array
+        per input). Needed for mode int8.
+
+    Returns
+    -------
+    str
+        Quantization mode of the converted model
+    """
+    converter = tf.compat.v1.lite.TFLiteConverter.from_keras_model_file(pathModel)
+    return _convert(converter, pathOut, mode, calibData, selectOps = False)
+
+
+def convertFrozenGraph(pathModel: str, inputShapes: dict, outputNames: list,
+                       pathOut: str, mode: str, calibData = None):
+    """
+    Converts a frozen graph (.pb) to TFLite. Ops without TFLite kernel (e.g.
+    crop_and_resize of Mask R-CNN) are kept as TensorFlow ops.
+
+    Parameters
+    ----------
+    inputShapes : dict
+        Shape of every input (name without ":0"), in the order of the inputs
+        of calibData
+    outputNames : list
+        Outputs of the model (names without ":0")
+
+    See convertKerasModel for the other parameters.
+    """
+    converter = tf.compat.v1.lite.TFLiteConverter.from_frozen_graph(
+        pathModel, list(inputShapes), outputNames, inputShapes)
+    try:
+        return _convert(converter, pathOut, mode, calibData, selectOps = True)
+    except Exception as e:
+        if mode != "int8":
+            raise
+        # Calibration is not possible for every graph with TensorFlow ops
+        logger.warning(f"Calibration of {pathModel} failed ({e}), use dynamic "
+                       "range quantization")
+        converter = tf.compat.v1.lite.TFLiteConverter.from_frozen_graph(
+            pathModel, list(inputShapes), outputNames, inputShapes)
+        return _convert(converter, pathOut, "dynamic", None, selectOps = True)
+
+
+def _convert(converter, pathOut, mode, calibData, selectOps):
+    if mode not in QUANT_MODES:
+        raise ValueError(f"Unknown quantization mode {mode} "
+                         f"(allowed: {', '.join(QUANT_MODES)})")
+
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    # Float kernels are kept for ops that can not be quantized
+    ops = [tf.lite.OpsSet.TFLITE_BUILTINS]
+    if mode == "int8":
+        if calibData is None:
+            raise ValueError("Quantization int8 needs calibration data")
+        converter.representative_dataset = calibData
+    elif mode == "fp16":
+        converter.target_spec.supported_types = [tf.float16]
+    if selectOps:
+        ops.append(tf.lite.OpsSet.SELECT_TF_OPS)
+    converter.target_spec.supported_ops = ops
+
+    logger.info(f"Convert model to TFLite ({mode})")
+    with open(pathOut, "wb") as f:
+        f.write(converter.convert())
+    return mode
+
+
+def _baseName(name):
+    return name.split(":")[0]
+
+
+def _quantize(detail, data):
+    scale, zeroPoint = detail["quantization"]
+    if scale and np.issubdtype(detail["dtype"], np.integer):
+        data = np.round(np.asarray(data) / scale + zeroPoint)
+    return np.asarray(data).astype(detail["dtype"])
+
+
+def _dequantize(detail, data):
+    scale, zeroPoint = detail["quantization"]
+    if scale and np.issubdtype(detail["dtype"], np.integer):
+        return (data.astype(np.float32) - zeroPoint) * scale
+    return data
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class LiteModel:
+    """
+    Converted TFLite model. predict can be used like the one of a Keras
+    model with one input and one output, run handles several inputs and
+    outputs by their names. The batch size of the inputs is adapted to the
+    data. The interpreter is used by one thread at a time.
+    """
+
+    def __init__(self, pathModel: str, numThreads: int = None):
+        self.pathModel = pathModel
+
+        # Threads as configured for tensorflow (see workerPool)
+        if numThreads is None:
+            numThreads = tf.config.threading.get_intra_op_parallelism_threads()
+        self._interpreter = tf.lite.Interpreter(model_path = pathModel,
+                                                num_threads = numThreads or None)
+        self._interpreter.allocate_tensors()
+        self._lock = threading.Lock()
+
+    @property
+    def inputNames(self):
+        return [detail["name"] for detail in self._interpreter.get_input_details()]
+
+    @property
+    def outputNames(self):
+        return [detail["name"] for detail in self._interpreter.get_output_details()]
+
+    def predict(self, data, batch_size = None, verbose = 0):
+        """
+        Returns the output of a model with one input and one output
+        """
+        inputName, = self.inputNames
+        outputName, = self.outputNames
+        return self.run({inputName: data})[outputName]
+
+    def run(self, feed: dict):
+        """
+        Runs the model.
+
+        Parameters
+        ----------
+        feed : dict
+            Data of every input by its name
+
+        Returns
+        -------
+        dict
+            Data of every output by its name
+        """
+        with self._lock:
+            details = {_baseName(detail["name"]): detail
+                       for detail in self._interpreter.get_input_details()}
+
+            resized = False
+            for name, data in feed.items():
+                detail = details[_baseName(name)]
+                if tuple(detail["shape"]) != np.shape(data):
+                    self._interpreter.resize_tensor_input(detail["index"],
+                                                          np.shape(data))
+                    resized = True
+            if resized:
+                self._interpreter.allocate_tensors()
+                details = {_baseName(detail["name"]): detail
+                           for detail in self._interpreter.get_input_details()}
+
+            for name, data in feed.items():
+                detail = details[_baseName(name)]
+                self._interpreter.set_tensor(detail["index"],
+                                             _quantize(detail, data))
+            self._interpreter.invoke()
+
+            return {detail["name"]: _dequantize(
+                        detail, self._interpreter.get_tensor(detail["index"]))
+                    for detail in self._interpreter.get_output_details()}
+
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:21:33 2026
+
+Run-length encoding of the binary segmentation masks of the objects
+(dcPomoObject.segMask).
+
+Format: "HxW:r0,r1,r2,..." with the height H and width W of the mask and the
+lengths of the runs of the flattened mask (row-major). Runs alternate between
+0 and 1, starting with 0 (r0 is 0 if the mask starts with 1).
+"""
+
+import logging
+logger = logging.getLogger("root.MaskCodecLogger")
+logger.debug("MaskCodecLogger has been initialized")
+
+import numpy as np
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def encodeRle(mask):
+    """
+    Returns the run-length encoding of a binary mask
+
+    Parameters
+    ----------
+    mask : array
+        2D mask, every value != 0 is part of the object
+
+    Returns
+    -------
+    str
+        Encoded mask ("HxW:r0,r1,...")
+    """
+    mask = np.asarray(mask)
+    if mask.ndim != 2:
+        raise ValueError(f"Mask must be 2D (shape: {mask.shape})")
+
+    height, width = mask.shape
+    flat = mask.ravel() != 0
+    if not flat.size:
+        return f"{height}x{width}:"
+
+    # Positions where the value changes
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    runs = np.diff(np.concatenate(([0], changes, [flat.size])))
+    if flat[0]:
+        runs = np.concatenate(([0], runs))
+
+    return f"{height}x{width}:" + ",".join(map(str, runs.tolist()))
+
+
+def decodeRle(rle: str):
+    """
+    Returns the mask (uint8, 0 or 1) of a run-length encoded mask
+    """
+    shape, __, runs = rle.partition(":")
+    height, width = (int(val) for val in shape.split("x"))
+
+    runs = np.array([int(val) for val in runs.split(",")] if runs else [],
+                    dtype=np.int64)
+    if runs.sum() != height * width:
+        raise ValueError(f"Runs of mask do not match its shape ({shape})")
+
+    values = np.arange(len(runs), dtype=np.uint8) % 2
+    return np.repeat(values, runs).reshape(height, width)
+
+
+def toArray(mask):
+    """
+    Returns the mask as array. Accepts encoded masks and arrays.
+    """
+    if isinstance(mask, str):
+        return decodeRle(mask)
+    return np.asarray(mask)
+
+
+def toRle(mask):
+    """
+    Returns the encoded mask. Accepts encoded masks and arrays.
+    """
+    if isinstance(mask, str):
+        return mask
+    return encodeRle(mask)
+
+
+def toDense(mask):
+    """
+    Returns the mask as string of its flattened values without separators
+    (e.g. "0011100"), the format of column SegMask in the csv file.
+    """
+    flat = toArray(mask).ravel()
+    if flat.size and flat.max() > 9:
+        # More than one digit per value, fall back to the generic conversion
+        return "".join(map(str, flat.tolist()))
+
+    return (flat.astype(np.uint8) + ord("0")).tobytes().decode("ascii")
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 12:05:51 2026
+
+Result archive of a sample which is built while the sample is evaluated.
+Outputs that will not change anymore are added to the archive as soon as they
+are produced, the remaining content of the output folder is added at the end.
+"""
+
+import logging
+logger = logging.getLogger("root.SinkLogger")
+logger.debug("SinkLogger has been initialized")
+
+import os
+import time
+import threading
+import zipfile
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class ArchiveSink:
+    """
+    Zip archive with the same layout as shutil.make_archive of the output
+    folder "rootDir". Already compressed images (png, tif) are stored, all
+    other files are deflated.
+    """
+
+    STORED_EXT = (".png", ".tif", ".tiff", ".jpg", ".zip")
+
+    def __init__(self, pathZip: str, rootDir: str, exclude: tuple = ("temp",)):
+        self.pathZip = pathZip
+        self.rootDir = rootDir
+        self.exclude = exclude
+
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(pathZip, "w", zipfile.ZIP_DEFLATED,
+                                    allowZip64=True)
+        self._written: set = set()
+        self.numBytes = 0
+
+    def writeBytes(self, path: str, data: bytes):
+        """
+        Adds data as file "path" (path inside of rootDir) to the archive
+        """
+        arcname = self.__arcname(path)
+        with self._lock:
+            self.__addDirs(arcname)
+            self._zip.writestr(self.__zipInfo(arcname), data)
+            self._written.add(arcname)
+            self.numBytes += len(data)
+
+    def moveFile(self, path: str):
+        """
+        Adds the file "path" to the archive and removes it from rootDir
+        """
+        arcname = self.__arcname(path)
+        with self._lock:
+            self.__addDirs(arcname)
+            self._zip.write(path, arcname, self.__compression(arcname))
+            self._written.add(arcname)
+            self.numBytes += os.path.getsize(path)
+        os.remove(path)
+
+    def moveFolder(self, path: str):
+        """
+        Adds all files of folder "path" (not recursive) to the archive and
+        removes them from rootDir. The folder itself is kept.
+        """
+        if not os.path.isdir(path):
+            return None
+        for elem in sorted(os.listdir(path)):
+            if os.path.isfile(os.path.join(path, elem)):
+                self.moveFile(os.path.join(path, elem))
+
+    def finalize(self):
+        """
+        Adds the remaining folders and files of rootDir and closes the
+        archive.
+
+        Returns
+        -------
+        str
+            Path of the archive
+        """
+        for dirpath, dirnames, filenames in os.walk(self.rootDir):
+            dirnames[:] = sorted(d for d in dirnames if
+                                 os.path.relpath(os.path.join(dirpath, d),
+                                                 self.rootDir) not in self.exclude)
+            for name in dirnames:
+                with self._lock:
+                    self.__addDir(self.__arcname(os.path.join(dirpath, name)) + "/")
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                arcname = self.__arcname(path)
+                if arcname in self._written:
+                    continue
+                with self._lock:
+                    self._zip.write(path, arcname, self.__compression(arcname))
+                    self._written.add(arcname)
+                    self.numBytes += os.path.getsize(path)
+
+        self.close()
+        return self.pathZip
+
+    def close(self):
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+            self._zip = None
+
+    def __arcname(self, path):
+        if os.path.isabs(path) or path.startswith(self.rootDir):
+            path = os.path.relpath(path, self.rootDir)
+        return path.replace(os.sep, "/")
+
+    def __compression(self, arcname):
+        if arcname.lower().endswith(self.STORED_EXT):
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+    def __zipInfo(self, arcname):
+        info = zipfile.ZipInfo(arcname, date_time = self.__now())
+        info.compress_type = self.__compression(arcname)
+        info.external_attr = 0o644 << 16
+        return info
+
+    def __addDirs(self, arcname):
+        parts = arcname.split("/")[:-1]
+        for i in range(1, len(parts) + 1):
+            self.__addDir("/".join(parts[:i]) + "/")
+
+    def __addDir(self, arcname):
+        if arcname in self._written:
+            return None
+        info = zipfile.ZipInfo(arcname, date_time = self.__now())
+        info.external_attr = (0o40755 << 16) | 0x10
+        self._zip.writestr(info, b"")
+        self._written.add(arcname)
+
+    @staticmethod
+    def __now():
+        return time.localtime(time.time())[:6]
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 12 09:14:51 2026
+
+Pipelined evaluation of the image regions of a sample. Loading, segmentation,
+classification and saving of the regions run in their own stages which are
+connected by bounded queues. Thereby the loading and writing of images
+overlaps with the work of the models.
+"""
+
+import logging
+logger = logging.getLogger("root.PipelineLogger")
+logger.debug("PipelineLogger has been initialized")
+
+import os
+import queue
+import threading
+import time
+from configparser import ConfigParser
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class _EndOfStage:
+    """
+    Marker which is passed through the queues after the last region
+    """
+    pass
+
+
+class RegionPipeline:
+    """
+    Runs the steps of Evaluator.analyzeRegion in four stages:
+
+        decode   -> nextImageRegion + prepareRegion    (thread)
+        segment  -> segmentRegions                     (thread)
+        classify -> classifyRegion / accumulator       (thread)
+        save     -> saveRegion + callback              (calling thread)
+
+    Every stage handles the regions in the order they have been loaded, so
+    the regions are added to the sample in the same order as in the serial
+    mode. The segment stage takes all waiting regions up to the batch size of
+    the segmenter at once.
+    """
+
+    def __init__(self, decodeQueueSize: int = 4, segmentQueueSize: int = 4,
+                 classifyQueueSize: int = 8):
+
+        for size in (decodeQueueSize, segmentQueueSize, classifyQueueSize):
+            if size < 1:
+                logger.error("Queue size of pipeline stage must be at least 1")
+                raise ValueError("Queue size of pipeline stage must be at least 1")
+
+        self.decodeQueueSize = decodeQueueSize
+        self.segmentQueueSize = segmentQueueSize
+        self.classifyQueueSize = classifyQueueSize
+
+        self._stop = threading.Event()
+        self._error: BaseException = None
+
+    @classmethod
+    def fromConfig(cls, config: ConfigParser):
+        return cls(config.getint("PIPELINE", "DecodeQueueSize", fallback=4),
+                   config.getint("PIPELINE", "SegmentQueueSize", fallback=4),
+                   config.getint("PIPELINE", "ClassifyQueueSize", fallback=8))
+
+    def run(self, sample, onRegionDone = None):
+        """
+        Evaluates image regions of the given sample until
+        sample.nextImageRegion does not return a new region.
+
+        Parameters
+        ----------
+        sample : evaluation.Evaluator
+            Sample to be evaluated
+        onRegionDone : callable, optional
+            Called with the sample after every saved region (e.g. to save the
+            sample to the temp folder). The default is None.
+
+        Returns
+        -------
+        int
+            Number of evaluated regions
+
+        """
+        self._stop.clear()
+        self._error = None
+
+        decodedQueue = queue.Queue(self.decodeQueueSize)
+        segmentedQueue = queue.Queue(self.segmentQueueSize)
+        classifiedQueue = queue.Queue(self.classifyQueueSize)
+
+        # Names of regions that are loaded but not saved yet
+        inFlight = set()
+        inFlightLock = threading.Lock()
+
+        def decode():
+            while not self._stop.is_set():
+                with inFlightLock:
+                    skip = set(inFlight)
+                imgReg = sample.nextImageRegion(skip)
+                if not imgReg:
+                    break
+                with inFlightLock:
+                    inFlight.add(os.path.basename(imgReg.pathImg))
+                sample.prepareRegion(imgReg)
+                self._put(decodedQueue, imgReg)
+
+        def segment():
+            sample.segmenter.bindToThread()
+            endOfStage = False
+            while not endOfStage:
+                # Take all waiting regions up to the batch size of the 
+                # segmenter to segmentate them in one forward pass
+                lstImgRegs = []
+                imgReg = self._get(decodedQueue)
+                while imgReg is not _EndOfStage:
+                    lstImgRegs.append(imgReg)
+                    if len(lstImgRegs) >= sample.segmenter.batchSize:
+                        break
+                    try:
+                        imgReg = decodedQueue.get_nowait()
+                    except queue.Empty:
+                        break
+                endOfStage = imgReg is _EndOfStage
+
+                if lstImgRegs:
+                    sample.segmentRegions(lstImgRegs)
+                for imgReg in lstImgRegs:
+                    self._put(segmentedQueue, imgReg)
+
+        def classify():
+            sample.classifier.bindToThread()
+            if sample.classifAcc is None:
+                self._forward(segmentedQueue, classifiedQueue, 
+                              sample.classifyRegion)
+                return None
+            
+            # Collect objects of several regions until the batch size of the
+            # accumulator or its deadline is reached
+            while True:
+                timeLeft = sample.classifAcc.timeLeft()
+                try:
+                    imgReg = self._get(segmentedQueue, timeLeft)
+                except queue.Empty:
+                    imgReg = None
+                
+                if imgReg is _EndOfStage:
+                    break
+                if imgReg is not None:
+                    sample.classifAcc.add(imgReg, imgReg.getClassifObjs())
+                if sample.classifAcc.ready():
+                    for imgReg in sample.classifyPending():
+                        self._put(classifiedQueue, imgReg)
+            
+            for imgReg in sample.classifyPending():
+                self._put(classifiedQueue, imgReg)
+
+        threads = [threading.Thread(target=self._stage,
+                                    args=(decode, decodedQueue),
+                                    name="PipelineDecode", daemon=True),
+                   threading.Thread(target=self._stage,
+                                    args=(segment, segmentedQueue),
+                                    name="PipelineSegment", daemon=True),
+                   threading.Thread(target=self._stage,
+                                    args=(classify, classifiedQueue),
+                                    name="PipelineClassify", daemon=True)]
+
+        start = time.time()
+        for thread in threads:
+            thread.start()
+
+        numRegions = 0
+        try:
+            while True:
+                imgReg = self._get(classifiedQueue)
+                if imgReg is _EndOfStage:
+                    break
+                sample.saveRegion(imgReg)
+                with inFlightLock:
+                    inFlight.discard(os.path.basename(imgReg.pathImg))
+                if onRegionDone:
+                    onRegionDone(sample)
+                numRegions += 1
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            logger.error(f"Pipeline stopped due to an error: {self._error}")
+            raise self._error
+
+        end = time.time()
+        if numRegions:
+            logger.info(f"Pipeline evaluated {numRegions} regions "
+                        f"({(end - start):.0f} s, "
+                        f"{(end - start) / numRegions:.2f} s/region)")
+        return numRegions
+
+    def _stage(self, work, outQueue):
+        try:
+            work()
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            # Always signal the next stage, otherwise it would wait forever
+            self._put(outQueue, _EndOfStage, force = True)
+
+    def _forward(self, inQueue, outQueue, step):
+        while True:
+            imgReg = self._get(inQueue)
+            if imgReg is _EndOfStage:
+                break
+            step(imgReg)
+            self._put(outQueue, imgReg)
+
+    def _fail(self, e):
+        if self._error is None:
+            self._error = e
+        self._stop.set()
+
+    def _put(self, q, item, force = False):
+        while True:
+            if self._stop.is_set() and not force:
+                return
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if force and self._stop.is_set():
+                    # Next stage is stopping as well. Make room for the marker.
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _get(self, q, timeout = None):
+        """
+        Waits for the next item of the queue. Raises queue.Empty if a timeout
+        is given and expired.
+        """
+        end = None if timeout is None else time.time() + timeout
+        while True:
+            wait = 0.5 if end is None else min(0.5, max(0.0, end - time.time()))
+            try:
+                return q.get(timeout=wait)
+            except queue.Empty:
+                if self._stop.is_set() and self._error is not None:
+                    return _EndOfStage
+                if end is not None and time.time() >= end:
+                    raise
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:58:14 2026
+
+Pre-filter of the img regions before the segmentation. Regions without any
+structure (e.g. the outer positions of a full scan) are detected by cheap
+image statistics and are not segmentated and classified.
+"""
+
+import logging
+logger = logging.getLogger("root.PrefilterLogger")
+logger.debug("PrefilterLogger has been initialized")
+
+from configparser import ConfigParser
+import cv2
+import numpy as np
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class EmptyRegionFilter:
+    """
+    A region is empty if both the standard deviation of its intensity is
+    below "stdMax" and it has less than "minEdgePixels" edge pixels (Canny).
+    The statistics are computed on the image downscaled by "downscale".
+    """
+
+    def __init__(self, stdMax: float = 6.0, minEdgePixels: int = 10,
+                 cannyLow: int = 20, cannyHigh: int = 60, downscale: int = 2):
+        self.stdMax = stdMax
+        self.minEdgePixels = minEdgePixels
+        self.cannyLow = cannyLow
+        self.cannyHigh = cannyHigh
+        self.downscale = max(1, downscale)
+
+    @classmethod
+    def fromConfig(cls, config: ConfigParser):
+        """
+        Returns the filter configured in section PREFILTER or None if the
+        filter is disabled
+        """
+        if not config.getboolean("PREFILTER", "Enabled", fallback=False):
+            return None
+        return cls(config.getfloat("PREFILTER", "StdMax", fallback=6.0),
+                   config.getint("PREFILTER", "MinEdgePixels", fallback=10),
+                   config.getint("PREFILTER", "CannyLow", fallback=20),
+                   config.getint("PREFILTER", "CannyHigh", fallback=60),
+                   config.getint("PREFILTER", "Downscale", fallback=2))
+
+    def statistics(self, img):
+        """
+        Returns the standard deviation of the intensity and the number of
+        edge pixels of the (downscaled) image
+        """
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        if img.dtype != np.uint8:
+            # Same scale as 8 bit images (float images in [0, 1])
+            maxVal = (np.iinfo(img.dtype).max if np.issubdtype(img.dtype, np.integer)
+                      else 1.0)
+            img = np.clip(img.astype(np.float32) * (255.0 / maxVal), 0,
+                          255).astype(np.uint8)
+
+        if self.downscale > 1:
+            img = cv2.resize(img, (img.shape[1] // self.downscale,
+                                   img.shape[0] // self.downscale),
+                             interpolation=cv2.INTER_AREA)
+
+        std = float(img.std())
+        edges = cv2.Canny(cv2.GaussianBlur(img, (3, 3), 0), self.cannyLow,
+                          self.cannyHigh)
+        return std, int(np.count_nonzero(edges))
+
+    def isEmpty(self, img):
+        if img is None:
+            return False
+        std, numEdges = self.statistics(img)
+        empty = std < self.stdMax and numEdges < self.minEdgePixels
+        logger.debug(f"Region statistics: std {std:.2f}, {numEdges} edge "
+                     f"pixels -> {'empty' if empty else 'not empty'}")
+        return empty
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 09:26:48 2026
+
+Registry of the evaluated samples. Replaces evaluatedSamples.txt by a SQLite
+database (WAL mode), which can be used by several processes at once.
+"""
+
+import logging
+logger = logging.getLogger("root.RegistryLogger")
+logger.debug("RegistryLogger has been initialized")
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def processToken(pid: int):
+    """
+    Returns an id of the running process with the pid or None if no such 
+    process is running. A pid is used again by later processes (e.g. pid 1
+    after every restart of a container), the token is not: it contains the
+    start time of the process and the boot id (Linux). Without /proc the
+    token is the pid.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+    except FileNotFoundError:
+        if not os.path.isdir("/proc/self"):
+            return str(pid) if _isRunning(pid) else None
+        return None
+    # Start time is field 22, the fields after the command name start with 3
+    startTime = stat.rsplit(")", 1)[1].split()[19]
+    return f"{pid}:{startTime}:{_bootId()}"
+
+
+def _bootId():
+    try:
+        with open("/proc/sys/kernel/random/boot_id", "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _isRunning(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class SampleRegistry:
+    """
+    State of every sample that has been handed over to an evaluation:
+
+        pending     -> waiting for evaluation (e.g. interrupted evaluation)
+        in-progress -> evaluated by the process with the stored pid and 
+                       token (see processToken)
+        done        -> evaluation finished
+        failed      -> evaluation failed, sample is not evaluated again
+
+    Samples which are unknown or pending without a process can be claimed for
+    evaluation. Every process opens its own connection to the database.
+    """
+
+    PENDING = "pending"
+    IN_PROGRESS = "in-progress"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, path: str = "evaluatedSamples.db",
+                 legacyPath: str = "evaluatedSamples.txt"):
+        self.path = path
+        self.legacyPath = legacyPath
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._token = None
+
+        self.__createTables()
+        self.__importLegacyList()
+
+    def state(self, name: str):
+        """
+        Returns the state of the sample or None if the sample is unknown
+        """
+        row = self.__execute("SELECT state FROM samples WHERE name = ?",
+                             (name,)).fetchone()
+        return row[0] if row else None
+
+    def isOpen(self, name: str):
+        """
+        Returns True if the sample has to be evaluated (unknown or pending
+        without a process)
+        """
+        row = self.__execute("SELECT state, pid FROM samples WHERE name = ?",
+                             (name,)).fetchone()
+        return row is None or (row[0] == self.PENDING and row[1] is None)
+
+    def claim(self, name: str):
+        """
+        Marks the sample as in progress by this process if it is open.
+
+        Returns
+        -------
+        bool
+            False if the sample is already known to another evaluation
+        """
+        now = self.__now()
+        with self._lock:
+            conn = self.__connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT state, pid FROM samples WHERE name = ?",
+                                   (name,)).fetchone()
+                if row is None:
+                    conn.execute("INSERT INTO samples (name, state, pid, token, "
+                                 "created, started, updated) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 (name, self.IN_PROGRESS, os.getpid(), 
+                                  self.__token(), now, now, now))
+                elif row[0] == self.PENDING and row[1] is None:
+                    conn.execute("UPDATE samples SET state = ?, pid = ?, "
+                                 "token = ?, started = ?, updated = ?, "
+                                 "error = NULL WHERE name = ?",
+                                 (self.IN_PROGRESS, os.getpid(), self.__token(),
+                                  now, now, name))
+                else:
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def markInProgress(self, name: str):
+        """
+        Marks the sample as evaluated by this process (e.g. a worker process
+        taking over a claimed sample)
+        """
+        now = self.__now()
+        self.__execute("INSERT INTO samples (name, state, pid, token, created, "
+                       "started, updated) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                       "ON CONFLICT(name) DO UPDATE SET state = excluded.state, "
+                       "pid = excluded.pid, token = excluded.token, "
+                       "started = excluded.started, "
+                       "updated = excluded.updated, error = NULL",
+                       (name, self.IN_PROGRESS, os.getpid(), self.__token(), 
+                        now, now, now))
+
+    def markDone(self, name: str):
+        self.__finish(name, self.DONE)
+
+    def markFailed(self, name: str, error: str = None):
+        self.__finish(name, self.FAILED, error)
+
+    def resetStale(self):
+        """
+        Sets samples in progress by processes which are not running anymore
+        (e.g. after a crash) back to pending. A process is identified by its
+        token, the pid may be used by a new process. Samples of this process
+        are stale as well, it is called before anything has been claimed.
+
+        Returns
+        -------
+        list
+            Names of the reset samples
+        """
+        rows = self.__execute("SELECT name, pid, token FROM samples "
+                              "WHERE state IN (?, ?)",
+                              (self.PENDING, self.IN_PROGRESS)).fetchall()
+        stale = [name for name, pid, token in rows
+                 if pid is not None and self.__isStale(pid, token)]
+
+        now = self.__now()
+        for name in stale:
+            self.__execute("UPDATE samples SET state = ?, pid = NULL, "
+                           "token = NULL, updated = ? WHERE name = ?", 
+                           (self.PENDING, now, name))
+        if stale:
+            logger.info(f"Reset {len(stale)} interrupted samples to pending")
+        return stale
+
+    def names(self, state: str):
+        return [row[0] for row in
+                self.__execute("SELECT name FROM samples WHERE state = ? "
+                               "ORDER BY updated", (state,)).fetchall()]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._pid = None
+
+    def __finish(self, name, state, error = None):
+        now = self.__now()
+        self.__execute("INSERT INTO samples (name, state, created, finished, "
+                       "updated, error) VALUES (?, ?, ?, ?, ?, ?) "
+                       "ON CONFLICT(name) DO UPDATE SET state = excluded.state, "
+                       "pid = NULL, token = NULL, finished = excluded.finished, "
+                       "updated = excluded.updated, error = excluded.error",
+                       (name, state, now, now, now, error))
+
+    def __execute(self, sql, params = ()):
+        with self._lock:
+            conn = self.__connection()
+            return conn.execute(sql, params)
+
+    def __connection(self):
+        # Open a new connection after a fork
+        if self._conn is None or self._pid != os.getpid():
+            # Autocommit mode, transactions are started explicitly
+            self._conn = sqlite3.connect(self.path, timeout=30,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+        return self._conn
+
+    def __createTables(self):
+        self.__execute("CREATE TABLE IF NOT EXISTS samples ("
+                       "name TEXT PRIMARY KEY, "
+                       "state TEXT NOT NULL, "
+                       "pid INTEGER, "
+                       "token TEXT, "
+                       "created TEXT, "
+                       "started TEXT, "
+                       "finished TEXT, "
+                       "updated TEXT, "
+                       "error TEXT)")
+        # Registries created without the token of the process
+        columns = [row[1] for row in 
+                   self.__execute("PRAGMA table_info(samples)").fetchall()]
+        if "token" not in columns:
+            self.__execute("ALTER TABLE samples ADD COLUMN token TEXT")
+        self.__execute("CREATE INDEX IF NOT EXISTS samplesState "
+                       "ON samples (state)")
+        self.__execute("CREATE TABLE IF NOT EXISTS meta ("
+                       "key TEXT PRIMARY KEY, value TEXT)")
+
+    def __importLegacyList(self):
+        """
+        Imports the samples of evaluatedSamples.txt (once) as done
+        """
+        if not self.legacyPath or not os.path.isfile(self.legacyPath):
+            return None
+
+        with self._lock:
+            conn = self.__connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT value FROM meta WHERE key = 'legacyImport'"
+                                ).fetchone():
+                    conn.execute("ROLLBACK")
+                    return None
+
+                with open(self.legacyPath, "r", encoding="utf-8") as fd:
+                    names = {line.strip() for line in fd if line.strip()}
+
+                now = self.__now()
+                conn.executemany("INSERT OR IGNORE INTO samples (name, state, "
+                                 "created, finished, updated) "
+                                 "VALUES (?, ?, ?, ?, ?)",
+                                 [(name, self.DONE, now, now, now)
+                                  for name in names])
+                conn.execute("INSERT INTO meta (key, value) VALUES "
+                             "('legacyImport', ?)", (now,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        logger.info(f"Imported {len(names)} samples from {self.legacyPath}")
+
+    @staticmethod
+    def __isStale(pid, token):
+        if pid == os.getpid():
+            return True
+        current = processToken(pid)
+        # Entries without token have been claimed before tokens were stored
+        return current is None or (token is not None and current != token)
+
+    def __token(self):
+        # Token of this process (pid, token), new after a fork
+        if self._token is None or self._token[0] != os.getpid():
+            self._token = (os.getpid(), processToken(os.getpid()))
+        return self._token[1]
+
+    @staticmethod
+    def __now():
+        return datetime.now().isoformat(timespec="seconds")
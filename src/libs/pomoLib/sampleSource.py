@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:37:16 2026
+
+Sources of the elements of a sample (images and analysis files). A zipped
+sample is read directly from the archive, members are only decompressed when
+they are needed.
+"""
+
+import logging
+logger = logging.getLogger("root.SourceLogger")
+logger.debug("SourceLogger has been initialized")
+
+import os
+import io
+import shutil
+import threading
+import zipfile
+import cv2
+import numpy as np
+import skimage.io
+import tifffile
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class FolderSource:
+    """
+    Sample folder containing the subfolders "images" and "analysis"
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def listImages(self):
+        return os.listdir(os.path.join(self.path, "images"))
+
+    def hasImage(self, name: str):
+        return os.path.isfile(os.path.join(self.path, "images", name))
+
+    def readImage(self, name: str):
+        pathImg = os.path.join(self.path, "images", name)
+        perFail = False
+        while(1):
+            try:
+                img = skimage.io.imread(pathImg)
+            except:
+                if not perFail:
+                    logger.warning(f"No permission to load file{pathImg}")
+                    perFail = True
+            else:
+                return img
+
+    def listAnalysis(self):
+        return os.listdir(os.path.join(self.path, "analysis"))
+
+    def openAnalysis(self, name: str):
+        return open(os.path.join(self.path, "analysis", name), "rb")
+
+    def copyAnalysis(self, name: str, dest: str):
+        shutil.copyfile(os.path.join(self.path, "analysis", name), dest)
+
+    def close(self):
+        pass
+
+
+class ZipSource(FolderSource):
+    """
+    Zipped sample folder. The archive has to contain exactly one folder with
+    the subfolders "images" and "analysis". The archive is kept open until
+    close is called.
+    """
+
+    def __init__(self, pathZip: str):
+        self.pathZip = pathZip
+        self._lock = threading.Lock()
+        self._zip: zipfile.ZipFile = None
+        self._members: dict = None
+        self.root: str = None
+
+        self.__open()
+        super().__init__(os.path.join(pathZip, self.root))
+
+    def __getstate__(self):
+        # Archive is opened again on next access
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_zip"] = None
+        state["_members"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def listImages(self):
+        return self.__list("images")
+
+    def hasImage(self, name: str):
+        return f"images/{name}" in self.__getMembers()
+
+    def readImage(self, name: str):
+        data = self.__read(f"images/{name}")
+
+        if name.endswith(".tif") or name.endswith(".tiff"):
+            return tifffile.imread(io.BytesIO(data))
+
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+        if img is None:
+            logger.error(f"Could not decode {name} of {self.pathZip}")
+            raise ValueError(f"Could not decode {name} of {self.pathZip}")
+
+        # Same channel order as skimage.io.imread
+        if img.ndim == 3 and img.shape[2] == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        elif img.ndim == 3 and img.shape[2] == 4:
+            img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGBA)
+        return img
+
+    def listAnalysis(self):
+        return self.__list("analysis")
+
+    def openAnalysis(self, name: str):
+        return io.BytesIO(self.__read(f"analysis/{name}"))
+
+    def copyAnalysis(self, name: str, dest: str):
+        with open(dest, "wb") as f:
+            f.write(self.__read(f"analysis/{name}"))
+
+    def close(self):
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+            self._zip = None
+
+    def __open(self):
+        self._zip = zipfile.ZipFile(self.pathZip, "r")
+
+        roots = {name.split("/")[0] for name in self._zip.namelist()
+                 if "/" in name}
+        if len(roots) != 1:
+            raise Exception("Unexpected number of subfolders")
+        root = roots.pop()
+
+        if self.root is not None and root != self.root:
+            raise Exception(f"Content of {self.pathZip} has changed")
+        self.root = root
+
+        # Members of the sample folder (path relative to the sample folder)
+        prefix = root + "/"
+        self._members = {info.filename[len(prefix):]: info
+                         for info in self._zip.infolist()
+                         if info.filename.startswith(prefix) and
+                         not info.is_dir()}
+
+    def __getMembers(self):
+        if self._members is None:
+            with self._lock:
+                if self._zip is None:
+                    self.__open()
+        return self._members
+
+    def __list(self, folder):
+        prefix = folder + "/"
+        return [name[len(prefix):] for name in self.__getMembers()
+                if name.startswith(prefix) and "/" not in name[len(prefix):]]
+
+    def __read(self, name):
+        info = self.__getMembers().get(name)
+        if info is None:
+            raise FileNotFoundError(f"{name} not found in {self.pathZip}")
+
+        # ZipFile must not be read by several threads at once
+        with self._lock:
+            if self._zip is None:
+                self.__open()
+            return self._zip.read(info)
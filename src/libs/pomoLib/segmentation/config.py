@@ -167,6 +167,11 @@ class Config(object):
     # Max number of final detections
     DETECTION_MAX_INSTANCES = 100
 
+    # Class IDs whose masks are computed at inference. Detections of other
+    # classes keep their box, class and score, but no mask (None in compact
+    # masks, empty full size mask). None = masks of all classes
+    MASK_CLASS_IDS = None
+
     # Minimum probability value to accept a detected instance
     # ROIs below this threshold are skipped
     DETECTION_MIN_CONFIDENCE = 0.7
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:18:52 2026
+
+Exported inference models of the segmenter. The Mask R-CNN inference model is
+exported once with its weights as constants and the anchors of the model
+input size resolved (input "input_anchors" replaced by a constant). Loading
+the frozen graph replaces building the model in Python and matching the
+HDF5 weights by name.
+
+An exported model consists of two files:
+
+    <name>.pb    -> frozen GraphDef
+    <name>.json  -> metadata (names of the input and output tensors, config
+                    values the graph has been built with, class names)
+
+The batch size and the detection threshold are part of the graph, so they
+can not be changed without exporting again. The frozen graph can be
+converted to TFLite (LiteMaskRCNN, see quantizeModels.py).
+"""
+
+import logging
+logger = logging.getLogger("root.FrozenLogger")
+logger.debug("FrozenLogger has been initialized")
+
+import os
+import json
+from datetime import datetime
+import numpy as np
+import tensorflow as tf
+
+from libs.pomoLib.segmentation import model as segModel
+from libs.pomoLib import liteModel
+
+
+# Values of the config the graph depends on
+CONFIG_KEYS = ("BATCH_SIZE", "IMAGE_SHAPE", "IMAGE_MIN_DIM", "IMAGE_MAX_DIM",
+               "IMAGE_MIN_SCALE", "IMAGE_RESIZE_MODE", "MEAN_PIXEL",
+               "NUM_CLASSES", "DETECTION_MIN_CONFIDENCE",
+               "DETECTION_MAX_INSTANCES", "MASK_SHAPE")
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def metadataPath(pathModel: str):
+    return os.path.splitext(pathModel)[0] + ".json"
+
+
+def exportFrozenGraph(mrcnn: segModel.MaskRCNN, session, pathOut: str,
+                      classNames: list = None, source: str = None):
+    """
+    Exports the inference model of mrcnn (weights loaded) as frozen graph.
+
+    Parameters
+    ----------
+    mrcnn : segModel.MaskRCNN
+        Model in inference mode
+    session : tf.compat.v1.Session
+        Session holding the weights of the model
+    pathOut : str
+        Path of the frozen graph (.pb), the metadata is written next to it
+    classNames : list, optional
+        Class names stored in the metadata
+    source : str, optional
+        Name of the exported weights file stored in the metadata
+
+    Returns
+    -------
+    dict
+        Metadata of the exported model
+    """
+    config = mrcnn.config
+    if config.IMAGE_RESIZE_MODE != "square":
+        raise ValueError("Only models with IMAGE_RESIZE_MODE 'square' can be "
+                         "exported (fixed input size)")
+
+    keras = mrcnn.keras_model
+    inputImage, inputMeta, inputAnchors = (t.op.name for t in keras.inputs)
+    outDetections = keras.outputs[0].op.name
+    outMask = keras.outputs[3].op.name
+
+    logger.info("Freeze weights of the segmentation model")
+    graphDef = tf.compat.v1.graph_util.convert_variables_to_constants(
+        session, session.graph.as_graph_def(), [outDetections, outMask])
+
+    # Anchors of the input size as constant instead of an input
+    anchors = mrcnn.get_anchors(config.IMAGE_SHAPE)
+    anchors = np.broadcast_to(anchors, (config.BATCH_SIZE,) + anchors.shape)
+    with tf.Graph().as_default() as graph:
+        const = tf.constant(anchors.astype(np.float32), name="resolved_anchors")
+        tf.compat.v1.import_graph_def(graphDef,
+                                      input_map={inputAnchors + ":0": const},
+                                      name="")
+        graphDef = graph.as_graph_def()
+    graphDef = tf.compat.v1.graph_util.extract_sub_graph(graphDef,
+                                                         [outDetections, outMask])
+
+    with open(pathOut, "wb") as f:
+        f.write(graphDef.SerializeToString())
+
+    metadata = {
+        "format": "frozen_graph",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "inputs": {"image": inputImage + ":0",
+                   "image_meta": inputMeta + ":0"},
+        "outputs": {"detections": outDetections + ":0",
+                    "mrcnn_mask": outMask + ":0"},
+        "config": {key: _toJson(getattr(config, key)) for key in CONFIG_KEYS},
+        "class_names": classNames,
+    }
+    with open(metadataPath(pathOut), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+    logger.info(f"Exported frozen segmentation model to {pathOut} "
+                f"({os.path.getsize(pathOut) / 1e6:.1f} MB)")
+    return metadata
+
+
+def loadMetadata(pathModel: str):
+    with open(metadataPath(pathModel), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def checkConfig(config, metadata: dict):
+    """
+    Raises a ValueError if the config does not match the one the model has
+    been exported with. A different detection threshold is only logged.
+    """
+    exported = metadata["config"]
+    for key in CONFIG_KEYS:
+        value = _toJson(getattr(config, key))
+        if key == "DETECTION_MIN_CONFIDENCE":
+            if value != exported[key]:
+                logger.warning(f"Exported segmentation model uses detection "
+                               f"threshold {exported[key]} (config: {value})")
+        elif value != exported[key]:
+            logger.error(f"{key} of config ({value}) does not match exported "
+                         f"model ({exported[key]})")
+            raise ValueError(f"{key} of config ({value}) does not match "
+                             f"exported model ({exported[key]})")
+
+
+def _toJson(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class FrozenMaskRCNN(segModel.MaskRCNN):
+    """
+    Inference model of an exported frozen graph. Is used like MaskRCNN in
+    inference mode (detect), but is not built from the config. The config
+    must match the one the graph has been exported with.
+    """
+
+    def __init__(self, pathModel: str, config):
+        self.mode = "inference"
+        self.config = config
+        self.pathModel = pathModel
+        self.metadata = loadMetadata(pathModel)
+        checkConfig(config, self.metadata)
+
+        graphDef = tf.compat.v1.GraphDef()
+        with open(pathModel, "rb") as f:
+            graphDef.ParseFromString(f.read())
+
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.compat.v1.import_graph_def(graphDef, name="")
+
+        names = {**self.metadata["inputs"], **self.metadata["outputs"]}
+        self._tensors = {key: self.graph.get_tensor_by_name(name)
+                         for key, name in names.items()}
+
+        # Own session, threads as configured for tensorflow (see workerPool)
+        sessConfig = tf.compat.v1.ConfigProto(
+            intra_op_parallelism_threads=
+            tf.config.threading.get_intra_op_parallelism_threads(),
+            inter_op_parallelism_threads=
+            tf.config.threading.get_inter_op_parallelism_threads())
+        self.session = tf.compat.v1.Session(graph=self.graph, config=sessConfig)
+
+    def predict_molded(self, molded_images, image_metas, verbose=0):
+        # Anchors are part of the graph
+        return self.session.run(
+            [self._tensors["detections"], self._tensors["mrcnn_mask"]],
+            feed_dict={self._tensors["image"]: molded_images,
+                       self._tensors["image_meta"]: image_metas})
+
+    def close(self):
+        self.session.close()
+
+
+class LiteMaskRCNN(segModel.MaskRCNN):
+    """
+    Inference model of a TFLite conversion of the frozen graph (see 
+    quantizeModels.py). The metadata of the frozen graph is stored next to 
+    the .tflite file.
+    """
+
+    def __init__(self, pathModel: str, config):
+        self.mode = "inference"
+        self.config = config
+        self.pathModel = pathModel
+        self.metadata = loadMetadata(pathModel)
+        checkConfig(config, self.metadata)
+
+        self.liteModel = liteModel.LiteModel(pathModel)
+        logger.debug(f"TFLite segmentation model quantized as "
+                     f"{self.metadata.get('quantization')}")
+
+    def predict_molded(self, molded_images, image_metas, verbose=0):
+        inputs, outputs = self.metadata["inputs"], self.metadata["outputs"]
+        result = self.liteModel.run({inputs["image"]: molded_images,
+                                     inputs["image_meta"]: image_metas})
+        return result[outputs["detections"]], result[outputs["mrcnn_mask"]]
@@ -2423,11 +2423,13 @@ class MaskRCNN(object):
         )
         self.epoch = max(self.epoch, epochs)
 
-    def mold_inputs(self, images):
+    def mold_inputs(self, images, max_dim=None):
         """Takes a list of images and modifies them to the format expected
         as an input to the neural network.
         images: List of image matrices [height,width,depth]. Images can have
             different sizes.
+        max_dim: Resize to this size instead of IMAGE_MAX_DIM (multiple of
+            64). Only for models whose anchors are not fixed.
 
         Returns 3 Numpy matrices:
         molded_images: [N, h, w, 3]. Images resized and normalized.
@@ -2445,7 +2447,7 @@ class MaskRCNN(object):
                 image,
                 min_dim=self.config.IMAGE_MIN_DIM,
                 min_scale=self.config.IMAGE_MIN_SCALE,
-                max_dim=self.config.IMAGE_MAX_DIM,
+                max_dim=max_dim or self.config.IMAGE_MAX_DIM,
                 mode=self.config.IMAGE_RESIZE_MODE)
             molded_image = mold_image(molded_image, self.config)
             # Build image_meta
@@ -2463,7 +2465,7 @@ class MaskRCNN(object):
         return molded_images, image_metas, windows
 
     def unmold_detections(self, detections, mrcnn_mask, original_image_shape,
-                          image_shape, window):
+                          image_shape, window, compact_masks=False):
         """Reformats the detections of one image from the format of the neural
         network output to a format suitable for use in the rest of the
         application.
@@ -2475,11 +2477,16 @@ class MaskRCNN(object):
         window: [y1, x1, y2, x2] Pixel coordinates of box in the image where the real
                 image is excluding the padding.
 
+        compact_masks: If True, the masks are returned as a list of masks of
+                       the size of their bounding box instead of full size
+                       masks.
+
         Returns:
         boxes: [N, (y1, x1, y2, x2)] Bounding boxes in pixels
         class_ids: [N] Integer class IDs for each bounding box
         scores: [N] Float probability scores of the class_id
-        masks: [height, width, num_instances] Instance masks
+        masks: [height, width, num_instances] Instance masks or, if
+               compact_masks, a list of N masks [y2 - y1, x2 - x1]
         """
         # How many detections do we have?
         # Detections array is padded with zeros. Find the first class_id == 0.
@@ -2516,27 +2523,49 @@ class MaskRCNN(object):
             masks = np.delete(masks, exclude_ix, axis=0)
             N = class_ids.shape[0]
 
+        # Only the masks of the classes in MASK_CLASS_IDS are unmolded
+        if self.config.MASK_CLASS_IDS is None:
+            with_mask = np.ones(N, dtype=bool)
+        else:
+            with_mask = np.isin(class_ids, self.config.MASK_CLASS_IDS)
+
+        if compact_masks:
+            # Resize masks to size of bounding box and set boundary threshold.
+            local_masks = [utils.unmold_mask_local(masks[i], boxes[i])
+                           if with_mask[i] else None for i in range(N)]
+            return boxes, class_ids, scores, local_masks
+
         # Resize masks to original image size and set boundary threshold.
         full_masks = []
         for i in range(N):
             # Convert neural network mask to full size mask
-            full_mask = utils.unmold_mask(masks[i], boxes[i], original_image_shape)
+            if with_mask[i]:
+                full_mask = utils.unmold_mask(masks[i], boxes[i],
+                                              original_image_shape)
+            else:
+                full_mask = np.zeros(original_image_shape[:2], dtype=bool)
             full_masks.append(full_mask)
         full_masks = np.stack(full_masks, axis=-1)\
             if full_masks else np.empty(original_image_shape[:2] + (0,))
 
         return boxes, class_ids, scores, full_masks
 
-    def detect(self, images, verbose=0):
+    def detect(self, images, verbose=0, compact_masks=False, max_dim=None):
         """Runs the detection pipeline.
 
         images: List of images, potentially of different sizes.
+        compact_masks: Return the masks in the size of their bounding box
+                       ("local_masks") instead of full size masks ("masks").
+        max_dim: Resize the images to this size instead of IMAGE_MAX_DIM
+                 (see mold_inputs).
 
         Returns a list of dicts, one dict per image. The dict contains:
         rois: [N, (y1, x1, y2, x2)] detection bounding boxes
         class_ids: [N] int class IDs
         scores: [N] float probability scores for the class IDs
         masks: [H, W, N] instance binary masks
+        local_masks: (instead of masks if compact_masks) list of N binary
+                     masks [y2 - y1, x2 - x1], one per detection bounding box
         """
         assert self.mode == "inference", "Create model in inference mode."
         assert len(
@@ -2548,7 +2577,7 @@ class MaskRCNN(object):
                 log("image", image)
 
         # Mold inputs to format expected by the neural network
-        molded_images, image_metas, windows = self.mold_inputs(images)
+        molded_images, image_metas, windows = self.mold_inputs(images, max_dim)
 
         # Validate image sizes
         # All images in a batch MUST be of the same size
@@ -2557,34 +2586,46 @@ class MaskRCNN(object):
             assert g.shape == image_shape,\
                 "After resizing, all images must have the same size. Check IMAGE_RESIZE_MODE and image sizes."
 
-        # Anchors
-        anchors = self.get_anchors(image_shape)
-        # Duplicate across the batch dimension because Keras requires it
-        # TODO: can this be optimized to avoid duplicating the anchors?
-        anchors = np.broadcast_to(anchors, (self.config.BATCH_SIZE,) + anchors.shape)
-
         if verbose:
             log("molded_images", molded_images)
             log("image_metas", image_metas)
-            log("anchors", anchors)
         # Run object detection
-        detections, _, _, mrcnn_mask, _, _, _ =\
-            self.keras_model.predict([molded_images, image_metas, anchors], verbose=0)
+        detections, mrcnn_mask = self.predict_molded(molded_images, image_metas,
+                                                     verbose)
         # Process detections
         results = []
         for i, image in enumerate(images):
             final_rois, final_class_ids, final_scores, final_masks =\
                 self.unmold_detections(detections[i], mrcnn_mask[i],
                                        image.shape, molded_images[i].shape,
-                                       windows[i])
+                                       windows[i], compact_masks)
             results.append({
                 "rois": final_rois,
                 "class_ids": final_class_ids,
                 "scores": final_scores,
-                "masks": final_masks,
+                "local_masks" if compact_masks else "masks": final_masks,
             })
         return results
 
+    def predict_molded(self, molded_images, image_metas, verbose=0):
+        """Runs the network on molded inputs of the same size.
+
+        Returns the raw outputs needed by unmold_detections():
+        detections: [batch, N, (y1, x1, y2, x2, class_id, score)]
+        mrcnn_mask: [batch, N, height, width, num_classes]
+        """
+        # Anchors
+        anchors = self.get_anchors(molded_images[0].shape)
+        # Duplicate across the batch dimension because Keras requires it
+        # TODO: can this be optimized to avoid duplicating the anchors?
+        anchors = np.broadcast_to(anchors, (self.config.BATCH_SIZE,) + anchors.shape)
+
+        if verbose:
+            log("anchors", anchors)
+        detections, _, _, mrcnn_mask, _, _, _ =\
+            self.keras_model.predict([molded_images, image_metas, anchors], verbose=0)
+        return detections, mrcnn_mask
+
     def detect_molded(self, molded_images, image_metas, verbose=0):
         """Runs the detection pipeline, but expect inputs that are
         molded already. Used mostly for debugging and inspecting
@@ -2614,19 +2655,12 @@ class MaskRCNN(object):
         for g in molded_images[1:]:
             assert g.shape == image_shape, "Images must have the same size"
 
-        # Anchors
-        anchors = self.get_anchors(image_shape)
-        # Duplicate across the batch dimension because Keras requires it
-        # TODO: can this be optimized to avoid duplicating the anchors?
-        anchors = np.broadcast_to(anchors, (self.config.BATCH_SIZE,) + anchors.shape)
-
         if verbose:
             log("molded_images", molded_images)
             log("image_metas", image_metas)
-            log("anchors", anchors)
         # Run object detection
-        detections, _, _, mrcnn_mask, _, _, _ =\
-            self.keras_model.predict([molded_images, image_metas, anchors], verbose=0)
+        detections, mrcnn_mask = self.predict_molded(molded_images, image_metas,
+                                                     verbose)
         # Process detections
         results = []
         for i, image in enumerate(molded_images):
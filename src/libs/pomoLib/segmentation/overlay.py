@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:48:05 2026
+
+Rendering of the segmentation overlay (image with the colored masks of the
+detections, saved as tiffSEG.png). Replaces visualize.display_instances with
+the same output, but works on uint8 data in the box of every instance:
+
+    - the blended values of an instance are a lookup table (256 values per
+      channel, same float operations as visualize.apply_mask), the image
+      itself is not converted to float or uint32
+    - the masks are written with one lookup per channel, no np.where over
+      the image
+    - no contours and matplotlib patches (display_instances computes them
+      without drawing them)
+
+Instances are blended in the order of the detections, so overlapping masks
+give the same pixels as display_instances.
+
+Overlays don't have to be rendered while the sample is evaluated (see
+OUTPUT/OverlayPolicy). The detections are then stored next to the overlay
+(<name>tiffSEG.json, encodeResult) and the overlay is rendered by
+OverlayWorker in the background or later by src/renderOverlays.py.
+
+The vector format (OUTPUT/OverlayFormat) replaces the overlay image by the
+contours of the objects (<name>tiffSEGV.json, encodeContours). They are
+drawn on the synth image on demand (renderContours, renderOverlays.py).
+"""
+
+import logging
+logger = logging.getLogger("root.OverlayLogger")
+logger.debug("OverlayLogger has been initialized")
+
+import os
+import json
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+
+from libs.pomoLib.segmentation import visualize
+from libs.pomoLib import maskCodec
+
+
+# always     -> rendered while segmentating, written with the region
+# ondemand   -> detections saved, rendered by src/renderOverlays.py
+# background -> detections saved, rendered by OverlayWorker
+OVERLAY_POLICIES = ("always", "ondemand", "background")
+
+# raster -> overlay image (tiffSEG.png)
+# vector -> contours of the objects with class and score (tiffSEGV.json), 
+#           no overlay image
+OVERLAY_FORMATS = ("raster", "vector")
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def blendTable(color, alpha: float = 0.5):
+    """
+    Returns the blended values [channels, 256] of all values of an uint8
+    image with the color (RGB, 0 to 1)
+    """
+    values = np.arange(256)
+    return np.array([(values * (1 - alpha) + alpha * color[c] * 255
+                      ).astype(np.uint8) for c in range(len(color))])
+
+
+def renderInstances(image, rois, masks: list, classIds, drawClassIds: list,
+                    alpha: float = 0.5, colors: list = None):
+    """
+    Returns the image with the masks of the instances blended in their
+    color.
+
+    Parameters
+    ----------
+    image : array
+        Image (RGB, uint8)
+    rois : array
+        Boxes [N, (y1, x1, y2, x2)] of the instances
+    masks : list
+        Masks of the instances in the size of their box (None = no mask)
+    classIds : array
+        Classes [N] of the instances
+    drawClassIds : list
+        Classes whose instances are drawn
+    alpha : float, optional
+        Opacity of the masks. The default is 0.5.
+    colors : list, optional
+        RGB color (0 to 1) of every instance. The default are the random
+        colors of display_instances (visualize.random_colors).
+
+    Returns
+    -------
+    array
+        Image with the masks (uint8)
+    """
+    if colors is None:
+        colors = visualize.random_colors(len(rois))
+
+    result = image.astype(np.uint8, copy=True)
+    for i in range(len(rois)):
+        if classIds[i] not in drawClassIds or masks[i] is None:
+            continue
+        if not np.any(rois[i]):
+            # Instance without box, likely lost in image cropping
+            continue
+
+        y1, x1, y2, x2 = rois[i]
+        inMask = np.asarray(masks[i]) == 1
+        region = result[y1:y2, x1:x2]
+        for c, table in enumerate(blendTable(colors[i], alpha)):
+            np.copyto(region[..., c], table[region[..., c]], where=inMask)
+
+    return result
+
+
+def encodeResult(r, classNames: list, drawClassIds: list):
+    """
+    Returns the detections of the drawn classes as JSON (utf-8). Masks are
+    run-length encoded (see maskCodec.py). Used to render the overlay later 
+    (see renderResult).
+    """
+    keep = [i for i in range(len(r['class_ids'])) 
+            if r['class_ids'][i] in drawClassIds and 
+            r['local_masks'][i] is not None]
+    data = {"class_names": list(classNames),
+            "rois": np.asarray(r['rois'])[keep].tolist(),
+            "class_ids": np.asarray(r['class_ids'])[keep].tolist(),
+            "scores": np.asarray(r['scores'])[keep].round(4).tolist(),
+            "masks": [maskCodec.encodeRle(r['local_masks'][i]) for i in keep]}
+    return json.dumps(data).encode("utf-8")
+
+
+def decodeResult(data):
+    """
+    Returns the result dict (compact masks) of detections encoded by 
+    encodeResult
+    """
+    data = json.loads(data)
+    return {"rois": np.array(data["rois"], dtype=np.int32).reshape(-1, 4),
+            "class_ids": np.array(data["class_ids"], dtype=np.int32),
+            "scores": np.array(data["scores"], dtype=np.float32),
+            "local_masks": [maskCodec.decodeRle(mask) for mask in data["masks"]]}
+
+
+def renderResult(imgSynth, data):
+    """
+    Returns the overlay of the synth image (gray or RGB) with the detections
+    encoded by encodeResult
+    """
+    if imgSynth.ndim == 2:
+        imgSynth = cv2.cvtColor(imgSynth, cv2.COLOR_GRAY2RGB)
+    r = decodeResult(data)
+    return renderInstances(imgSynth, r['rois'], r['local_masks'], 
+                           r['class_ids'], np.unique(r['class_ids']))
+
+
+def encodeContours(r, classNames: list, drawClassIds: list, 
+                   epsilon: float = 0.5):
+    """
+    Returns the contours of the drawn detections as JSON (utf-8):
+
+        {"instances": [{"class": "pollen", "score": 0.98, 
+                        "box": [y1, x1, y2, x2],
+                        "polygons": [[x0, y0, x1, y1, ...], ...]}, ...]}
+
+    The polygons are the outer contours of the mask in image coordinates,
+    simplified with a max. deviation of epsilon px (0 = all contour points).
+    """
+    instances = []
+    for i in range(len(r['class_ids'])):
+        mask = r['local_masks'][i]
+        if r['class_ids'][i] not in drawClassIds or mask is None:
+            continue
+        y1, x1, y2, x2 = (int(val) for val in r['rois'][i])
+        contours, __ = cv2.findContours(np.ascontiguousarray(mask, 
+                                                             dtype=np.uint8),
+                                        cv2.RETR_EXTERNAL, 
+                                        cv2.CHAIN_APPROX_SIMPLE)
+        polygons = []
+        for contour in contours:
+            if epsilon > 0:
+                contour = cv2.approxPolyDP(contour, epsilon, True)
+            polygons.append((contour.reshape(-1, 2) + 
+                             (x1, y1)).ravel().tolist())
+        instances.append({"class": classNames[r['class_ids'][i]],
+                          "score": round(float(r['scores'][i]), 4),
+                          "box": [y1, x1, y2, x2],
+                          "polygons": polygons})
+    return json.dumps({"instances": instances}).encode("utf-8")
+
+
+def contoursToResult(data):
+    """
+    Returns the result dict (compact masks, filled polygons) of contours 
+    encoded by encodeContours and the class names (sorted) the class ids
+    refer to.
+    """
+    instances = json.loads(data)["instances"]
+    classNames = sorted({inst["class"] for inst in instances})
+    masks = []
+    for inst in instances:
+        y1, x1, y2, x2 = inst["box"]
+        mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+        polygons = [np.array(poly, dtype=np.int32).reshape(-1, 2) - (x1, y1) 
+                    for poly in inst["polygons"]]
+        cv2.fillPoly(mask, polygons, 1)
+        masks.append(mask)
+    r = {"rois": np.array([inst["box"] for inst in instances], 
+                          dtype=np.int32).reshape(-1, 4),
+         "class_ids": np.array([classNames.index(inst["class"]) for inst in 
+                                instances], dtype=np.int32),
+         "scores": np.array([inst["score"] for inst in instances], 
+                            dtype=np.float32),
+         "local_masks": masks}
+    return r, classNames
+
+
+def renderContours(imgSynth, data):
+    """
+    Returns the overlay of the synth image (gray or RGB) with the contours
+    encoded by encodeContours
+    """
+    if imgSynth.ndim == 2:
+        imgSynth = cv2.cvtColor(imgSynth, cv2.COLOR_GRAY2RGB)
+    r, __ = contoursToResult(data)
+    return renderInstances(imgSynth, r['rois'], r['local_masks'], 
+                           r['class_ids'], np.unique(r['class_ids']))
+
+
+def resultPath(pathSeg: str):
+    """
+    Returns the path of the encoded detections of an overlay image
+    """
+    return os.path.splitext(pathSeg)[0] + ".json"
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class OverlayWorker:
+    """
+    Renders and writes overlays in a background thread with lowered
+    priority (Linux), in the order they have been submitted. Errors are 
+    logged, the overlays are visual artifacts only.
+    """
+    
+    def __init__(self, niceness: int = 10):
+        self.niceness = niceness
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target = self.__run, daemon = True,
+                                        name = "OverlayWorker")
+        self._thread.start()
+        
+    def submit(self, func, *args):
+        self._queue.put((func, args))
+        
+    def close(self):
+        """
+        Waits until all submitted overlays are written and stops the thread
+        """
+        start = time.time()
+        self._queue.put(None)
+        self._thread.join()
+        logger.debug(f"Overlay worker closed (waited {time.time() - start:.1f} s)")
+        
+    def __run(self):
+        # Threads are scheduled like processes on Linux
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 
+                           self.niceness)
+        except (AttributeError, OSError):
+            pass
+        
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            func, args = job
+            try:
+                func(*args)
+            except Exception:
+                logger.exception("Could not write overlay")
@@ -15,6 +15,7 @@ import sys
 
 import numpy as np
 import cv2
+import tensorflow as tf
 
 #import matplotlib.pyplot as plt
 
@@ -27,12 +28,22 @@ MODEL_DIR = os.path.join(ROOT_DIR, "logs")
 # Import Mask RCNN
 sys.path.append(ROOT_DIR)  # To find local version of the library
 from libs.pomoLib.segmentation.config import Config
-from libs.pomoLib.segmentation import visualize as visualize
+from libs.pomoLib.segmentation import overlay
 #from libs.pomoLib.segmentation.model import MaskRCNN
 
 #sys.path.append("../")
 from libs.pomoLib.datatypes import dcPomoObject, dcSpecies, dcTreshold
 from libs.pomoLib.segmentation import model as segModel
+from libs.pomoLib.segmentation import tiling
+from libs.pomoLib.segmentation import frozen
+from libs.pomoLib import maskCodec
+
+
+# Classes whose objects are cut and classified (the others are only counted)
+MASK_CLASSES = ("pollen", "sporen", "fragment")
+
+# Size of the images of the cut objects (input of the classifier)
+OBJ_SIZE = 350
 
 
 class PollenConfig(Config):
@@ -74,6 +85,12 @@ class PollenConfig(Config):
     
     RPN_ANCHOR_SCALES = (16,32, 64, 128, 256)
     
+    def __init__(self, batchSize = 1):
+        # Number of images per forward pass. Is part of the inference graph, 
+        # so it has to be set before the model is built.
+        self.IMAGES_PER_GPU = batchSize
+        super().__init__()
+    
 
 # class InferenceConfig(PollenConfig):    
 #     GPU_COUNT = 1
@@ -82,19 +99,53 @@ class PollenConfig(Config):
 
 class PomoSegmentation:
     
-    def __init__(self, pathModel, segConfig: PollenConfig, classNames: list):
+    def __init__(self, pathModel, segConfig: PollenConfig, classNames: list,
+                 tileSize: int = 0, tileOverlap: int = 128,
+                 selectiveMasks: bool = False, cascade: bool = False,
+                 cascadeCrowded: int = 20, cascadeDim: int = 512):
         self.pathModel = pathModel
         self.classNames = classNames
         self.segConfig = segConfig
+        # Segmentate img regions in tiles of this size (0 = whole region)
+        self.tileSize = tileSize
+        self.tileOverlap = tileOverlap
+        # Segmentate the whole region first, downscaled to cascadeDim, and 
+        # only the tiles with candidates (or all tiles of regions with more 
+        # than cascadeCrowded detections) in native resolution
+        self.cascade = cascade
+        self.cascadeCrowded = cascadeCrowded
+        self.cascadeDim = cascadeDim
+        if cascade and not tileSize:
+            logger.error("Cascade segmentation needs a tile size")
+            raise ValueError("Cascade segmentation needs a tile size")
+        if cascade and cascadeDim % 64:
+            logger.error("Size of the first cascade pass must be a multiple of 64")
+            raise ValueError("Size of the first cascade pass must be a multiple of 64")
         
         if len(classNames) != self.segConfig.NUM_CLASSES:
             logger.exception("Number of classes from config not equal to seg classes")
             raise ValueError("Number of classes from config not equal to seg classes")
         
-        logger.debug("Setup segmenter model to inference mode")
-        self.model = segModel.MaskRCNN(mode = "inference", 
-                                       config = self.segConfig, 
-                                       model_dir = "./")
+        # Masks only of the objects that are cut (no particle and fiber 
+        # masks, those are only counted)
+        if selectiveMasks:
+            self.segConfig.MASK_CLASS_IDS = [classNames.index(name) for name 
+                                             in MASK_CLASSES if name in classNames]
+            logger.debug(f"Compute masks only for {', '.join(MASK_CLASSES)}")
+        
+        # Frozen graph exported by exportModels.py or its TFLite conversion
+        # (quantizeModels.py), nothing has to be built
+        self.isFrozen = pathModel.endswith((".pb", ".tflite"))
+        # Anchors of the exported models are fixed to the input size
+        if cascade and self.isFrozen:
+            logger.error("Cascade segmentation needs the Keras model (.h5)")
+            raise ValueError("Cascade segmentation needs the Keras model (.h5)")
+        
+        if not self.isFrozen:
+            logger.debug("Setup segmenter model to inference mode")
+            self.model = segModel.MaskRCNN(mode = "inference", 
+                                           config = self.segConfig, 
+                                           model_dir = "./")
         
         if os.path.isfile(pathModel):
             # Get version
@@ -107,11 +158,31 @@ class PomoSegmentation:
                 self._modelVersion = "vX.X"
                 
             logger.info(f"Load segmentation model: {tail}")
-            self.model.load_weights(pathModel, by_name=True)
+            if pathModel.endswith(".tflite"):
+                self.model = frozen.LiteMaskRCNN(pathModel, self.segConfig)
+            elif self.isFrozen:
+                self.model = frozen.FrozenMaskRCNN(pathModel, self.segConfig)
+            else:
+                self.model.load_weights(pathModel, by_name=True)
             
         else:
             logger.error("File/path of segmenter model is not existing")
             raise ValueError("File/path of segmenter model is not existing")
+        
+        # Keras keeps its session per thread. Remember the session holding 
+        # the loaded weights to be able to use the model from other threads.
+        # A frozen or TFLite model has its own session.
+        self._session = (None if self.isFrozen else
+                         tf.compat.v1.keras.backend.get_session())
+            
+    def bindToThread(self):
+        """
+        Makes the loaded model usable in the calling thread. Has to be called 
+        once by every thread (except the one which loaded the model) before 
+        detect is used.
+        """
+        if self._session is not None:
+            tf.compat.v1.keras.backend.set_session(self._session)
             
         
     
@@ -121,108 +192,264 @@ class PomoSegmentation:
        
        
        
+    @property
+    def batchSize(self):
+        return self.segConfig.BATCH_SIZE
+    
+    @staticmethod
+    def emptyResult():
+        """
+        Returns a result without detections (same format as detect_batch)
+        """
+        return {'rois': np.zeros((0, 4), dtype=np.int32),
+                'class_ids': np.zeros((0,), dtype=np.int32),
+                'scores': np.zeros((0,), dtype=np.float32),
+                'local_masks': []}
+       
     def detect(self, images, verbose=0):
-        return self.model.detect([images], verbose = 0)
+        return self.detect_batch([images], verbose = 0)
+    
+    def detect_batch(self, regions, verbose=0):
+        """
+        Segmentates several images with as few forward passes as possible.
+        The images are split into batches of the batch size the model has been
+        built with. The last batch is filled up with copies of its last image
+        and the results of the copies are dropped.
+
+        Parameters
+        ----------
+        regions : list
+            Images (RGB) of the same size
+        verbose : int, optional
+            Verbose output of MaskRCNN.detect. The default is 0.
+
+        Returns
+        -------
+        results : list
+            One result dict of MaskRCNN.detect per image. The masks are 
+            returned in the size of their bounding box ("local_masks").
+
+        """
+        if self.cascade:
+            return self.__detectCascade(regions, verbose)
+        
+        if self.tileSize:
+            return self.__detectTiled(regions, verbose)
+        
+        return self.__detectBatches(regions, verbose)
+    
+    def __detectBatches(self, images, verbose, maxDim = None):
+        results = []
+        for i in range(0, len(images), self.batchSize):
+            batch = list(images[i:i + self.batchSize])
+            numImgs = len(batch)
+            batch += [batch[-1]] * (self.batchSize - numImgs)
+            results += self.model.detect(batch, verbose = verbose, 
+                                         compact_masks = True,
+                                         max_dim = maxDim)[:numImgs]
+            
+        return results
+    
+    def __detectTiled(self, regions, verbose):
+        """
+        Splits the images into overlapping tiles, segmentates the tiles of
+        all images together and merges the detections per image (see 
+        tiling.py)
+        """
+        grids = [tiling.tileGrid(img.shape[0], img.shape[1], self.tileSize,
+                                 self.tileOverlap) for img in regions]
+        tiles = [tile for img, grid in zip(regions, grids) 
+                 for tile in tiling.splitTiles(img, grid)]
+        tileResults = self.__detectBatches(tiles, verbose)
+        
+        results = []
+        start = 0
+        for img, grid in zip(regions, grids):
+            results.append(tiling.mergeTiles(tileResults[start:start + len(grid)],
+                                             grid, img.shape))
+            start += len(grid)
+            
+        return results
+    
+    def __detectCascade(self, regions, verbose):
+        """
+        Segmentates the whole images downscaled to cascadeDim, then the 
+        tiles with candidates of all images together and merges the 
+        detections per image (see tiling.py)
+        """
+        coarse = self.__detectBatches(regions, verbose, self.cascadeDim)
+        
+        candidateIds = [self.classNames.index(name) for name in MASK_CLASSES 
+                        if name in self.classNames]
+        grids = []
+        for img, r in zip(regions, coarse):
+            grid = tiling.tileGrid(img.shape[0], img.shape[1], self.tileSize,
+                                   self.tileOverlap)
+            grids.append([grid[i] for i in tiling.selectTiles(
+                r, grid, candidateIds, self.cascadeCrowded)])
+        tiles = [tile for img, grid in zip(regions, grids) 
+                 for tile in tiling.splitTiles(img, grid)]
+        logger.debug(f"Cascade: {len(tiles)} tiles of {len(regions)} "
+                     "regions segmentated in native resolution")
+        tileResults = self.__detectBatches(tiles, verbose) if tiles else []
+        
+        results = []
+        start = 0
+        for img, grid, r in zip(regions, grids, coarse):
+            if not grid:
+                results.append(r)
+                continue
+            fine = tiling.mergeTiles(tileResults[start:start + len(grid)],
+                                     grid, img.shape)
+            results.append(tiling.mergeCascade(r, fine, grid))
+            start += len(grid)
+            
+        return results
     
     def maskedImage(self, synthImage, r, drawDust = False):
-        return visualize.display_instances(synthImage, r['rois'], r['masks'],
-                                           r['class_ids'], self.classNames, 
-                                           drawDust, r['scores'],)
+        """
+        Returns the synth image with the masks of the pollen, spores and 
+        fragments (and particles if drawDust), see overlay.py
+        """
+        return overlay.renderInstances(synthImage, r['rois'], 
+                                       self.__getMasks(r), r['class_ids'],
+                                       self.overlayClassIds(drawDust))
+    
+    def overlayClassIds(self, drawDust = False):
+        """
+        Returns the classes drawn in the overlay
+        """
+        drawNames = list(MASK_CLASSES) + (["particle"] if drawDust else [])
+        return [self.classNames.index(name) for name in drawNames 
+                if name in self.classNames]
+    
+    def encodeOverlay(self, r, overlayFormat = "raster", drawDust = False):
+        """
+        Returns the detections drawn in the overlay, to render it later 
+        (raster) or their contours (vector), see overlay.py
+        """
+        r = {**r, 'local_masks': self.__getMasks(r)}
+        if overlayFormat == "vector":
+            return overlay.encodeContours(r, self.classNames,
+                                          self.overlayClassIds(drawDust))
+        return overlay.encodeResult(r, self.classNames, 
+                                    self.overlayClassIds(drawDust))
     
     def countParticle(self, r):
             intCountParticle = 0
             
-            for mask in range(len(r['masks'][0][0])):
-                if self.classNames[r['class_ids'][mask]] == 'particle':
+            for classId in r['class_ids']:
+                if self.classNames[classId] == 'particle':
                     intCountParticle += 1
             
             return intCountParticle
                                                               
     def cutObj(self, synthImage, r, drawDust = False):
+        """
+        Cuts the pollen, spores and fragments (and particles if drawDust) of
+        the result out of the synth image. The objects are masked, converted 
+        to gray and centered in an image of OBJ_SIZE x OBJ_SIZE px (larger 
+        objects are cropped around their center). Of objects with the same 
+        (cropped) box only the one with the highest score is kept.
+
+        Returns
+        -------
+        list
+            Cut objects (dcPomoObject) or None if there are no objects
+        """
+        cutNames = list(MASK_CLASSES) + (["particle"] if drawDust else [])
         try:
-            masks = [[r['masks'][:,:,mask], r['rois'][mask], 
-                      self.classNames[r['class_ids'][mask]], r['scores'][mask]]  
-                     for mask in range(len(r['masks'][0][0])) if 
-                     ((self.classNames[r['class_ids'][mask]] == 'pollen') or
-                      (self.classNames[r['class_ids'][mask]] == 'sporen') or 
-                      (self.classNames[r['class_ids'][mask]] == 'fragment')or 
-                      (self.classNames[r['class_ids'][mask]] == 'particle' if 
-                       drawDust else None))]
-            
+            localMasks = self.__getMasks(r)
+            classIds = np.asarray(r['class_ids'])
+            selected = np.flatnonzero(np.isin(classIds, 
+                                              [self.classNames.index(name) for
+                                               name in cutNames if name in 
+                                               self.classNames]))
+            selected = [i for i in selected if localMasks[i] is not None]
         except:
             return None
         
-        if not masks:
+        if not selected:
             return None
         
+        # Masking and converting to gray commute, so the region is 
+        # converted once
+        imgGray = cv2.cvtColor(synthImage, cv2.COLOR_RGB2GRAY)
+        
+        # Images of the objects (preallocated for all objects)
+        imgObjs = np.zeros((len(selected), OBJ_SIZE, OBJ_SIZE), dtype=np.uint8)
+        
         cutObjs: dcPomoObject = []
-        for index, mask in enumerate(masks):
-            x0 = mask[1][1]
-            x1 = mask[1][3]
-            y0 = mask[1][0]
-            y1 = mask[1][2]
+        # Index in cutObjs of the object with the box (double masked objects,
+        # added 15.11.2023 by T. Stemmler)
+        objByBox = {}
+        for index, i in enumerate(selected):
+            y0, x0, y1, x1 = (int(val) for val in r['rois'][i])
+            roiY0, roiX0 = y0, x0
             
-            if x1 - x0 > 350:
-                diff = round(((x1-x0) - 350) / 2)
-                x0 = x0 + diff
-                x1 = x0 + 350
+            if x1 - x0 > OBJ_SIZE:
+                x0 = x0 + round(((x1 - x0) - OBJ_SIZE) / 2)
+                x1 = x0 + OBJ_SIZE
             
-            if y1 - y0 > 350:
-                diff = round(((y1-y0) - 350) / 2)
-                y0 = y0 + diff
-                y1 = y0 + 350
+            if y1 - y0 > OBJ_SIZE:
+                y0 = y0 + round(((y1 - y0) - OBJ_SIZE) / 2)
+                y1 = y0 + OBJ_SIZE
             
-            polle = mask[0][y0:y1,x0:x1]
+            # Mask is in the size of the bounding box
+            polle = localMasks[i][y0 - roiY0:y1 - roiY0, 
+                                  x0 - roiX0:x1 - roiX0].astype(np.uint8)
             
-            polle = polle.astype('uint8')
-               
-            imgTemp = synthImage[y0:y1,x0:x1] 
-            polleTemp = cv2.bitwise_and(imgTemp,imgTemp,mask=polle)
-            polleTemp = cv2.cvtColor(polleTemp,cv2.COLOR_RGB2GRAY)
+            imgTemp = imgGray[y0:y1, x0:x1]
+            if polle.shape != imgTemp.shape:
+                logger.error("Mask does not match the box of the object")
+                raise ValueError("Mask does not match the box of the object")
             
-            l_img = np.zeros((350,350))
-            s_img = polleTemp
-            x_offset= int((350 - polleTemp.shape[1])/2)
-            y_offset= int((350 - polleTemp.shape[0])/2)
-            try:
-                l_img[y_offset:y_offset+s_img.shape[0],
-                      x_offset:x_offset+s_img.shape[1],] = s_img
-            except:
-                return None
+            yOffset = (OBJ_SIZE - imgTemp.shape[0]) // 2
+            xOffset = (OBJ_SIZE - imgTemp.shape[1]) // 2
+            np.multiply(imgTemp, polle != 0, 
+                        out = imgObjs[index, yOffset:yOffset + imgTemp.shape[0],
+                                      xOffset:xOffset + imgTemp.shape[1]],
+                        casting = "unsafe")
             
+            segClass = self.classNames[classIds[i]]
             obj = dcPomoObject(xPos = x0,
                                yPos = y0,
                                width = x1 - x0,
                                height = y1 - y0,
-                               imgObj = l_img.astype(dtype="uint8"),
-                               segMask = polle,
-                               segClass = mask[2],
-                               segScore = mask[3])
+                               imgObj = imgObjs[index],
+                               segMask = maskCodec.encodeRle(polle),
+                               segClass = segClass,
+                               segScore = r['scores'][i])
             
-            if mask[2] == 'fragment':
+            if segClass == 'fragment':
                 obj.specFolder = "Fragment"
                 obj.clfSpecies = dcSpecies("Fragment", "Fragment", "Fragment","",
                                            dcTreshold(1,0,0))
                 obj.clfScore = 1.00
                 
-            # check if object on image region is double masked (added 15.11.2023 by T. Stemmler)
-            doublePos = [elem for elem in cutObjs if (
-                         elem.xPos == obj.xPos and
-                         elem.yPos == obj.yPos and
-                         elem.width == obj.width and
-                         elem.height == obj.height)]
-            
-            if doublePos:
-                doublePos = doublePos[0]
-                if doublePos.segScore > obj.segScore:
-                    pass
-                else:
-                    cutObjs[cutObjs.index(doublePos)] = obj  
+            # Object on image region is double masked, keep the one with the
+            # higher score
+            box = (x0, y0, x1 - x0, y1 - y0)
+            if box in objByBox:
+                if not cutObjs[objByBox[box]].segScore > obj.segScore:
+                    cutObjs[objByBox[box]] = obj
                 continue
             
+            objByBox[box] = len(cutObjs)
             cutObjs.append(obj)
                                
         return cutObjs
+    
+    def __getMasks(self, r):
+        """
+        Returns the masks of the result as a list of masks in the size of 
+        their bounding box. Full size masks are cut to their bounding box.
+        """
+        if 'local_masks' in r:
+            return r['local_masks']
+        
+        return [r['masks'][y1:y2, x1:x2, i] 
+                for i, (y1, x1, y2, x2) in enumerate(r['rois'])]
 
 
 
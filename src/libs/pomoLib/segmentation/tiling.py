@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:32:40 2026
+
+Tiled segmentation of img regions. The region is split into overlapping
+tiles, which are segmentated as a batch. The detections of the tiles are
+merged to the detections of the region:
+
+    - Detections of the same object in the overlap of two tiles are
+      suppressed (cross-tile NMS, the detection with the higher score is
+      kept).
+    - Objects cut by the border of a tile (larger than the overlap) are
+      stitched, box and mask of their parts are combined.
+
+With a tile size equal to the input size of the model (IMAGE_MAX_DIM) the
+tiles are segmentated in their native resolution.
+
+Cascade: the whole region is segmentated first, downscaled below the input
+size of the model (SEG/CascadeDim). Only the tiles containing candidates of the relevant
+classes, or all tiles of crowded regions, are segmentated again in native
+resolution. The detections of the tiles replace the ones of the first
+pass in the area they cover.
+"""
+
+import logging
+logger = logging.getLogger("root.TilingLogger")
+logger.debug("TilingLogger has been initialized")
+
+import numpy as np
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def tileGrid(height: int, width: int, tileSize: int, overlap: int):
+    """
+    Returns the tiles covering an image of the given size. The tiles are
+    distributed evenly, so the overlap of neighbouring tiles is at least
+    "overlap". An image smaller than a tile is a single tile.
+
+    Returns
+    -------
+    list
+        Tiles (y1, x1, y2, x2)
+    """
+    if overlap >= tileSize:
+        raise ValueError(f"Overlap of tiles ({overlap}) must be smaller than "
+                         f"the tiles ({tileSize})")
+
+    def starts(size):
+        if size <= tileSize:
+            return [0]
+        num = int(np.ceil((size - overlap) / (tileSize - overlap)))
+        return [int(round(pos)) for pos in np.linspace(0, size - tileSize, num)]
+
+    return [(y, x, min(y + tileSize, height), min(x + tileSize, width))
+            for y in starts(height) for x in starts(width)]
+
+
+def splitTiles(image, tiles):
+    return [image[y1:y2, x1:x2] for y1, x1, y2, x2 in tiles]
+
+
+def mergeTiles(results, tiles, imageShape, nmsThreshold: float = 0.5,
+               edgeMargin: int = 2):
+    """
+    Merges the detections of the tiles of one image.
+
+    Parameters
+    ----------
+    results : list
+        Result dicts of MaskRCNN.detect (compact masks) per tile
+    tiles : list
+        Tiles (y1, x1, y2, x2) of the results
+    imageShape : tuple
+        Shape of the image
+    nmsThreshold : float, optional
+        Detections of the same class from different tiles are the same
+        object if their intersection covers more than this share of the
+        smaller box. The default is 0.5.
+    edgeMargin : int, optional
+        Detections closer than this to the border of their tile (except the
+        border of the image) are cut by the tile. The default is 2.
+
+    Returns
+    -------
+    dict
+        Result of the image with the keys "rois", "class_ids", "scores" and
+        "local_masks"
+    """
+    height, width = imageShape[:2]
+    dets = []
+    for tileIdx, (r, (ty1, tx1, ty2, tx2)) in enumerate(zip(results, tiles)):
+        for i, (y1, x1, y2, x2) in enumerate(r['rois']):
+            cut = ((y1 <= edgeMargin and ty1 > 0) or
+                   (x1 <= edgeMargin and tx1 > 0) or
+                   (y2 >= ty2 - ty1 - edgeMargin and ty2 < height) or
+                   (x2 >= tx2 - tx1 - edgeMargin and tx2 < width))
+            dets.append({"roi": np.array([y1 + ty1, x1 + tx1, y2 + ty1, x2 + tx1]),
+                         "classId": r['class_ids'][i],
+                         "score": r['scores'][i],
+                         "mask": r['local_masks'][i],
+                         "tiles": {tileIdx},
+                         "cut": cut})
+
+    # Complete detections first, they are kept in favour of cut ones
+    dets.sort(key=lambda det: (det["cut"], -det["score"]))
+
+    kept = []
+    for det in dets:
+        match = None
+        for other in kept:
+            # Detections of the same tile have already passed the NMS of
+            # the model
+            if (other["classId"] != det["classId"] or
+                not other["tiles"].isdisjoint(det["tiles"])):
+                continue
+            if _overlapSmaller(other["roi"], det["roi"]) > nmsThreshold:
+                match = other
+                break
+
+        if match is None:
+            kept.append(det)
+        elif match["cut"] and det["cut"]:
+            # Both are parts of an object larger than the overlap
+            _stitch(match, det)
+        # Otherwise the same object has been detected completely by another
+        # tile, drop the detection
+
+    if not kept:
+        return {"rois": np.zeros((0, 4), dtype=np.int32),
+                "class_ids": np.zeros((0,), dtype=np.int32),
+                "scores": np.zeros((0,), dtype=np.float32),
+                "local_masks": []}
+
+    return {"rois": np.array([det["roi"] for det in kept], dtype=np.int32),
+            "class_ids": np.array([det["classId"] for det in kept],
+                                  dtype=np.int32),
+            "scores": np.array([det["score"] for det in kept],
+                               dtype=np.float32),
+            "local_masks": [det["mask"] for det in kept]}
+
+
+def selectTiles(r, tiles, classIds, maxDetections: int = 0):
+    """
+    Returns the tiles to segmentate again in the cascade.
+
+    Parameters
+    ----------
+    r : dict
+        Result of the whole image (first pass)
+    tiles : list
+        Tiles (y1, x1, y2, x2) of the image
+    classIds : list
+        Classes of the candidates. For every candidate the tile covering
+        most of its box is selected.
+    maxDetections : int, optional
+        Images with more detections (all classes) are crowded, all tiles 
+        are selected. The default is 0 (no limit).
+
+    Returns
+    -------
+    list
+        Indices of the selected tiles
+    """
+    if maxDetections and len(r['class_ids']) > maxDetections:
+        return list(range(len(tiles)))
+
+    selected = set()
+    for roi, classId in zip(r['rois'], r['class_ids']):
+        if classId in classIds:
+            selected.add(int(np.argmax([_intersection(roi, tile) 
+                                        for tile in tiles])))
+    return sorted(selected)
+
+
+def mergeCascade(coarse, fine, tiles, nmsThreshold: float = 0.5):
+    """
+    Merges the detections of the first pass (whole image) and the merged
+    detections of the selected tiles (see mergeTiles). A detection of the
+    first pass is dropped if it lies completely in a selected tile (the 
+    tile has been segmentated in higher resolution) or if a detection of
+    the tiles of the same class covers it (see mergeTiles for 
+    nmsThreshold).
+
+    Returns
+    -------
+    dict
+        Result of the image, detections of the tiles first
+    """
+    keep = []
+    for i, roi in enumerate(coarse['rois']):
+        inTile = any(roi[0] >= ty1 and roi[1] >= tx1 and roi[2] <= ty2 and
+                     roi[3] <= tx2 for ty1, tx1, ty2, tx2 in tiles)
+        covered = any(classId == coarse['class_ids'][i] and
+                      _overlapSmaller(roi, other) > nmsThreshold
+                      for other, classId in zip(fine['rois'], 
+                                                fine['class_ids']))
+        if not inTile and not covered:
+            keep.append(i)
+
+    return {"rois": np.concatenate([fine['rois'], 
+                                    coarse['rois'][keep]]).astype(np.int32),
+            "class_ids": np.concatenate([fine['class_ids'], 
+                                         coarse['class_ids'][keep]]
+                                        ).astype(np.int32),
+            "scores": np.concatenate([fine['scores'], 
+                                      coarse['scores'][keep]]
+                                     ).astype(np.float32),
+            "local_masks": (list(fine['local_masks']) + 
+                            [coarse['local_masks'][i] for i in keep])}
+
+
+def _intersection(boxA, boxB):
+    y1, x1 = max(boxA[0], boxB[0]), max(boxA[1], boxB[1])
+    y2, x2 = min(boxA[2], boxB[2]), min(boxA[3], boxB[3])
+    return max(y2 - y1, 0) * max(x2 - x1, 0)
+
+
+def _overlapSmaller(boxA, boxB):
+    """
+    Returns the intersection of the boxes divided by the area of the smaller
+    box
+    """
+    intersection = _intersection(boxA, boxB)
+    smaller = min((boxA[2] - boxA[0]) * (boxA[3] - boxA[1]),
+                  (boxB[2] - boxB[0]) * (boxB[3] - boxB[1]))
+    return intersection / smaller if smaller > 0 else 0
+
+
+def _stitch(det, part):
+    """
+    Adds the box and the mask of part to det
+    """
+    roi = np.concatenate([np.minimum(det["roi"][:2], part["roi"][:2]),
+                          np.maximum(det["roi"][2:], part["roi"][2:])])
+    # Detections without mask (see Config.MASK_CLASS_IDS) stay without
+    mask = None
+    if det["mask"] is not None and part["mask"] is not None:
+        mask = np.zeros((roi[2] - roi[0], roi[3] - roi[1]), dtype=bool)
+        for elem in (det, part):
+            y1, x1, y2, x2 = elem["roi"] - np.tile(roi[:2], 2)
+            mask[y1:y2, x1:x2] |= elem["mask"].astype(bool)
+
+    det["roi"] = roi
+    det["mask"] = mask
+    det["score"] = max(det["score"], part["score"])
+    det["tiles"] |= part["tiles"]
@@ -18,6 +18,7 @@ import scipy
 import skimage.color
 import skimage.io
 import skimage.transform
+import skimage.util
 import urllib.request
 import shutil
 import warnings
@@ -557,6 +558,21 @@ def mold_mask(mask, config):
     pass
 
 
+def unmold_mask_local(mask, bbox):
+    """Converts a mask generated by the neural network to a binary mask of
+    the size of its bounding box.
+    mask: [height, width] of type float. A small, typically 28x28 mask.
+    bbox: [y1, x1, y2, x2]. The box to fit the mask in.
+
+    Returns a binary mask of shape [y2 - y1, x2 - x1]. Placed at (y1, x1) it
+    equals the mask returned by unmold_mask.
+    """
+    threshold = 0.5
+    y1, x1, y2, x2 = bbox
+    mask = resize(mask, (y2 - y1, x2 - x1))
+    return np.where(mask >= threshold, 1, 0).astype(np.bool)
+
+
 def unmold_mask(mask, bbox, image_shape):
     """Converts a mask generated by the neural network to a format similar
     to its original shape.
@@ -565,10 +581,8 @@ def unmold_mask(mask, bbox, image_shape):
 
     Returns a binary mask with the same size as the original image.
     """
-    threshold = 0.5
     y1, x1, y2, x2 = bbox
-    mask = resize(mask, (y2 - y1, x2 - x1))
-    mask = np.where(mask >= threshold, 1, 0).astype(np.bool)
+    mask = unmold_mask_local(mask, bbox)
 
     # Put the mask in the right location.
     full_mask = np.zeros(image_shape[:2], dtype=np.bool)
@@ -884,6 +898,33 @@ def denorm_boxes(boxes, shape):
     return np.around(np.multiply(boxes, scale) + shift).astype(np.int32)
 
 
+# Implementation used by resize(). See set_resize_backend().
+RESIZE_BACKENDS = ("skimage", "cv2")
+_resize_backend = "skimage"
+
+
+def set_resize_backend(name):
+    """Selects the implementation of resize() and so of resize_image(),
+    minimize_mask(), expand_mask() and unmold_mask().
+
+    name: "skimage" to use skimage.transform.resize() (float64) or "cv2" to
+        use OpenCV (float32). Both map the pixel centers the same way and
+        pad with cval. The cv2 backend handles order 0 and 1 in mode
+        "constant" without anti-aliasing, all other calls still use skimage.
+    """
+    global _resize_backend
+    if name not in RESIZE_BACKENDS:
+        raise ValueError("Unknown resize backend: {}".format(name))
+    if name == "cv2":
+        # Fail early if OpenCV is missing
+        import cv2  # noqa: F401
+    _resize_backend = name
+
+
+def get_resize_backend():
+    return _resize_backend
+
+
 def resize(image, output_shape, order=1, mode='constant', cval=0, clip=True,
            preserve_range=False, anti_aliasing=False, anti_aliasing_sigma=None):
     """A wrapper for Scikit-Image resize().
@@ -892,7 +933,15 @@ def resize(image, output_shape, order=1, mode='constant', cval=0, clip=True,
     receive the right parameters. The right parameters depend on the version
     of skimage. This solves the problem by using different parameters per
     version. And it provides a central place to control resizing defaults.
+
+    If the cv2 backend is selected (see set_resize_backend()), supported
+    calls are handed over to _resize_cv2().
     """
+    if (_resize_backend == "cv2" and order in (0, 1) and mode == 'constant'
+            and not anti_aliasing and min(output_shape[:2]) > 0):
+        return _resize_cv2(image, output_shape, order=order, cval=cval,
+                           clip=clip, preserve_range=preserve_range)
+
     if LooseVersion(skimage.__version__) >= LooseVersion("0.14"):
         # New in 0.14: anti_aliasing. Default it to False for backward
         # compatibility with skimage 0.13.
@@ -906,3 +955,76 @@ def resize(image, output_shape, order=1, mode='constant', cval=0, clip=True,
             image, output_shape,
             order=order, mode=mode, cval=cval, clip=clip,
             preserve_range=preserve_range)
+
+
+def _resize_cv2(image, output_shape, order=1, cval=0, clip=True,
+                preserve_range=False):
+    """OpenCV version of resize() with the semantics of
+    skimage.transform.resize(mode='constant', anti_aliasing=False):
+
+    - Integer images are scaled to [0, 1] unless preserve_range is set.
+    - Output pixel centers are mapped to the input like skimage does
+      (half-pixel offset), which is also the mapping of cv2.resize().
+    - Samples outside of the image are cval. cv2.resize() replicates the
+      border instead, so the output pixels interpolated with the outside
+      are blended with cval afterwards (only happens when upscaling).
+    - clip limits the output to the range of the input (and cval).
+
+    The result is float32.
+    """
+    import cv2
+
+    if preserve_range:
+        image = np.asarray(image, dtype=np.float32)
+    else:
+        image = skimage.util.img_as_float32(image)
+
+    out_h, out_w = int(output_shape[0]), int(output_shape[1])
+    if order == 0:
+        # Rounds the input coordinate like skimage, cv2.INTER_NEAREST
+        # would floor it
+        interpolation = cv2.INTER_NEAREST_EXACT
+    else:
+        interpolation = cv2.INTER_LINEAR
+
+    if image.ndim == 3 and image.shape[2] > 4:
+        # Keep cv2.resize() on its fast path of up to 4 channels
+        out = np.concatenate(
+            [cv2.resize(np.ascontiguousarray(image[..., i:i + 4]),
+                        (out_w, out_h), interpolation=interpolation
+                        ).reshape(out_h, out_w, -1)
+             for i in range(0, image.shape[2], 4)], axis=2)
+    else:
+        out = cv2.resize(np.ascontiguousarray(image), (out_w, out_h),
+                         interpolation=interpolation)
+    # OpenCV drops a single channel axis
+    out = out.reshape((out_h, out_w) + image.shape[2:])
+
+    if order == 1:
+        # Weight of the image (1 - weight of the outside) per row and column
+        weight_y = _inside_weights(image.shape[0], out_h)
+        weight_x = _inside_weights(image.shape[1], out_w)
+        if weight_y is not None or weight_x is not None:
+            weight = np.outer(
+                weight_y if weight_y is not None else np.ones(out_h, np.float32),
+                weight_x if weight_x is not None else np.ones(out_w, np.float32))
+            weight = weight.reshape(weight.shape + (1,) * (out.ndim - 2))
+            out = out * weight + cval * (1 - weight)
+
+    if clip and image.size:
+        min_val, max_val = image.min(), image.max()
+        out = np.clip(out, min(min_val, cval), max(max_val, cval))
+    return out.astype(np.float32, copy=False)
+
+
+def _inside_weights(in_size, out_size):
+    """Returns the weight of the input pixels for the bilinear interpolation
+    of every output pixel along one axis, i.e. 1 minus the weight of the
+    samples outside of the input. None if no output pixel reaches the
+    outside.
+    """
+    coords = (np.arange(out_size, dtype=np.float64) + 0.5) * in_size / out_size - 0.5
+    outside = np.maximum(np.maximum(-coords, coords - (in_size - 1)), 0)
+    if not outside.any():
+        return None
+    return np.clip(1 - outside, 0, 1).astype(np.float32)
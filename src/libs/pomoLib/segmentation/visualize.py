@@ -16,12 +16,15 @@ import random
 import itertools
 import colorsys
 import numpy as np
-from skimage.measure import find_contours
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import matplotlib.lines as lines
-from matplotlib.patches import Polygon
-import IPython.display
+
+from libs.pomoLib.lazyImport import LazyModule
+# Plots and notebook helpers are imported on first use, the segmenter only
+# needs random_colors (see overlay.py)
+measure = LazyModule("skimage.measure")
+plt = LazyModule("matplotlib.pyplot")
+patches = LazyModule("matplotlib.patches")
+lines = LazyModule("matplotlib.lines")
+ipython_display = LazyModule("IPython.display")
 
 # Root directory of the project
 ROOT_DIR = os.path.join(os.getcwd(), "libs", "pomoLib", "segmentation")
@@ -87,20 +90,24 @@ def display_instances(image, boxes, masks, class_ids, class_names, evalParticle=
                       figsize=(16, 16), ax=None, ):
     """
     boxes: [num_instance, (y1, x1, y2, x2, class_id)] in image coordinates.
-    masks: [height, width, num_instances]
+    masks: [height, width, num_instances] or list of num_instances masks in
+           the size of their box ([y2 - y1, x2 - x1], see unmold_mask_local)
     class_ids: [num_instances]
     class_names: list of class names of the dataset
     scores: (optional) confidence scores for each box
     figsize: (optional) the size of the image.
     """
     
+    # Masks in the size of their bounding box
+    localMasks = isinstance(masks, list)
+    
     # Number of instances
     N = boxes.shape[0]
     if not N:
         pass # Eingefügt: Tom Stemmler
         #print("\n*** No instances to display *** \n") #Auskommentiert: Tom Stemmler
     else:
-        assert boxes.shape[0] == masks.shape[-1] == class_ids.shape[0]
+        assert boxes.shape[0] == (len(masks) if localMasks else masks.shape[-1]) == class_ids.shape[0]
 
     # if not ax:
     #     _, ax = plt.subplots(1, figsize=figsize)
@@ -149,19 +156,27 @@ def display_instances(image, boxes, masks, class_ids, class_names, evalParticle=
             #        color='w', size=11, backgroundcolor="none")
     
             # Mask
-            mask = masks[:, :, i]
-            masked_image = apply_mask(masked_image, mask, color)
+            if localMasks:
+                # Only the region of the bounding box is changed
+                mask = masks[i]
+                if mask is None:
+                    # Mask has not been computed (see Config.MASK_CLASS_IDS)
+                    continue
+                apply_mask(masked_image[y1:y2, x1:x2], mask, color)
+            else:
+                mask = masks[:, :, i]
+                masked_image = apply_mask(masked_image, mask, color)
     
             # Mask Polygon
             # Pad to ensure proper polygons for masks that touch image edges.
             padded_mask = np.zeros(
                 (mask.shape[0] + 2, mask.shape[1] + 2), dtype=np.uint8)
             padded_mask[1:-1, 1:-1] = mask
-            contours = find_contours(padded_mask, 0.5)
+            contours = measure.find_contours(padded_mask, 0.5)
             for verts in contours:
                 # Subtract the padding and flip (y, x) to (x, y)
                 verts = np.fliplr(verts) - 1
-                p = Polygon(verts, facecolor="none", edgecolor=color)
+                p = patches.Polygon(verts, facecolor="none", edgecolor=color)
             #    ax.add_patch(p)
     # ax.imshow(masked_image.astype(np.uint8))
     # plt.show()
@@ -244,11 +259,11 @@ def display_instances_ori(image, boxes, masks, class_ids, class_names,
         padded_mask = np.zeros(
             (mask.shape[0] + 2, mask.shape[1] + 2), dtype=np.uint8)
         padded_mask[1:-1, 1:-1] = mask
-        contours = find_contours(padded_mask, 0.5)
+        contours = measure.find_contours(padded_mask, 0.5)
         for verts in contours:
             # Subtract the padding and flip (y, x) to (x, y)
             verts = np.fliplr(verts) - 1
-            p = Polygon(verts, facecolor="none", edgecolor=color)
+            p = patches.Polygon(verts, facecolor="none", edgecolor=color)
             ax.add_patch(p)
     ax.imshow(masked_image.astype(np.uint8))
     if auto_show:
@@ -500,11 +515,11 @@ def draw_boxes(image, boxes=None, refined_boxes=None,
             padded_mask = np.zeros(
                 (mask.shape[0] + 2, mask.shape[1] + 2), dtype=np.uint8)
             padded_mask[1:-1, 1:-1] = mask
-            contours = find_contours(padded_mask, 0.5)
+            contours = measure.find_contours(padded_mask, 0.5)
             for verts in contours:
                 # Subtract the padding and flip (y, x) to (x, y)
                 verts = np.fliplr(verts) - 1
-                p = Polygon(verts, facecolor="none", edgecolor=color)
+                p = patches.Polygon(verts, facecolor="none", edgecolor=color)
                 ax.add_patch(p)
     ax.imshow(masked_image.astype(np.uint8))
 
@@ -520,7 +535,7 @@ def display_table(table):
             row_html += "<td>{:40}</td>".format(str(col))
         html += "<tr>" + row_html + "</tr>"
     html = "<table>" + html + "</table>"
-    IPython.display.display(IPython.display.HTML(html))
+    ipython_display.display(ipython_display.HTML(html))
 
 
 def display_weight_stats(model):
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 15 08:41:12 2026
+
+Watching of the input folder. Keeps a cache of the folder entries and reports
+the names of changed entries, so only new or changed elements have to be
+checked for new samples.
+"""
+
+import logging
+logger = logging.getLogger("root.WatchLogger")
+logger.debug("WatchLogger has been initialized")
+
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class DirWatcher:
+    """
+    Base class of the watchers. Keeps the entries of the watched folder in
+    "entries" (name -> True if entry is a folder).
+
+    All entries are reported as changed every "resyncTime" seconds. This
+    allows to recheck elements whose content has changed without a change of
+    the folder (e.g. files inside of a sample folder).
+    """
+
+    def __init__(self, path: str, resyncTime: float = 60.0):
+        self.path = path
+        self.resyncTime = resyncTime
+        self.entries: dict = {}
+        self._timeResync = 0.0
+
+    def poll(self):
+        """
+        Updates the entries without waiting.
+
+        Returns
+        -------
+        set
+            Names of the new, changed or removed entries
+        """
+        raise NotImplementedError
+
+    def wait(self, timeout: float):
+        """
+        Waits up to timeout seconds for changes in the folder.
+
+        Returns
+        -------
+        set
+            Names of the new, changed or removed entries
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def _resyncDue(self):
+        return time.time() - self._timeResync >= self.resyncTime
+
+    def _rescan(self):
+        """
+        Reads all entries of the folder. Reports all entries as changed.
+        """
+        entries = {}
+        try:
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    try:
+                        entries[entry.name] = entry.is_dir()
+                    except OSError:
+                        continue
+        except FileNotFoundError as e:
+            logger.error(e)
+
+        changed = set(entries) | set(self.entries)
+        self.entries = entries
+        self._timeResync = time.time()
+        return changed
+
+
+class ScanWatcher(DirWatcher):
+    """
+    Fallback if inotify is not available. Scans the folder with os.scandir
+    on every poll, but reports only entries with changed mtime or size.
+    """
+
+    def __init__(self, path: str, resyncTime: float = 60.0):
+        super().__init__(path, resyncTime)
+        self._stats: dict = {}
+
+    def poll(self):
+        if self._resyncDue():
+            self._stats = self.__scan()
+            return self._rescan()
+
+        stats = self.__scan()
+        changed = {name for name in set(stats) | set(self._stats)
+                   if stats.get(name) != self._stats.get(name)}
+        self._stats = stats
+        self.entries = {name: stat[2] for name, stat in stats.items()}
+        return changed
+
+    def wait(self, timeout: float):
+        changed = self.poll()
+        if changed:
+            return changed
+        time.sleep(timeout)
+        return self.poll()
+
+    def __scan(self):
+        stats = {}
+        try:
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat()
+                        stats[entry.name] = (st.st_mtime_ns, st.st_size,
+                                             entry.is_dir())
+                    except OSError:
+                        continue
+        except FileNotFoundError as e:
+            logger.error(e)
+        return stats
+
+
+class InotifyWatcher(DirWatcher):
+    """
+    Uses the inotify interface of the linux kernel (via libc) to get the
+    changes of the folder without scanning it.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, path: str, resyncTime: float = 60.0):
+        super().__init__(path, resyncTime)
+
+        libcName = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libcName, use_errno=True)
+
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 failed: {os.strerror(errno)}")
+
+        mask = (self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO |
+                self.IN_CREATE | self.IN_DELETE | self.IN_ATTRIB |
+                self.IN_DELETE_SELF | self.IN_MOVE_SELF)
+        self._wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path),
+                                                ctypes.c_uint32(mask))
+        if self._wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {path}: "
+                          f"{os.strerror(errno)}")
+
+    def poll(self):
+        changed, overflow = self.__readEvents()
+        if overflow or self._resyncDue():
+            return self._rescan()
+
+        for name in changed:
+            path = os.path.join(self.path, name)
+            if os.path.lexists(path):
+                self.entries[name] = os.path.isdir(path)
+            else:
+                self.entries.pop(name, None)
+        return changed
+
+    def wait(self, timeout: float):
+        changed = self.poll()
+        if changed:
+            return changed
+        select.select([self._fd], [], [], timeout)
+        return self.poll()
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __readEvents(self):
+        changed = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+
+            offset = 0
+            while offset + self._EVENT.size <= len(data):
+                wd, mask, cookie, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].split(b"\0", 1)[0]
+                offset += length
+
+                if mask & self.IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF |
+                             self.IN_IGNORED):
+                    logger.warning(f"Watched folder {self.path} was removed "
+                                   "or moved")
+                    overflow = True
+                elif name:
+                    changed.add(os.fsdecode(name))
+        return changed, overflow
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def createWatcher(path: str, resyncTime: float = 60.0, useInotify: bool = True):
+    """
+    Returns a InotifyWatcher if available, otherwise a ScanWatcher. The
+    entries of the returned watcher are already loaded.
+    """
+    watcher = None
+    if useInotify and sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(path, resyncTime)
+            logger.debug(f"Watch {path} with inotify")
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Could not use inotify ({e}). Scan input folder "
+                           "instead")
+
+    if watcher is None:
+        watcher = ScanWatcher(path, resyncTime)
+        logger.debug(f"Watch {path} by scanning")
+
+    watcher.poll()
+    return watcher
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 14 10:02:37 2026
+
+Parallel evaluation of whole samples in worker processes. Every worker loads
+its own segmenter and classifier and takes samples from a shared queue.
+"""
+
+import logging
+logger = logging.getLogger("root.PoolLogger")
+logger.debug("PoolLogger has been initialized")
+
+import os
+import queue
+import time
+import multiprocessing
+from datetime import datetime
+from configparser import ConfigParser
+
+from libs.pomoLib.datatypes import sampleType
+
+
+"""
+--------------------------------------
+Worker
+--------------------------------------
+
+"""
+
+def _workerMain(idx: int, configDict: dict, version: str, tasks, results,
+                numThreads: int):
+    """
+    Entry point of a worker process. Loads the models and evaluates samples
+    from the task queue until None is received.
+    """
+    # Worker is a new process (spawn). Setup logger before own libs are
+    # imported, otherwise the logging will not work correctly.
+    from libs.pomoLib import pomoUtils
+    dateTime = datetime.now().strftime("%Y%m%d-%H%M%S")
+    workerLogger = pomoUtils.setup_logger("root",
+                                          f"logs/{dateTime}_PomoAI_worker{idx}.log",
+                                          debug = False)
+
+    # Share the cores between the workers
+    if numThreads:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(numThreads)
+        tf.config.threading.set_inter_op_parallelism_threads(numThreads)
+
+    from libs.pomoLib import app
+
+    config = ConfigParser()
+    config.optionxform = str
+    config.read_dict(configDict)
+
+    workerLogger.info(f"Start worker {idx} (pid {os.getpid()})")
+    # Samples in progress are owned by the other processes of the pool
+    pomoAI = app.PomoAI(config, version, resetStale = False)
+    results.put({"type": "ready", "worker": idx, "pid": os.getpid()})
+
+    while True:
+        sampleInfo = tasks.get()
+        if sampleInfo is None:
+            break
+        # The pool fails the sample if the worker dies during the evaluation
+        results.put({"type": "started", "worker": idx, "pid": os.getpid(),
+                     "sample": sampleInfo.get("pathSample")})
+
+        start = time.time()
+        numRegions = 0
+        error = None
+        sample = None
+        try:
+            sample = pomoAI.createNewSampleEvaluator(sampleInfo)
+            numRegions = pomoAI.runSample(sample)
+            if sample in pomoAI.lstOpenSamples:
+                # Sample could not be finished (e.g. missing img regions)
+                pomoAI.lstOpenSamples.remove(sample)
+                error = "End of sample not reached"
+                pomoAI.registry.markFailed(sample.nameSample, error)
+        except Exception as e:
+            workerLogger.exception(f"Evaluation of {sampleInfo.get('pathSample')}"
+                                   " failed")
+            error = str(e)
+            if sample in pomoAI.lstOpenSamples:
+                pomoAI.lstOpenSamples.remove(sample)
+            root, ext = os.path.splitext(sampleInfo.get("pathSample"))
+            pomoAI.registry.markFailed(root, error)
+
+        results.put({"type": "done",
+                     "worker": idx,
+                     "pid": os.getpid(),
+                     "sample": sampleInfo.get("pathSample"),
+                     "numRegions": numRegions,
+                     "time": time.time() - start,
+                     "error": error})
+
+    pomoAI.registry.close()
+    workerLogger.info(f"Stop worker {idx}")
+
+
+"""
+--------------------------------------
+Classes
+--------------------------------------
+
+"""
+
+class SamplePool:
+    """
+    Pool of worker processes evaluating whole samples. Single img regions
+    (sampleType.file) are still evaluated by the calling process, as their
+    regions arrive one after another.
+    """
+
+    def __init__(self, config: ConfigParser, version: str, numWorkers: int,
+                 threadsPerWorker: int = 0):
+        if numWorkers < 1:
+            logger.error("Number of workers must be at least 1")
+            raise ValueError("Number of workers must be at least 1")
+
+        self.config = config
+        self.version = version
+        self.numWorkers = numWorkers
+
+        if threadsPerWorker <= 0:
+            threadsPerWorker = max(1, (os.cpu_count() or 1) // numWorkers)
+        self.threadsPerWorker = threadsPerWorker
+
+        # Every worker builds its own TF graph, so the processes must not be
+        # forked from a process that already loaded tensorflow
+        self._ctx = multiprocessing.get_context("spawn")
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+
+        self._workers: list = []
+        self._numOpen = 0
+        self._stats: dict = {}
+        # Sample evaluated by every worker (index -> sample) and the workers
+        # which have loaded their models
+        self._running: dict = {}
+        self._ready: set = set()
+
+    @classmethod
+    def fromConfig(cls, config: ConfigParser, version: str):
+        """
+        Returns a pool if more than one worker is configured, otherwise None
+        """
+        numWorkers = config.getint("POOL", "Workers", fallback=0)
+        if numWorkers <= 1:
+            return None
+
+        return cls(config, version, numWorkers,
+                   config.getint("POOL", "ThreadsPerWorker", fallback=0))
+
+    def start(self):
+        if self._workers:
+            return None
+
+        logger.info(f"Start {self.numWorkers} worker processes "
+                    f"({self.threadsPerWorker} threads each)")
+        self._workers = [None] * self.numWorkers
+        for idx in range(self.numWorkers):
+            self.__startWorker(idx)
+            self._stats[idx] = {"samples": 0, "regions": 0, "time": 0.0,
+                                "failed": 0}
+
+    def submit(self, sampleInfo: dict):
+        self.start()
+        logger.info(f"Queue sample {sampleInfo.get('pathSample')}")
+        self._tasks.put(sampleInfo)
+        self._numOpen += 1
+
+    def collect(self, timeout: float = 1.0, registry = None):
+        """
+        Handles the messages of the workers. Waits up to timeout seconds for
+        the first message. Samples of workers that died during the 
+        evaluation (e.g. killed because of memory) are marked as failed in 
+        the registry (registry.SampleRegistry) and the workers are started
+        again.
+        """
+        block = True
+        while True:
+            try:
+                msg = self._results.get(block, timeout)
+            except queue.Empty:
+                break
+            block = False
+
+            if msg["type"] == "ready":
+                logger.info(f"Worker {msg['worker']} (pid {msg['pid']}) ready")
+                self._ready.add(msg["worker"])
+                continue
+            
+            if msg["type"] == "started":
+                self._running[msg["worker"]] = msg["sample"]
+                continue
+
+            if self._running.pop(msg["worker"], None) is None:
+                # Sample already failed by __checkWorkers
+                continue
+            self._numOpen -= 1
+            stats = self._stats[msg["worker"]]
+            stats["samples"] += 1
+            stats["regions"] += msg["numRegions"]
+            stats["time"] += msg["time"]
+
+            if msg["error"]:
+                stats["failed"] += 1
+                logger.error(f"Worker {msg['worker']}: evaluation of "
+                             f"{msg['sample']} failed ({msg['error']})")
+            else:
+                logger.info(f"Worker {msg['worker']}: {msg['sample']} done, "
+                            f"{msg['numRegions']} regions in "
+                            f"{msg['time']:.0f} s "
+                            f"({self.__rate(msg['numRegions'], msg['time'])})")
+
+        self.__checkWorkers(registry)
+
+        if self._numOpen and not any(w.is_alive() for w in self._workers):
+            logger.error(f"All workers stopped. {self._numOpen} samples are "
+                         "not evaluated")
+            self._numOpen = 0
+
+    def drain(self, pomoAI):
+        """
+        Hands all new samples of the input folder to the workers and waits
+        until they are evaluated.
+
+        Parameters
+        ----------
+        pomoAI : app.PomoAI
+            Instance used to look for new samples and to evaluate single img
+            regions (sampleType.file)
+
+        """
+        while True:
+            sampleInfo = pomoAI.checkForNewSample()
+
+            # Sample is already claimed in the registry by checkForNewSample
+            if sampleInfo and sampleInfo["sampleType"] != sampleType.file:
+                self.submit(sampleInfo)
+                continue
+
+            if sampleInfo:
+                pomoAI.createNewSampleEvaluator(sampleInfo)
+
+            # Evaluate (reactivated) samples of single img regions
+            if any(sample.active for sample in pomoAI.lstOpenSamples):
+                for sample in list(pomoAI.lstOpenSamples):
+                    pomoAI.runSample(sample)
+                continue
+
+            if not self._numOpen:
+                break
+
+            self.collect(registry = pomoAI.registry)
+
+        self.logStats()
+
+    def close(self):
+        for worker in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def __startWorker(self, idx):
+        configDict = {section: dict(self.config.items(section, raw=True))
+                      for section in self.config.sections()}
+        worker = self._ctx.Process(target=_workerMain,
+                                   args=(idx, configDict, self.version,
+                                         self._tasks, self._results,
+                                         self.threadsPerWorker),
+                                   name=f"PomoAIWorker{idx}")
+        worker.start()
+        self._workers[idx] = worker
+
+    def __checkWorkers(self, registry):
+        """
+        Fails the sample of every dead worker and starts the worker again.
+        Workers which died before loading their models are not started again
+        (e.g. missing model).
+        """
+        for idx, worker in enumerate(self._workers):
+            if worker.is_alive():
+                continue
+            worker.join()
+
+            sample = self._running.pop(idx, None)
+            if sample is not None:
+                error = f"Worker died (exit code {worker.exitcode})"
+                logger.error(f"Worker {idx}: evaluation of {sample} failed "
+                             f"({error})")
+                self._numOpen -= 1
+                self._stats[idx]["failed"] += 1
+                self._stats[idx]["samples"] += 1
+                if registry is not None:
+                    root, ext = os.path.splitext(sample)
+                    registry.markFailed(root, error)
+
+            if idx not in self._ready:
+                continue
+            self._ready.discard(idx)
+            logger.warning(f"Restart worker {idx} (exit code {worker.exitcode})")
+            self.__startWorker(idx)
+
+    def logStats(self):
+        """
+        Logs the throughput of every worker
+        """
+        for idx, stats in self._stats.items():
+            logger.info(f"Worker {idx}: {stats['samples']} samples "
+                        f"({stats['failed']} failed), {stats['regions']} "
+                        f"regions in {stats['time']:.0f} s "
+                        f"({self.__rate(stats['regions'], stats['time'])})")
+
+    def __rate(self, numRegions, seconds):
+        if seconds <= 0:
+            return "-- regions/s"
+        return f"{numRegions / seconds:.2f} regions/s"
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:06:33 2026
+
+Converts the segmentation and the classification model of the config to
+quantized TFLite models (see libs/pomoLib/liteModel.py) and compares them
+with the float models.
+
+The img regions of a sample (folder or zip) are used to calibrate the
+quantization (mode int8) and for the accuracy report:
+
+    - segmentation: detections per class, matched detections and their
+      score differences
+    - classification: per object (same segmentation) agreement of the
+      species and differences of the scores
+    - whole evaluation: species counts of the float and the quantized
+      models
+
+The converted models are written next to the original ones and are used by
+setting SEG/ModelSegPath and CLASSIF/ModelClassifPath to them.
+
+Usage (from the root of the repository):
+
+    python src/quantizeModels.py --sample PATH [--mode int8|fp16|dynamic]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from configparser import ConfigParser
+
+import numpy as np
+import cv2
+import tensorflow as tf
+
+from libs.pomoLib import app
+from libs.pomoLib import liteModel
+from libs.pomoLib.sampleSource import FolderSource, ZipSource
+from libs.pomoLib.segmentation import frozen
+from libs.pomoLib.segmentation import utils as segUtils
+
+
+# Classes of the segmentation that are classified
+CLASSIF_CLASSES = ("pollen", "sporen")
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def loadImages(pathSample, num):
+    """
+    Returns up to num img regions (RGB) of the sample
+    """
+    if pathSample.endswith(".zip"):
+        source = ZipSource(pathSample)
+    else:
+        source = FolderSource(pathSample)
+
+    images = []
+    for name in sorted(source.listImages()):
+        if not name.endswith(".png"):
+            continue
+        img = source.readImage(name)
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+        images.append(img[..., :3])
+        if len(images) >= num:
+            break
+    source.close()
+    return images
+
+
+def cutObjs(seg, images):
+    """
+    Returns the objects to classify of every image
+    """
+    lstObjs = []
+    for img, r in zip(images, seg.detect_batch(images)):
+        objs = seg.cutObj(img, r) or []
+        lstObjs.append([obj for obj in objs if obj.segClass in CLASSIF_CLASSES])
+    return lstObjs
+
+
+def convertSegmenter(seg, segConfig, pathModel, mode, images):
+    """
+    Converts the segmenter (frozen graph, exported first if pathModel is a
+    .h5 file). Returns the path of the TFLite model.
+    """
+    pathFrozen = pathModel
+    if not pathModel.endswith(".pb"):
+        pathFrozen = (os.path.splitext(pathModel)[0] +
+                      f"_b{segConfig.BATCH_SIZE}.pb")
+        frozen.exportFrozenGraph(seg.model,
+                                 tf.compat.v1.keras.backend.get_session(),
+                                 pathFrozen, seg.classNames,
+                                 os.path.basename(pathModel))
+    metadata = frozen.loadMetadata(pathFrozen)
+
+    batchSize = segConfig.BATCH_SIZE
+    inputShapes = {
+        metadata["inputs"]["image"].split(":")[0]:
+            [batchSize] + list(segConfig.IMAGE_SHAPE),
+        metadata["inputs"]["image_meta"].split(":")[0]:
+            [batchSize, segConfig.IMAGE_META_SIZE]}
+    outputNames = [metadata["outputs"]["detections"].split(":")[0],
+                   metadata["outputs"]["mrcnn_mask"].split(":")[0]]
+
+    def calibData():
+        for img in images:
+            molded, metas, __ = seg.model.mold_inputs([img] * batchSize)
+            yield [molded.astype(np.float32), metas.astype(np.float32)]
+
+    pathLite = os.path.splitext(pathFrozen)[0] + f"_{mode}.tflite"
+    metadata["quantization"] = liteModel.convertFrozenGraph(
+        pathFrozen, inputShapes, outputNames, pathLite, mode, calibData)
+
+    # Tensor names of the TFLite model (same order as in the frozen graph)
+    lite = liteModel.LiteModel(pathLite)
+    metadata["format"] = "tflite"
+    metadata["inputs"] = dict(zip(("image", "image_meta"), lite.inputNames))
+    metadata["outputs"] = dict(zip(("detections", "mrcnn_mask"),
+                                   lite.outputNames))
+    with open(frozen.metadataPath(pathLite), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+    return pathLite
+
+
+def convertClassifier(classif, pathModel, mode, lstObjs):
+    """
+    Converts the classifier. Returns the path of the TFLite model.
+    """
+    objs = [obj for objs in lstObjs for obj in objs]
+    if mode == "int8" and not objs:
+        raise ValueError("No objects found in the sample to calibrate the "
+                         "classifier")
+
+    def calibData():
+        for obj in objs:
+            # Input of the original (float) model
+            yield [classif.prepareFloatInput([obj.imgObj])]
+
+    pathLite = os.path.splitext(pathModel)[0] + f"_{mode}.tflite"
+    liteModel.convertKerasModel(pathModel, pathLite, mode, calibData)
+    return pathLite
+
+
+def compareSegmentation(classNames, resFloat, resQuant):
+    """
+    Detections per class of both models and the detections matched by class
+    and box IoU >= 0.5
+    """
+    countFloat, countQuant = Counter(), Counter()
+    matched = 0
+    scoreDiffs = []
+    for rf, rq in zip(resFloat, resQuant):
+        countFloat.update(classNames[i] for i in rf["class_ids"])
+        countQuant.update(classNames[i] for i in rq["class_ids"])
+        if not len(rf["rois"]) or not len(rq["rois"]):
+            continue
+        iou = segUtils.compute_overlaps(rf["rois"], rq["rois"])
+        used = set()
+        for i in np.argsort(-rf["scores"]):
+            for j in np.argsort(-iou[i]):
+                if iou[i, j] < 0.5:
+                    break
+                if j in used or rq["class_ids"][j] != rf["class_ids"][i]:
+                    continue
+                used.add(j)
+                matched += 1
+                scoreDiffs.append(abs(float(rf["scores"][i] - rq["scores"][j])))
+                break
+
+    return {"detectionsFloat": dict(countFloat),
+            "detectionsQuant": dict(countQuant),
+            "matched": matched,
+            "scoreDiffMean": float(np.mean(scoreDiffs)) if scoreDiffs else 0.0,
+            "scoreDiffMax": float(np.max(scoreDiffs)) if scoreDiffs else 0.0}
+
+
+def compareClassification(classifFloat, classifQuant, lstObjs):
+    """
+    Classifies the same objects with both models
+    """
+    imgs = [obj.imgObj for objs in lstObjs for obj in objs]
+    if not imgs:
+        return {"objects": 0}
+
+    resFloat = classifFloat.classifyObj(imgs)
+    resQuant = classifQuant.classifyObj(imgs)
+    agree = [rf["index"] == rq["index"] for rf, rq in zip(resFloat, resQuant)]
+    scoreDiffs = [abs(float(rf["hitRate"] - rq["hitRate"]))
+                  for rf, rq in zip(resFloat, resQuant)]
+    return {"objects": len(imgs),
+            "speciesAgreement": float(np.mean(agree)),
+            "scoreDiffMean": float(np.mean(scoreDiffs)),
+            "scoreDiffMax": float(np.max(scoreDiffs))}
+
+
+def speciesCounts(seg, classif, images):
+    """
+    Species counts of the whole evaluation of the images
+    """
+    counts = Counter()
+    for objs in cutObjs(seg, images):
+        if objs:
+            counts.update(r["species"].nameGer for r in
+                          classif.classifyObj([obj.imgObj for obj in objs]))
+    return dict(counts)
+
+
+def timeIt(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the models to "
+                                     "quantized TFLite models")
+    parser.add_argument("--sample", required=True, help="Sample (folder or "
+                        "zip) to calibrate and compare the models")
+    parser.add_argument("--mode", default="int8", choices=liteModel.QUANT_MODES,
+                        help="Quantization mode")
+    parser.add_argument("--models", default="seg,classif", help="Models to "
+                        "convert (seg, classif)")
+    parser.add_argument("--num", type=int, default=50, help="Max. number of "
+                        "img regions of the sample")
+    parser.add_argument("--report", help="Accuracy report (json), default: "
+                        "quantReport_<mode>.json")
+    args = parser.parse_args()
+    models = args.models.split(",")
+
+    config = ConfigParser()
+    config.optionxform = str
+    config.read("src/config/config.ini")
+    pomo = app.PomoAI(config, "quantizeModels", loadModels = False,
+                      resetStale = False)
+
+    images = loadImages(args.sample, args.num)
+    print(f"{len(images)} img regions of {args.sample}")
+
+    pathSeg = config.get("SEG", "ModelSegPath")
+    pathClassif = config.get("CLASSIF", "ModelClassifPath")
+    segFloat = pomo.initSeg(pathSeg)
+    classifFloat = pomo.initClassif(pathClassif)
+    lstObjs = cutObjs(segFloat, images)
+
+    segQuant, classifQuant = segFloat, classifFloat
+    if "seg" in models:
+        pathLite = convertSegmenter(segFloat, segFloat.segConfig, pathSeg,
+                                    args.mode, images)
+        print(f"Segmenter: {pathLite}")
+        segQuant = pomo.initSeg(pathLite)
+    if "classif" in models:
+        pathLite = convertClassifier(classifFloat, pathClassif, args.mode,
+                                     lstObjs)
+        print(f"Classifier: {pathLite}")
+        classifQuant = pomo.initClassif(pathLite)
+
+    report = {"mode": args.mode, "sample": args.sample,
+              "images": len(images), "models": models}
+
+    resFloat, timeFloat = timeIt(segFloat.detect_batch, images)
+    resQuant, timeQuant = timeIt(segQuant.detect_batch, images)
+    report["segmentation"] = compareSegmentation(segFloat.classNames,
+                                                 resFloat, resQuant)
+    report["segmentation"]["timeFloat"] = timeFloat / max(len(images), 1)
+    report["segmentation"]["timeQuant"] = timeQuant / max(len(images), 1)
+
+    report["classification"] = compareClassification(classifFloat,
+                                                     classifQuant, lstObjs)
+    report["speciesFloat"] = speciesCounts(segFloat, classifFloat, images)
+    report["speciesQuant"] = speciesCounts(segQuant, classifQuant, images)
+
+    pathReport = args.report or f"quantReport_{args.mode}.json"
+    with open(pathReport, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    print(f"Report written to {pathReport}")
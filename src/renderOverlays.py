@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:41:16 2026
+
+Renders the segmentation overlays (tiffSEG.png) of evaluated samples from
+their saved detections (tiffSEG.json, written with OUTPUT/OverlayPolicy
+ondemand or background) or contours (tiffSEGV.json, OUTPUT/OverlayFormat
+vector), see segmentation/overlay.py. Accepts sample output folders, result
+archives (.zip) and folders containing them. Existing overlays are kept
+unless --force is given.
+
+Usage (from the root of the repository):
+
+    python src/renderOverlays.py PATH [PATH ...] [--force]
+"""
+
+import argparse
+import os
+import time
+import zipfile
+
+import numpy as np
+import cv2
+
+from libs.pomoLib.datatypes import imgElemType
+from libs.pomoLib.segmentation import overlay
+
+
+# Saved detections and contours with their renderer
+RENDERERS = {os.path.splitext(imgElemType.seg.value)[0] + ".json": 
+                 overlay.renderResult,
+             imgElemType.segVector.value: overlay.renderContours}
+
+
+"""
+--------------------------------------
+Functions
+--------------------------------------
+
+"""
+
+def resultSuffix(name):
+    """
+    Returns the suffix of saved detections or contours (None for other
+    files)
+    """
+    for ending in RENDERERS:
+        if name.endswith(ending):
+            return ending
+    return None
+
+
+def synthName(nameResult):
+    return nameResult[:-len(resultSuffix(nameResult))] + imgElemType.synth.value
+
+
+def segName(nameResult):
+    return nameResult[:-len(resultSuffix(nameResult))] + imgElemType.seg.value
+
+
+def render(name, imgSynth, data):
+    return RENDERERS[resultSuffix(name)](imgSynth, data)
+
+
+def renderFolder(path, force):
+    """
+    Renders the overlays of all saved detections in the folder (recursive).
+    Returns the number of rendered overlays.
+    """
+    num = 0
+    for root, __, files in os.walk(path):
+        for name in files:
+            if resultSuffix(name) is None:
+                continue
+            pathSeg = os.path.join(root, segName(name))
+            if os.path.isfile(pathSeg) and not force:
+                continue
+            imgSynth = cv2.imread(os.path.join(root, synthName(name)),
+                                  cv2.IMREAD_GRAYSCALE)
+            if imgSynth is None:
+                print(f"Synth image of {name} is missing, skipped")
+                continue
+            with open(os.path.join(root, name), "rb") as f:
+                cv2.imwrite(pathSeg, render(name, imgSynth, f.read()))
+            num += 1
+    return num
+
+
+def renderArchive(path, force):
+    """
+    Renders the overlays of all saved detections in the result archive and
+    adds them to it. Returns the number of rendered overlays.
+    """
+    with zipfile.ZipFile(path, "r") as zf:
+        names = set(zf.namelist())
+        todo = [name for name in names if resultSuffix(name) is not None and
+                (force or segName(name) not in names)]
+        rendered = []
+        for name in todo:
+            if synthName(name) not in names:
+                print(f"Synth image of {name} is missing, skipped")
+                continue
+            imgSynth = cv2.imdecode(np.frombuffer(zf.read(synthName(name)),
+                                                  dtype=np.uint8),
+                                    cv2.IMREAD_GRAYSCALE)
+            img = render(name, imgSynth, zf.read(name))
+            success, data = cv2.imencode(".png", img)
+            if success:
+                rendered.append((segName(name), data.tobytes()))
+
+    if not rendered:
+        return 0
+
+    # Replaced overlays would be duplicate entries of the archive
+    if force and any(name in names for name, __ in rendered):
+        replaced = {name for name, __ in rendered}
+        pathTemp = path + ".tmp"
+        with zipfile.ZipFile(path, "r") as zfIn, \
+             zipfile.ZipFile(pathTemp, "w") as zfOut:
+            for info in zfIn.infolist():
+                if info.filename not in replaced:
+                    zfOut.writestr(info, zfIn.read(info.filename))
+            for name, data in rendered:
+                zfOut.writestr(name, data, zipfile.ZIP_STORED)
+        os.replace(pathTemp, path)
+    else:
+        with zipfile.ZipFile(path, "a") as zf:
+            for name, data in rendered:
+                zf.writestr(name, data, zipfile.ZIP_STORED)
+    return len(rendered)
+
+
+def renderPath(path, force):
+    if zipfile.is_zipfile(path):
+        return renderArchive(path, force)
+
+    num = renderFolder(path, force)
+    for root, __, files in os.walk(path):
+        for name in files:
+            if name.endswith(".zip"):
+                num += renderArchive(os.path.join(root, name), force)
+    return num
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the segmentation "
+                                     "overlays from saved detections or "
+                                     "contours")
+    parser.add_argument("paths", nargs="+", help="Sample output folders, "
+                        "result archives (.zip) or folders containing them")
+    parser.add_argument("--force", action="store_true", help="Render "
+                        "existing overlays again")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        start = time.time()
+        num = renderPath(path, args.force)
+        print(f"{path}: {num} overlays rendered ({time.time() - start:.1f} s)")